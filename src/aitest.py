@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+"""
+
+import unittest
+from typing import List, Tuple, Any
+
+from common import Options
+from wind import Wind
+from client import Client
+from game import PlayingGame
+from message import Message
+from move import Move
+from tile import Tile, Meld
+import robotpool
+from testfakes import dmjlRuleset
+
+RULESET = dmjlRuleset()
+
+CLAIMS = [Message.NoClaim, Message.Chow, Message.Pung, Message.Kong, Message.MahJongg]
+
+
+class Base(unittest.TestCase):
+
+    """a robot client. Its player South may claim what East discards"""
+
+    def setUp(self) ->None:
+        self.client = Client('S')
+        self.client.game = PlayingGame(
+            [(x, x.char) for x in Wind.all4], RULESET, wantedGame='1', client=self.client)
+        self.savedAnytime = Options.anytime
+        self.savedTimeout = RULESET.claimTimeout
+
+    def tearDown(self) ->None:
+        Options.anytime = self.savedAnytime
+        RULESET.claimTimeout = self.savedTimeout
+
+    def ask(self, concealed:str, discard:str) ->Tuple[Message, Any]:
+        """the answer of the robot to discard"""
+        game = self.client.game
+        assert game
+        state = game.myself.handState()
+        state['concealedTiles'] = concealed
+        game.myself.restoreHandState(state)
+        game.lastDiscard = Tile(discard)
+        result:List[Tuple[Message, Any]] = []
+        self.client.ask(Move(game.players.byName('E'), 'AskForClaims', {'token': None}), CLAIMS).addCallback(
+            result.append)
+        self.assertEqual(len(result), 1)
+        return result[0]
+
+
+class AnytimeAI(Base):
+
+    """the anytime AI answers at its deadline"""
+
+    def deadlineHit(self) ->bool:
+        """did the last answer hit the deadline?"""
+        assert self.client.game
+        return self.client.game.myself.intelligence.deadlineWasHit
+
+    def testNoDeadline(self) ->None:
+        """without a deadline the robot claims pung"""
+        Options.anytime = 0
+        answer, parameter = self.ask('B1B1C2C3S5S6S7DgDgWeWeWnWs', 'B1')
+        self.assertEqual(answer, Message.Pung)
+        self.assertEqual(parameter[0], Meld('B1B1B1'))
+        self.assertFalse(self.deadlineHit())
+
+    def testEnoughTime(self) ->None:
+        """the deadline is far away: same answer"""
+        Options.anytime = 100
+        answer, _ = self.ask('B1B1C2C3S5S6S7DgDgWeWeWnWs', 'B1')
+        self.assertEqual(answer, Message.Pung)
+        self.assertFalse(self.deadlineHit())
+
+    def testDeadline(self) ->None:
+        """no time at all: no optional claim, the best answer so far is NoClaim"""
+        Options.anytime = 100
+        RULESET.claimTimeout = 0
+        answer, _ = self.ask('B1B1C2C3S5S6S7DgDgWeWeWnWs', 'B1')
+        self.assertEqual(answer, Message.NoClaim)
+        self.assertTrue(self.deadlineHit())
+
+    def testMahJonggAtDeadline(self) ->None:
+        """even without time, the robot does not miss Mah Jongg"""
+        Options.anytime = 100
+        RULESET.claimTimeout = 0
+        answer, _ = self.ask('B1B1C2C3C4S5S6S7DgDgDgWeWe', 'B1')
+        self.assertEqual(answer, Message.MahJongg)
+        self.assertTrue(self.deadlineHit())
+
+
+class RobotPoolReplay(Base):
+
+    """a worker process answers like the robot in the server and leaves
+    the random generator in the same state"""
+
+    # with those hands the AI has to choose between equally good discards
+    hands = ('B1B8B9C5C8DbDbS1S2S5S7S7WnWw', 'B2B5B5B7B9C1C2C6DgS3S8S9WeWs',
+             'B1B2B4C1C2C7C9DgS3S5S7S8S9Ww', 'B2B4B8C6C9DrS1S4S5S8WeWnWnWw')
+
+    def setUp(self) ->None:
+        super().setUp()
+        Options.anytime = 0
+        robotpool._rulesets[RULESET.hash] = RULESET
+
+    def answer(self, concealed:str, inPool:bool) ->Tuple[str, Any]:
+        """the answer to what to discard"""
+        game = self.client.game
+        assert game
+        state = game.myself.handState()
+        state['concealedTiles'] = concealed
+        game.myself.restoreHandState(state)
+        game.lastDiscard = None
+        move = Move(game.myself, 'PickedTile', {'token': None})
+        answers:List[Any] = [Message.Discard, Message.Kong, Message.MahJongg]
+        if inPool:
+            view = robotpool.snapshot(game, move, answers, None)
+            name, parameter, randomState, _, _ = robotpool.think(view)
+            game.randomGenerator.setstate(randomState)
+            return name, parameter
+        result:List[Tuple[Message, Any]] = []
+        self.client.ask(move, answers).addCallback(result.append)
+        return result[0][0].name, Message.jelly('parameter', result[0][1])
+
+    def play(self, inPool:bool) ->Tuple[List[Tuple[str, Any]], Any]:
+        """all answers and the final state of the random generator"""
+        game = self.client.game
+        assert game
+        game.randomGenerator.seed(42)
+        return [self.answer(x, inPool) for x in self.hands], game.randomGenerator.getstate()
+
+    def testReplay(self) ->None:
+        """the same seed gives the same game with and without the pool"""
+        answers, randomState = self.play(inPool=False)
+        poolAnswers, poolRandomState = self.play(inPool=True)
+        self.assertEqual(answers, poolAnswers)
+        self.assertTrue(randomState == poolRandomState)
+
+    def testRandomUsed(self) ->None:
+        """the test only means something if the AI needs the random generator"""
+        game = self.client.game
+        assert game
+        game.randomGenerator.seed(42)
+        before = game.randomGenerator.getstate()
+        self.answer(self.hands[0], inPool=False)
+        self.assertTrue(game.randomGenerator.getstate() != before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,19 +10,18 @@ SPDX-License-Identifier: GPL-2.0-only
 import functools
 import types
 
-from typing import List, Any, Optional, Dict, Union, TYPE_CHECKING, Callable, Type, cast
+from typing import List, Any, Optional, Dict, Union, Callable, Type, cast
 
 from twisted.internet.defer import Deferred, succeed, fail
 
 from qt import QPropertyAnimation, QParallelAnimationGroup, \
-    QAbstractAnimation, QEasingCurve
+    QAbstractAnimation, QEasingCurve, QVariantAnimation
 from qt import Property, QGraphicsObject, QGraphicsItem, QPointF, QObject
+from qt import QGraphicsScene, QGraphicsView
 
 from common import Internal, Debug, isAlive, ReprMixin, id4
 from log import logDebug, logFailure
 
-if TYPE_CHECKING:
-    from qt import QGraphicsScene
 
 PropertyType = Union[QPointF,int,float]
 
@@ -136,15 +135,112 @@ class Animation(QPropertyAnimation, ReprMixin):
                            or len(Animation.nextAnimations) > 1000)
                     # change 1000 to 100 if we do not want to animate shuffling and
                     # initial deal
+            shortcuts:Dict['AnimatedMixin', None] = {}
             for animation in Animation.nextAnimations[:]:
                 if shortcutAll or animation.duration() == 0:
-                    cast(AnimatedMixin, animation.targetObject()).shortcutAnimation(animation)
+                    graphicsObject = cast(AnimatedMixin, animation.targetObject())
+                    graphicsObject.shortcutAnimation(animation, finalize=False)
+                    shortcuts[graphicsObject] = None
                     Animation.nextAnimations.remove(animation)
                     needRefresh = True
+            for graphicsObject in shortcuts:
+                graphicsObject.setDrawingOrder()  # type:ignore[attr-defined]
             if needRefresh and Internal.scene:
                 Internal.scene.focusRect.refresh()
 
 
+class BatchedAnimation(QVariantAnimation):
+
+    """drives many Animations with one timer: every step sets the
+    interpolated values of all of them directly, without going through
+    the Qt property system. While any BatchedAnimation runs, the scene
+    does not maintain its item index and the view repaints one rectangle
+    covering all changes"""
+
+    running = 0
+    __previousIndexMethod:Optional['QGraphicsScene.ItemIndexMethod'] = None
+    __previousUpdateMode:Optional['QGraphicsView.ViewportUpdateMode'] = None
+
+    def __init__(self, animations:List[Animation], parent:Optional['QObject']=None) ->None:
+        super().__init__(parent)
+        self.animations = animations
+        self.steps = 0
+        self.moves:List[List[Any]] = []
+        self.curve = QEasingCurve(QEasingCurve.Type.InOutQuad)
+        self.setStartValue(0.0)
+        self.setEndValue(float(max(x.duration() for x in animations)))
+        self.setDuration(int(self.endValue()))
+        for animation in animations:
+            animation.setParent(self)
+        self.valueChanged.connect(self.step)
+
+    def updateState(self, newState:QAbstractAnimation.State, oldState:QAbstractAnimation.State) ->None:
+        """override Qt method"""
+        if newState == QAbstractAnimation.State.Running and oldState == QAbstractAnimation.State.Stopped:
+            self.__prepare()
+            BatchedAnimation.__enterBatchMode()
+        elif newState == QAbstractAnimation.State.Stopped:
+            BatchedAnimation.__leaveBatchMode()
+        super().updateState(newState, oldState)
+
+    def __prepare(self) ->None:
+        """for every animation: setter, start value, difference, end value, duration"""
+        self.moves = []
+        for animation in self.animations:
+            target = cast(QGraphicsObject, animation.targetObject())
+            setter = {'pos': target.setPos, 'rotation': target.setRotation,
+                      'scale': target.setScale}[animation.pName()]
+            start = animation.startValue()
+            end = animation.endValue()
+            self.moves.append([animation, setter, start, end - start, end, animation.duration()])
+
+    def step(self, elapsed:float) ->None:
+        """set all values for this point in time"""
+        self.steps += 1
+        if self.steps % 50 == 0:
+            self.__dropDeadBoards()
+        progress:Dict[int, float] = {}
+        for _, setter, start, difference, end, duration in self.moves:
+            if duration not in progress:
+                progress[duration] = self.curve.valueForProgress(elapsed / duration) if elapsed < duration else 1.0
+            if progress[duration] < 1.0:
+                setter(start + difference * progress[duration])
+            else:
+                setter(end)
+
+    def __dropDeadBoards(self) ->None:
+        """if the board does not exist anymore (game end), we do not want to go on"""
+        for move in self.moves[:]:
+            graphicsObject = cast(AnimatedMixin, move[0].targetObject())
+            if hasattr(graphicsObject, 'board') and not isAlive(graphicsObject.board):
+                graphicsObject.clearActiveAnimation(move[0])
+                self.moves.remove(move)
+                self.animations.remove(move[0])
+
+    @staticmethod
+    def __enterBatchMode() ->None:
+        """the first batch starts"""
+        BatchedAnimation.running += 1
+        if BatchedAnimation.running == 1 and Internal.scene and Internal.mainWindow:
+            view = Internal.mainWindow.centralView
+            BatchedAnimation.__previousIndexMethod = Internal.scene.itemIndexMethod()
+            BatchedAnimation.__previousUpdateMode = view.viewportUpdateMode()
+            Internal.scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
+            view.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.BoundingRectViewportUpdate)
+
+    @staticmethod
+    def __leaveBatchMode() ->None:
+        """the last batch ended"""
+        BatchedAnimation.running -= 1
+        if BatchedAnimation.running == 0 and BatchedAnimation.__previousIndexMethod is not None:
+            if Internal.scene and isAlive(Internal.scene):
+                Internal.scene.setItemIndexMethod(BatchedAnimation.__previousIndexMethod)
+            if Internal.mainWindow and isAlive(Internal.mainWindow.centralView):
+                assert BatchedAnimation.__previousUpdateMode is not None
+                Internal.mainWindow.centralView.setViewportUpdateMode(BatchedAnimation.__previousUpdateMode)
+            BatchedAnimation.__previousIndexMethod = None
+
+
 class ParallelAnimationGroup(QParallelAnimationGroup, ReprMixin):
 
     """
@@ -152,11 +248,14 @@ class ParallelAnimationGroup(QParallelAnimationGroup, ReprMixin):
     doAfter is a list of Deferred to be called when this group
     is done. If another group is chained to this one, transfer
     doAfter to that other group.
+    Groups with at least batchSize animations are driven by one
+    BatchedAnimation.
     """
 
     running : List['ParallelAnimationGroup'] = []  # we need a reference to active animation groups
     current = None
     clsUid = 0
+    batchSize = 20
     def __init__(self, animations:List[Animation], parent:Optional['QObject']=None) ->None:
         super().__init__(parent)
         self.animations = animations
@@ -168,6 +267,7 @@ class ParallelAnimationGroup(QParallelAnimationGroup, ReprMixin):
         self.debug = any(x.debug for x in self.animations)
         self.debug |= f'G{id4(self)}g' in Debug.animation
         self.doAfter:List[Deferred] = []
+        self.batched = len(animations) >= self.batchSize
         if ParallelAnimationGroup.current:
             if self.debug or ParallelAnimationGroup.current.debug:
                 logDebug(f'Chaining Animation group G_{id4(self)} to G{ParallelAnimationGroup.current}')
@@ -197,7 +297,7 @@ class ParallelAnimationGroup(QParallelAnimationGroup, ReprMixin):
     def updateCurrentTime(self, value:int) ->None:
         """count how many steps an animation does."""
         self.steps += 1
-        if self.steps % 50 == 0:
+        if self.steps % 50 == 0 and not self.batched:
             # periodically check if the board still exists.
             # if not (game end), we do not want to go on
             for animation in self.animations:
@@ -218,7 +318,8 @@ class ParallelAnimationGroup(QParallelAnimationGroup, ReprMixin):
                 return fail()
             animatedObject = cast(AnimatedMixin, graphicsObject)
             animatedObject.setActiveAnimation(animation)
-            self.addAnimation(animation)
+            if not self.batched:
+                self.addAnimation(animation)
             propName = animation.pName()
             animation.setStartValue(animatedObject.getValue(propName))
             if propName == 'rotation':
@@ -229,9 +330,11 @@ class ParallelAnimationGroup(QParallelAnimationGroup, ReprMixin):
                     animation.setStartValue(currValue + 360)
                 if currValue - endValue > 180:
                     animation.setStartValue(currValue - 360)
-        for animation in self.animations:
-            if target := animation.targetObject():
+        for target in dict.fromkeys(x.targetObject() for x in self.animations):
+            if target:
                 target.setDrawingOrder()  # type:ignore[attr-defined]
+        if self.batched:
+            self.addAnimation(BatchedAnimation(self.animations))
         self.finished.connect(self.allFinished)
         scene = Internal.scene
         assert scene
@@ -266,9 +369,19 @@ class ParallelAnimationGroup(QParallelAnimationGroup, ReprMixin):
 
     def fixAllBoards(self) ->None:
         """set correct drawing order for all moved graphics objects"""
-        for animation in self.children():
-            if graphicsObject := animation.targetObject():  # type:ignore[attr-defined]
-                graphicsObject.clearActiveAnimation(animation)
+        animations:List[Animation] = []
+        for child in self.children():
+            if isinstance(child, BatchedAnimation):
+                animations.extend(child.animations)
+            else:
+                animations.append(cast(Animation, child))
+        finished:Dict[AnimatedMixin, None] = {}
+        for animation in animations:
+            if graphicsObject := cast(AnimatedMixin, animation.targetObject()):
+                graphicsObject.clearActiveAnimation(animation, finalize=False)
+                finished[graphicsObject] = None
+        for graphicsObject in finished:
+            graphicsObject.finalizeAnimations()
         if Internal.scene:
             Internal.scene.focusRect.refresh()
 
@@ -343,13 +456,14 @@ class AnimatedMixin:
 #        """for mypy"""
 #
 
-    def shortcutAnimation(self, animation:'Animation') ->None:
+    def shortcutAnimation(self, animation:'Animation', finalize:bool=True) ->None:
         """directly set the end value of the animation"""
         if animation.debug:
             logDebug(f'shortcut {animation}: UTile {self.debug_name()}: clear queuedAnimations')
         setattr(self, animation.pName(), animation.endValue())
         self.queuedAnimations = []
-        self.setDrawingOrder()  # type:ignore[attr-defined] # TODO: mypy protocol?
+        if finalize:
+            self.setDrawingOrder()  # type:ignore[attr-defined] # TODO: mypy protocol?
 
     def getValue(self, pName:str) ->Union[QPointF,int,float]:
         """get a current property value"""
@@ -377,12 +491,17 @@ class AnimatedMixin:
         self.activeAnimation[propName] = animation
         self.setCacheMode(QGraphicsItem.CacheMode.ItemCoordinateCache)  # type: ignore[attr-defined]
 
-    def clearActiveAnimation(self, animation:'Animation') ->None:
+    def clearActiveAnimation(self, animation:'Animation', finalize:bool=True) ->None:
         """an animation for this graphics object has ended.
         Finalize graphics object in its new position"""
         del self.activeAnimation[animation.pName()]
         if self.debug_name() in Debug.animation:
             logDebug(f'UITile {self.debug_name()}: clear activeAnimation_{animation.pName()}')
+        if finalize:
+            self.finalizeAnimations()
+
+    def finalizeAnimations(self) ->None:
+        """set drawing order, and if nothing is animated anymore, the cache mode"""
         self.setDrawingOrder()  # type:ignore[attr-defined] # TODO: mypy protocol?
         if not self.activeAnimation:
             self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)  # type: ignore[attr-defined]
@@ -10,31 +10,64 @@ SPDX-License-Identifier: GPL-2.0-only
 
 """
 
-from typing import TYPE_CHECKING, Optional
+import math
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Dict, Tuple
 
+from twisted.internet.threads import deferToThreadPool
 
-from qt import Qt, QPainter, QBrush, QPalette, QPixmapCache, QPixmap
+from qt import Qt, QPainter, QBrush, QPalette, QPixmap, QImage, QSize
 from qt import QSvgRenderer
 
-from log import logException, i18n
+from common import Internal, Debug, isAlive
+from log import logException, logDebug, logFailure, i18n
 from mjresource import Resource
 
 if TYPE_CHECKING:
-    from qt import QWidget, QSize
+    from twisted.internet.defer import Deferred
+    from qt import QWidget
+
+
+def renderImage(graphicsPath:str, width:int, height:int) ->Optional[QImage]:
+    """render the SVG into a QImage. This runs in a worker thread,
+    so it must not touch QPixmap"""
+    renderer = QSvgRenderer(graphicsPath)
+    if not renderer.isValid():
+        return None
+    result = QImage(width, height, QImage.Format.Format_ARGB32_Premultiplied)
+    result.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(result)
+    renderer.render(painter)
+    painter.end()
+    return result
+
 
 class Background(Resource):
 
-    """represents a background"""
+    """represents a background. Rendering a big SVG takes long, so it
+    happens in a worker thread. Meanwhile we show the last rendering
+    of this background, scaled. Renderings are done for sizes rounded up
+    to bucketSize, so a window being resized by dragging mostly reuses
+    them"""
 
     resourceName = 'background'
     configGroupName = 'KMahjonggBackground'
     cache = {}
 
+    bucketSize = 128
+    megabytes = 64  # the least recently used renderings are dropped beyond that
+
+    renderings:'OrderedDict[Tuple[str, int, int], QPixmap]' = OrderedDict()
+    usedBytes = 0
+    pending:Dict[Tuple[str, int, int], 'Deferred'] = {}
+
     def __init__(self, name:Optional[str]=None) ->None:
         """continue __build"""
         super().__init__(name)
         self.graphicsPath = None
-        QPixmapCache.setCacheLimit(20480)  # the chinese landscape needs much
+        self.lastRendering:Optional[QPixmap] = None
+        # the last pixmap we returned if it had to be scaled: rendering, size, scaled
+        self.lastScaled:Optional[Tuple[QPixmap, QSize, QPixmap]] = None
 
         self.tiled = self.group.readEntry('Tiled') == '1'
         if self.tiled:
@@ -53,36 +86,92 @@ class Background(Resource):
                 logException(
                     f'cannot find kmahjongglib/backgrounds/{graphName} for {self.desktopFileName}')
 
-    def __pixmap(self, size:'QSize') ->QPixmap:
-        """return a background pixmap"""
-        if self.isPlain:
-            return QPixmap()
-        width = size.width()
-        height = size.height()
+    def __renderKey(self, size:QSize) ->Tuple[str, int, int]:
+        """the size we render for size"""
         if self.tiled:
-            width = self.imageWidth
-            height = self.imageHeight
-        cachekey = f'{self.name}W{width}H{height}'
-        result = QPixmapCache.find(cachekey)  # type:ignore[call-overload]
-        if not result:
-            renderer = QSvgRenderer(self.graphicsPath)
-            if not renderer.isValid():
-                logException(
-                    i18n('file <filename>%1</filename> contains no valid SVG', self.graphicsPath))
-            result = QPixmap(int(width), int(height))
-            result.fill(Qt.GlobalColor.transparent)
-            painter = QPainter(result)
-            renderer.render(painter)
-            QPixmapCache.insert(cachekey, result)
+            return self.name, int(self.imageWidth), int(self.imageHeight)
+        return (self.name,
+                max(1, math.ceil(size.width() / self.bucketSize)) * self.bucketSize,
+                max(1, math.ceil(size.height() / self.bucketSize)) * self.bucketSize)
+
+    @classmethod
+    def __remember(cls, key:Tuple[str, int, int], pixmap:QPixmap) ->None:
+        """keep pixmap, drop the oldest renderings if we have too many"""
+        cls.renderings[key] = pixmap
+        cls.usedBytes += key[1] * key[2] * 4
+        while cls.usedBytes > cls.megabytes * 1024 * 1024 and len(cls.renderings) > 1:
+            oldKey, _ = cls.renderings.popitem(last=False)
+            cls.usedBytes -= oldKey[1] * oldKey[2] * 4
+
+    def __renderNow(self, key:Tuple[str, int, int]) ->QPixmap:
+        """render for key in the main thread"""
+        assert self.graphicsPath
+        image = renderImage(self.graphicsPath, key[1], key[2])
+        if image is None:
+            logException(
+                i18n('file <filename>%1</filename> contains no valid SVG', self.graphicsPath))
+            return QPixmap()
+        result = QPixmap.fromImage(image)
+        self.__remember(key, result)
         return result
 
-    def brush(self, size:'QSize') ->QBrush:
+    def __renderInThread(self, key:Tuple[str, int, int], onto:'QWidget') ->None:
+        """render for key in a worker thread. When done, show it on onto
+        if onto still has a size wanting this rendering"""
+        if key not in self.pending:
+            reactor = Internal.reactor
+            self.pending[key] = deferToThreadPool(
+                reactor, reactor.getThreadPool(),  # type:ignore[attr-defined]
+                renderImage, self.graphicsPath, key[1], key[2]).addCallback(self.__rendered, key)
+        self.pending[key].addCallback(self.__show, key, onto).addErrback(logFailure)
+
+    def __rendered(self, image:Optional[QImage], key:Tuple[str, int, int]) ->None:
+        """the worker thread is done"""
+        del self.pending[key]
+        if image is None:
+            logException(
+                i18n('file <filename>%1</filename> contains no valid SVG', self.graphicsPath))
+            return
+        self.__remember(key, QPixmap.fromImage(image))
+        if Debug.graphics:
+            logDebug(f'background {self.name} rendered for {key[1]}x{key[2]}')
+
+    def __show(self, unusedResult:None, key:Tuple[str, int, int], onto:'QWidget') ->None:
+        """show the new rendering"""
+        if key in self.renderings and isAlive(onto) and self.__renderKey(onto.size()) == key:
+            self.setPalette(onto)
+
+    def __pixmap(self, size:QSize, onto:Optional['QWidget']=None) ->QPixmap:
+        """return a background pixmap. If it needs to be rendered and
+        onto is given, return the last rendering and render in a worker thread"""
+        if self.isPlain:
+            return QPixmap()
+        key = self.__renderKey(size)
+        if key in self.renderings:
+            self.renderings.move_to_end(key)
+            result = self.renderings[key]
+        elif onto is not None and self.lastRendering is not None:
+            self.__renderInThread(key, onto)
+            result = self.lastRendering
+        else:
+            result = self.__renderNow(key)
+            if result.isNull():
+                return result
+        self.lastRendering = result
+        if self.tiled or result.size() == size:
+            return result
+        if self.lastScaled is None or self.lastScaled[0] is not result or self.lastScaled[1] != size:
+            self.lastScaled = (result, QSize(size), result.scaled(
+                size, Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation))
+        return self.lastScaled[2]
+
+    def brush(self, size:QSize, onto:Optional['QWidget']=None) ->QBrush:
         """background brush"""
-        return QBrush(self.__pixmap(size))
+        return QBrush(self.__pixmap(size, onto))
 
     def setPalette(self, onto:'QWidget') ->None:
         """set a background palette for widget onto"""
         palette = QPalette()
-        mybrush = self.brush(onto.size())
+        mybrush = self.brush(onto.size(), onto)
         palette.setBrush(QPalette.ColorRole.Window, mybrush)
         onto.setPalette(palette)
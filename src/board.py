@@ -19,6 +19,7 @@ from qt import QGraphicsSvgItem
 from tileset import Tileset
 from tile import Tile, elements, Meld, MeldList
 from uitile import UITile, UIMeld
+from tileatlas import TileAtlas
 from guiutil import Painter, rotateCenter, sceneRotation
 from animation import AnimationSpeed, animate, AnimatedMixin
 from message import Message
@@ -199,6 +200,9 @@ class Board(QGraphicsRectItem, ReprMixin):
         self.__yHeight:float = 0
         self.__fixedWidth:float = width
         self.__fixedHeight:float = height
+        # lightDistance of uiTiles by scene position, rotation and scale.
+        # Only valid for the current lightSource, tileset and showShadows
+        self.lightDistances:Dict[Tuple[float, float, float, float], float] = {}
         self._tileset = Tileset()
         self.tileset = tileset
         self.level:int = 0
@@ -504,6 +508,7 @@ class Board(QGraphicsRectItem, ReprMixin):
         """set active lightSource"""
         for uiTile in self:
             uiTile.setClippingFlags()
+        self.lightDistances.clear()
         self._reload(self.tileset, showShadows=newValue)
 
     @property
@@ -546,6 +551,7 @@ class Board(QGraphicsRectItem, ReprMixin):
             self.prepareGeometryChange()
             self._tileset = tileset
             self._lightSource = lightSource
+            self.lightDistances.clear()
             self.setGeometry()
             for uiTile in self:
                 self.placeTile(uiTile)
@@ -850,6 +856,7 @@ class FittingView(QGraphicsView):
     def resizeEvent(self, unusedEvent:Optional['QResizeEvent']) ->None:
         """scale the scene and its background for new view size"""
         assert Internal.Preferences
+        TileAtlas.resizing(self)
         Internal.Preferences.callTrigger(
             'tilesetName')  # this redraws and resizes
         Internal.Preferences.callTrigger('backgroundName')  # redraw background
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+tests for the arbitration of claims in servertable.py
+"""
+
+import unittest
+from types import SimpleNamespace
+from typing import Any, List, Optional
+
+import testfakes  # pylint:disable=unused-import
+from client import Client
+from message import Message
+from servertable import ClaimArbitration
+
+
+def request(player:Any, answer:Optional[Message]=None, user:Any=None) ->Any:
+    """stands for a Request of a DeferredBlock"""
+    return SimpleNamespace(player=player, answer=answer, user=user)
+
+
+class Seat(SimpleNamespace):
+
+    """stands for a PlayingPlayer in the server"""
+
+    def __init__(self, name:str) ->None:
+        super().__init__(name=name, claims=set())
+
+    def mayClaim(self, claim:Message) ->bool:
+        """the claims this player could legally make"""
+        return claim in self.claims
+
+
+class Base(unittest.TestCase):
+
+    """four players, E is the active player and has discarded"""
+
+    def setUp(self) ->None:
+        self.east, self.south, self.west, self.north = (Seat(x) for x in 'ESWN')
+        self.game:Any = SimpleNamespace(
+            players=[self.east, self.south, self.west, self.north], activePlayer=self.east)
+        self.robot = Client()
+
+    def arbitration(self, answers:List[Any]) ->ClaimArbitration:
+        """all answers added"""
+        result = ClaimArbitration(self.game)
+        for answer in answers:
+            result.add(answer)
+        return result
+
+    def kept(self, answers:List[Any]) ->List[Any]:
+        """the answers the server executes"""
+        return self.arbitration(answers).result(answers)
+
+
+class Priority(Base):
+
+    """which claim wins"""
+
+    def testDistance(self) ->None:
+        """seat distance counts from the player after the active player"""
+        arbitration = self.arbitration([])
+        self.assertEqual([arbitration.distance(x) for x in self.game.players], [3, 0, 1, 2])
+
+    def testMahJonggTieBreak(self) ->None:
+        """the player next in turn after the discarder wins"""
+        west = request(self.west, Message.MahJongg)
+        north = request(self.north, Message.MahJongg)
+        self.assertEqual(self.kept([north, west]), [west])
+        south = request(self.south, Message.MahJongg)
+        self.assertEqual(self.kept([west, south, north]), [south])
+
+    def testMahJonggOverAll(self) ->None:
+        """Mah Jongg beats every other claim"""
+        mahJongg = request(self.north, Message.MahJongg)
+        answers = [request(self.south, Message.Chow), request(self.west, Message.Kong), mahJongg]
+        self.assertEqual(self.kept(answers), [mahJongg])
+
+    def testKongPungChow(self) ->None:
+        """Kong beats Pung beats Chow"""
+        chow = request(self.south, Message.Chow)
+        pung = request(self.west, Message.Pung)
+        kong = request(self.north, Message.Kong)
+        self.assertEqual(self.kept([chow, pung]), [pung])
+        self.assertEqual(self.kept([pung, chow]), [pung])
+        self.assertEqual(self.kept([chow, pung, kong]), [kong])
+        self.assertEqual(self.kept([kong, chow]), [kong])
+
+    def testNothing(self) ->None:
+        """NoClaim and OK are never executed"""
+        answers = [request(self.south, Message.NoClaim), request(self.west, Message.OK), request(self.north)]
+        self.assertEqual(self.kept(answers), [])
+
+    def testDiscardKept(self) ->None:
+        """answers which are no claims are kept in their order"""
+        discard = request(self.east, Message.Discard)
+        pung = request(self.west, Message.Pung)
+        chow = request(self.south, Message.Chow)
+        self.assertEqual(self.kept([discard, chow, pung]), [discard, pung])
+        self.assertEqual(self.kept([pung, discard]), [pung, discard])
+
+
+class Decided(Base):
+
+    """may the server stop waiting for the outstanding answers?"""
+
+    def decided(self, answers:List[Any], outstanding:List[Any]) ->bool:
+        """the arbitration after answers"""
+        return self.arbitration(answers).decided(outstanding)
+
+    def testHumans(self) ->None:
+        """a human might say anything"""
+        humans = [request(x) for x in (self.south, self.west, self.north)]
+        self.assertFalse(self.decided([], humans))
+        self.assertTrue(self.decided([], []))
+
+    def testMahJonggNearest(self) ->None:
+        """nobody sitting farther away can beat Mah Jongg"""
+        answers = [request(self.south, Message.MahJongg)]
+        self.assertTrue(self.decided(answers, [request(self.west), request(self.north)]))
+
+    def testMahJonggFarther(self) ->None:
+        """a human sitting closer might also say Mah Jongg"""
+        answers = [request(self.north, Message.MahJongg)]
+        self.assertFalse(self.decided(answers, [request(self.west)]))
+
+    def testRobotsCannotClaim(self) ->None:
+        """robots which cannot claim the discard are not waited for"""
+        robots = [request(x, user=self.robot) for x in (self.south, self.west, self.north)]
+        self.assertTrue(self.decided([], robots))
+
+    def testRobotMayClaim(self) ->None:
+        """wait for robots which could beat the best claim"""
+        self.south.claims = {Message.Chow}
+        self.north.claims = {Message.Pung, Message.MahJongg}
+        south = request(self.south, user=self.robot)
+        north = request(self.north, user=self.robot)
+        self.assertFalse(self.decided([], [south]))
+        self.assertTrue(self.decided([request(self.west, Message.Pung)], [south]))
+        self.assertFalse(self.decided([request(self.west, Message.Pung)], [south, north]))
+        self.assertTrue(self.decided([request(self.west, Message.MahJongg)], [north]))
+        self.assertFalse(self.decided([request(self.north, Message.MahJongg)], [request(self.west)]))
+
+    def testLateAnswer(self) ->None:
+        """after the decision, answers do not change the result"""
+        pung = request(self.west, Message.Pung)
+        south = request(self.south, user=self.robot)
+        arbitration = self.arbitration([pung])
+        self.assertTrue(arbitration.decided([south]))
+        south.answer = Message.MahJongg
+        arbitration.add(south)
+        self.assertTrue(arbitration.decided([]))
+        self.assertEqual(arbitration.result([pung, south]), [pung])
+
+
+if __name__ == '__main__':
+    unittest.main()
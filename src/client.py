@@ -8,13 +8,14 @@ SPDX-License-Identifier: GPL-2.0-only
 """
 
 import datetime
+import time
 import weakref
 from types import ModuleType
-from typing import Tuple, Optional, List, Type, Any, TYPE_CHECKING, Union, cast
+from typing import Tuple, Optional, List, Type, Any, TYPE_CHECKING, Union, Dict, cast
 
 from twisted.spread import pb
 from twisted.internet.task import deferLater
-from twisted.internet.defer import Deferred, succeed, fail
+from twisted.internet.defer import Deferred, DeferredList, succeed, fail
 from twisted.python.failure import Failure
 from util import Duration
 from log import logDebug, logException, logWarning, logFailure
@@ -32,6 +33,7 @@ from player import PlayingPlayer
 
 import intelligence
 import altint
+from robotpool import RobotPool
 
 
 if TYPE_CHECKING:
@@ -97,6 +99,9 @@ class ClientTable(Table):
             autoPlay,
             wantedGame)
         self.client = client
+        # as sent by the server, see Client.applyTableDelta
+        self.simpleList = [tableid, ruleset, gameid, suspendedAt, running, playOpen,
+                           autoPlay, wantedGame, playerNames, playersOnline, endValues]
         self.gameid = gameid
         self.playerNames = playerNames
         self.playersOnline = playersOnline
@@ -137,12 +142,18 @@ class Client(pb.Referenceable):
     so we can also use it on the server for robot clients. Compare
     with HumanClient(Client)"""
 
+    # anytime AI: how many answers were computed in a worker thread
+    # and how often the deadline forced the best answer found so far
+    anytimeAnswers = 0
+    anytimeDeadlineHits = 0
+
     def __init__(self, name:Optional[str]=None) ->None:
         """name is something like Robot 1 or None for the game server"""
         self.name = name
         self.game:Optional['PlayingGame'] = None
         self.__connection:Optional['Connection'] = None
         self.tables:List[ClientTable] = []
+        self.tableShards:Dict[int, Optional[int]] = {}  # the server process owning the table
         self._table:Union[ClientTable, 'ServerTable', None] = None
         self.tableList:Optional['TableList'] = None
         self.voiceId:Optional[str]  # only for mypy in servertable.py
@@ -230,6 +241,34 @@ class Client(pb.Referenceable):
         if table:
             self.tables.remove(table)
 
+    def applyTableDelta(self, shard:Optional[int], added:List[List[Any]],  # pylint:disable=too-many-positional-arguments
+                        changed:List[Tuple[int, Dict[int, Any]]], removed:List[int], snapshot:bool) ->None:
+        """update table list, see MJServer.sendTableDelta. A snapshot
+        replaces all tables we got from that server process"""
+        if snapshot:
+            addedIds = {x[0] for x in added}
+            removed = [x for x, source in self.tableShards.items() if source == shard and x not in addedIds]
+        for tableid in removed:
+            self.tableShards.pop(tableid, None)
+            Client.remote_tableRemoved(self, tableid, '')
+        for tableid, fields in changed:
+            table = self._tableById(tableid)
+            if table:
+                data = list(table.simpleList)
+                for idx, value in fields.items():
+                    data[idx] = value
+                self.tableChanged(data)
+        newTables = []
+        for data in added:
+            if self._tableById(data[0]):
+                # only for snapshots
+                self.tableChanged(data)
+            else:
+                newTables.append(data)
+            self.tableShards[data[0]] = shard
+        if newTables:
+            Client.remote_newTables(self, newTables)
+
     def reserveGameId(self, gameid:int) ->Message:
         """the game server proposes a new game id. We check if it is available
         in our local data base - we want to use the same gameid everywhere"""
@@ -347,16 +386,78 @@ class Client(pb.Referenceable):
                             f'for {self.game.lastDiscard.name()} because timeout is over')
         return result
 
+    @classmethod
+    def anytimeStatistics(cls) ->str:
+        """how often did the anytime AI hit its deadline?"""
+        return f'anytime AI: {cls.anytimeDeadlineHits} of {cls.anytimeAnswers} answers hit the deadline'
+
+    def __selectAnswer(self, move:Move, answers:List['ClientMessage'],
+        deadline:Optional[float]=None) ->Tuple[Message, Any]:
+        """the robot AI. With a deadline, it stops thinking about optional
+        claims when the deadline is hit and returns the best answer found so far"""
+        assert self.game
+        myself = self.game.myself
+        myself.intelligence.deadline = deadline
+        myself.intelligence.deadlineWasHit = False
+        cast(PlayingPlayer, myself).computeSayable(move, answers)
+        return myself.intelligence.selectAnswer(answers)
+
+    def __deadline(self) ->float:
+        """anytime AI: when Options.anytime percent of claimTimeout
+        have passed, the AI returns the best answer found so far"""
+        assert self.game
+        return time.monotonic() + self.game.ruleset.claimTimeout * Options.anytime / 100
+
+    def __counted(self, result:Tuple[Message, Any]) ->Tuple[Message, Any]:
+        """anytime AI: count answers and deadline hits"""
+        Client.anytimeAnswers += 1
+        if self.game and self.game.myself.intelligence.deadlineWasHit:
+            Client.anytimeDeadlineHits += 1
+            if Debug.robotAI:
+                self.game.debug(f'{self.game.myself}: deadline hit, {self.anytimeStatistics()}')
+        return result
+
+    def __thinkWithDeadline(self, move:Move, answers:List['ClientMessage']) ->Tuple[Message, Any]:
+        """anytime AI: think in the reactor thread, but not longer than the deadline.
+        A worker thread would share the game with the reactor which goes on
+        executing moves, see RobotPool for thinking on a snapshot"""
+        return self.__counted(self.__selectAnswer(move, answers, self.__deadline()))
+
+    def __thinkInProcess(self, move:Move, answers:List['ClientMessage']) ->Deferred:
+        """compute the answer in one of the --aiprocesses worker processes.
+        If that fails, think here"""
+        def failed(failure:Failure) ->Union[Failure, Tuple[Message, Any]]:
+            """the worker process could not answer"""
+            if not self.game:
+                # the game has been aborted meanwhile. There is no valid
+                # answer, so pass the failure on to be logged
+                return failure
+            logWarning(f'robot AI process failed, {self.name} thinks in the server: {failure.getErrorMessage()}')
+            return self.__selectAnswer(move, answers)
+        result = RobotPool.selectAnswer(self, move, answers, self.__deadline() if Options.anytime else None)
+        if Options.anytime:
+            result.addCallback(self.__counted)
+        return result.addErrback(failed)
+
     def ask(self, move:Move, answers:List['ClientMessage']) ->Deferred:
         """place the robot AI here.
         send answer and one parameter to server"""
+        assert self.game
+        if Options.aiProcesses and len(answers) > 1:
+            # a question with only one possible answer is not worth the overhead
+            return self.__thinkInProcess(move, answers).addCallback(self.__answered)
+        if Options.anytime:
+            return self.__answered(self.__thinkWithDeadline(move, answers))
+        return self.__answered(self.__selectAnswer(move, answers))
+
+    def __answered(self, result:Tuple[Message, Any]) ->Deferred:
+        """the AI found an answer. Chow is delayed, see __delayAnswer"""
         delay = 0.0
         delayStep = 0.1
-        assert self.game
-        myself = self.game.myself
-        cast(PlayingPlayer, myself).computeSayable(move, answers)
-        result = myself.intelligence.selectAnswer(answers)
         assert result
+        if not self.game:
+            # game has been aborted while the AI was thinking
+            return succeed(result)
         if result[0] == Message.Chow:
             if Debug.delayChow and self.game.lastDiscard:
                 self.game.debug(f'{self.game.myself.name} waits to see if somebody '
@@ -407,6 +508,17 @@ class Client(pb.Referenceable):
                 return fail(exc)
             return result
 
+    def remote_moves(self, moves:List[Tuple[List[Any], Dict[str, Any]]]) ->Deferred:
+        """the server batched several notifications into one call,
+        see MJServer.queueMove. Every move is executed on its own, a failing
+        move does not fail the others. We answer with a list holding
+        (True, answer) or (False, error message) for every move"""
+        def answers(results:List[Tuple[bool, Any]]) ->List[Tuple[bool, Any]]:
+            """a Failure cannot go over the wire"""
+            return [(True, x) if success else (False, x.getErrorMessage()) for success, x in results]
+        return DeferredList(
+            [self.remote_move(*args, **kwargs) for args, kwargs in moves], consumeErrors=True).addCallback(answers)
+
     def exec_move(self, move:Move) ->Deferred:
         """mirror the move of a player as told by the game server"""
         message = move.message
@@ -20,14 +20,14 @@ from signal import signal, SIGABRT, SIGINT, SIGTERM
 from typing import Optional, Any, Union, List
 from typing import TYPE_CHECKING, Iterable, Generator, Literal, cast
 
-from qt import QStandardPaths, QObject, modeltest_is_supported, qtpy_isalive
+# Qt is only imported where needed: kajongg.py --rulesets does not need it
 
 if TYPE_CHECKING:
     from tile import Tile
     from mainwindow import MainWindow
     from twisted.internet.interfaces import IReactorCore
     from config import SetupPreferences
-    from qt import QGraphicsItem
+    from qt import QGraphicsItem, QObject
     from scene import GameScene
 
 # pylint: disable=invalid-name
@@ -44,10 +44,11 @@ else:
 LIGHTSOURCES = cast(Union[Literal['NE'], Literal['NW'], Literal['SW'], Literal['SE']], ['NE', 'NW', 'SW', 'SE'])
 
 
-def isAlive(qobj: Union[QObject, 'QGraphicsItem', None]) ->bool:
+def isAlive(qobj: Union['QObject', 'QGraphicsItem', None]) ->bool:
     """check if the underlying C++ object still exists"""
     if qobj is None:
         return False
+    from qt import qtpy_isalive
     result = qtpy_isalive(qobj)
     if not result and Debug.isalive:
         print('NOT alive:', repr(qobj))
@@ -94,13 +95,18 @@ def clientAppdataDir() ->str:
     if not os.path.exists(serverDir):
         # the client wants to place the socket in serverDir
         os.makedirs(serverDir)
-    result = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
-    # this may end with kajongg.py or .pyw or whatever, so fix that:
-    if not os.path.isdir(result):
-        result = os.path.dirname(result)
-    if not result.endswith('kajongg'):
-        # when called first, QApplication.applicationName is not yet set
-        result = result + '/kajongg'
+    if sys.platform.startswith('linux'):
+        # what Qt does, but without loading Qt: kajongg.py --rulesets does not need it
+        result = os.path.expanduser(os.environ.get('XDG_DATA_HOME', '~/.local/share') + '/kajongg')
+    else:
+        from qt import QStandardPaths
+        result = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+        # this may end with kajongg.py or .pyw or whatever, so fix that:
+        if not os.path.isdir(result):
+            result = os.path.dirname(result)
+        if not result.endswith('kajongg'):
+            # when called first, QApplication.applicationName is not yet set
+            result = result + '/kajongg'
     if not os.path.exists(result):
         os.makedirs(result)
     return result
@@ -196,6 +202,7 @@ class Debug:
     i18n = False
     isalive = False
     uitiles = False
+    checkTiles = False
 
     def __init__(self) ->None:
         raise TypeError('Debug is not meant to be instantiated')
@@ -249,9 +256,11 @@ Options {', '.join(stringOptions)} take a string argument like {stringExample}.
                 type.__setattr__(Debug, option, value)
         if Debug.time:
             Debug.timestamp = datetime.datetime.now()
-        if Debug.modelTest and not modeltest_is_supported():
-            print('--debug=modelTest is not yet supported for pyside, use pyqt')
-            sys.exit(2)
+        if Debug.modelTest:
+            from qt import modeltest_is_supported
+            if not modeltest_is_supported():
+                print('--debug=modelTest is not yet supported for pyside, use pyqt')
+                sys.exit(2)
         return ''
 
     @staticmethod
@@ -332,7 +341,14 @@ class Options(metaclass=FixedClass):
     playOpen = False
     gui = False
     AI = 'DefaultAI'
+    anytime = 0  # percent of claimTimeout for the robot AI, 0 means unlimited
+    workers = 0  # game server: number of worker processes owning the tables, see shard.py
+    shard:Optional[int] = None  # game server: if this is a worker process, its index
+    aiProcesses = 0  # game server: number of processes computing the robot AI, see robotpool.py
+    metrics:Optional[str] = None  # game server: UNIX socket or local port for metrics.py
+    metricsLog = 0  # game server: log a metrics summary every that many seconds
     csv = None
+    profileStartup = False
     continueServer = False
     fixed = False
 
@@ -9,6 +9,7 @@ SPDX-License-Identifier: GPL-2.0-only
 
 import traceback
 import datetime
+import time
 import weakref
 import gc
 from typing import List, Dict, Any, TYPE_CHECKING, Optional, Tuple, Union, Sequence, Generator, cast
@@ -21,6 +22,7 @@ from mi18n import i18nE
 from message import Message
 from common import Debug, ReprMixin, id4
 from move import Move
+from metrics import Metrics
 
 if TYPE_CHECKING:
     from player import PlayingPlayer
@@ -28,7 +30,7 @@ if TYPE_CHECKING:
     from user import User
     from game import PlayingGame
     from twisted.python.failure import Failure
-    from servertable import ServerTable, ServerGame
+    from servertable import ServerTable, ServerGame, ClaimArbitration
 
 
 class Request(ReprMixin):
@@ -126,6 +128,11 @@ class DeferredBlock(ReprMixin):
     """holds a list of deferreds and waits for each of them individually,
     with each deferred having its own independent callbacks. Fires a
     'general' callback after all deferreds have returned.
+    If arbitration is set, every answer is added to it as it arrives. If
+    the arbitration has decided, the general callback fires without waiting
+    for the outstanding answers. Late answers are then ignored.
+    The time until the general callback goes into Metrics, also under
+    the name metric if set.
     Usage: 1. define, 2. add requests, 3. set callback"""
 
     blocks : List['DeferredBlock'] = []
@@ -142,6 +149,9 @@ class DeferredBlock(ReprMixin):
         self.requests:List[Request] = []
         self.callbackMethod = None
         self.__callbackArgs:Optional[Tuple[Any,...]] = None
+        self.arbitration:Optional['ClaimArbitration'] = None
+        self.metric:Optional[str] = None
+        self.started = time.monotonic()
         self.completed = False
         if not temp:
             DeferredBlock.blocks.append(self)
@@ -235,12 +245,19 @@ class DeferredBlock(ReprMixin):
         if request in self.requests:
             # after having lost connection to client, an answer could still be
             # in the pipe
+            if self.completed:
+                # we decided without waiting for this answer
+                if Debug.deferredBlock:
+                    self.debug('LATE', request.pretty())
+                return
             if result is None:
                 if Debug.deferredBlock:
                     self.debug('IGN', request.pretty())
                 return
             request.gotAnswer(result)
             assert request.answer
+            if self.arbitration:
+                self.arbitration.add(request)
             if hasattr(request.user, 'pinged'):
                 # a Client (for robots) does not have it
                 request.user.pinged()
@@ -295,9 +312,20 @@ class DeferredBlock(ReprMixin):
         if self.completed:
             return
         assert self.outstanding >= 0, f'callbackIfDone: outstanding {int(self.outstanding)}'
-        if self.outstanding == 0 and self.callbackMethod is not None:
+        if self.callbackMethod is None:
+            return
+        early = self.outstanding > 0 and self.arbitration is not None and self.arbitration.decided(
+            [x for x in self.requests if not x.answer])
+        if self.outstanding == 0 or early:
             self.completed = True
-            if any(not x.answer for x in self.requests):
+            elapsed = time.monotonic() - self.started
+            Metrics.observe('deferredBlock', elapsed, self.table.tableid)
+            if self.metric:
+                Metrics.observe(self.metric, elapsed, self.table.tableid)
+            if early:
+                if Debug.deferredBlock:
+                    self.debug('DEC', f'not waiting for {self.outstandingStr()}')
+            elif any(not x.answer for x in self.requests):
                 self.logBug(
                     f'Block {str(self)}: Some requests are unanswered')
             if Debug.deferredBlock:
@@ -407,6 +435,7 @@ class DeferredBlock(ReprMixin):
             assert self.table.game
             self.table.game.moves.append(Move(aboutPlayer, command, kwargs))
         localDeferreds = []
+        compactKwargs = None
         for rec in self.__convertReceivers(receivers):
             defer:Deferred
             isClient = rec.__class__.__name__.endswith('Client')
@@ -422,12 +451,24 @@ class DeferredBlock(ReprMixin):
                     message = (f"-> {rec.name[:15] if rec.name else 'NOBODY':<15} "
                                f"about {aboutPlayer} {command}{kwargs!r}")
                     logDebug(message)
-                defer = self.table.server.callRemote(
-                    rec,  # type:ignore[arg-type]
-                    'move',
-                    aboutName,
-                    command.name,
-                    **kwargs)
+                if cast('User', rec).protocol >= 1:
+                    if compactKwargs is None:
+                        compactKwargs = Move.compact(kwargs)
+                    if 'notifying' in kwargs:
+                        defer = self.table.server.queueMove(
+                            rec,  # type:ignore[arg-type]
+                            aboutName, command.name, **compactKwargs)
+                    else:
+                        defer = self.table.server.callRemote(
+                            rec,  # type:ignore[arg-type]
+                            'move', aboutName, command.name, **compactKwargs)
+                else:
+                    defer = self.table.server.callRemote(
+                        rec,  # type:ignore[arg-type]
+                        'move',
+                        aboutName,
+                        command.name,
+                        **kwargs)
                 if defer:
                     defer.command = command.name  # type:ignore[attr-defined]
                     defer.notifying = 'notifying' in kwargs  # type:ignore[attr-defined]
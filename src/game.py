@@ -425,7 +425,7 @@ class Game:
 
     def maybeRotateWinds(self) ->bool:
         """rules which make winds rotate"""
-        result = [x for x in self.ruleset.filterRules('rotate') if x.rotate(self)]  # type:ignore[attr-defined]
+        result = [rule for rule, rotate in self.ruleset.hooks('rotate') if rotate(self)]
         if result:
             if Debug.explain:
                 if not self.belongsToRobotPlayer():
@@ -867,8 +867,9 @@ class PlayingGame(Game):
                     if Debug.sound:
                         logDebug(f'{player.name} has own local voice {player.voice}')
             if player.voice:
+                sizes = player.voice.sizes()
                 for voice in Voice.availableVoices():
-                    if (voice in available
+                    if (voice in available and voice.sizes() == sizes
                             and voice.md5sum == player.voice.md5sum):
                         # if the local voice is also predefined,
                         # make sure we do not use both
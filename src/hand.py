@@ -10,10 +10,10 @@ SPDX-License-Identifier: GPL-2.0-only
 Read the user manual for a description of the interface to this scoring engine
 """
 
-from itertools import chain
+from itertools import chain, groupby
 import weakref
 from hashlib import md5
-from typing import List, Optional, TYPE_CHECKING, Set, Dict, Tuple, Type, Any, Union
+from typing import List, Optional, TYPE_CHECKING, Set, Dict, Tuple, Type, Any, Union, Generator, Callable
 
 from log import dbgIndent
 from tile import Tile, TileList, TileTuple, Meld, MeldList
@@ -22,6 +22,8 @@ from rule import Score, UsedRule
 from common import Debug, ReprMixin, num_encode
 from util import callers
 from message import Message
+from metrics import Metrics
+from intelligence import AIDefaultAI
 
 if TYPE_CHECKING:
     from player import Player
@@ -62,6 +64,7 @@ class Hand(ReprMixin):
     # pylint: disable=too-many-instance-attributes
 
     indent = 0
+    pruning = True  # skip arrangements which cannot win, see __arrange
     class __NotWon(UserWarning):  # pylint: disable=invalid-name
 
         """should be won but is not a winning hand"""
@@ -78,6 +81,7 @@ class Hand(ReprMixin):
             if cacheKey in cache:
                 result = cache[cacheKey]
                 player.cacheHits += 1
+                Metrics.count('handsFromCache')
                 result.is_from_cache = True
                 return result
             player.cacheMisses += 1
@@ -99,6 +103,7 @@ class Hand(ReprMixin):
         self.is_from_cache:bool
         if self.is_from_cache:
             return
+        Metrics.count('handsComputed')
 
         # shortcuts for speed:
         self._player = weakref.ref(player)
@@ -629,11 +634,11 @@ class Hand(ReprMixin):
                 return result
         return []
 
-    def __arrangements(self) ->List[Tuple['Rule', MeldList]]:
-        """find all legal arrangements.
-        Returns a list of tuples with the mjRule and a list of concealed melds"""
+    def __arrangements(self) ->Generator[Tuple['Rule', List[MeldList]], None, None]:
+        """find all legal arrangements, one MJ rule after the other.
+        Yields tuples with the mjRule and all lists of concealed melds it found"""
         self.unusedTiles.sort()
-        result:List[Tuple['Rule', MeldList]] = []
+        found = False
         stdMJ = self.ruleset.standardMJRule
         assert stdMJ
         if self.mjRule:
@@ -644,6 +649,7 @@ class Hand(ReprMixin):
             if ((self.lenOffset == 1 and mjRule.appliesToHand(self))
                     or (self.lenOffset < 1 and mjRule.shouldTry(self))):  # type:ignore[attr-defined]
                 if self.unusedTiles:
+                    arrangements = []
                     unused = TileList(Tile(x) for x in self.unusedTiles)
                     for melds, rest2 in mjRule.rearrange(self, unused):  # type:ignore[attr-defined]
                         if rest2:
@@ -651,12 +657,44 @@ class Hand(ReprMixin):
                             restMelds, _ = next(
                                 stdMJ.rearrange(self, rest2[:]))  # type:ignore[attr-defined]
                             melds.extend(restMelds)
-                        result.append((mjRule, melds))
-        if not result:
-            result.extend(
-                (stdMJ, x[0])
-                for x in stdMJ.rearrange(self, self.unusedTiles[:]))  # type:ignore[attr-defined]
-        return result
+                        arrangements.append(melds)
+                    if arrangements:
+                        found = True
+                        yield mjRule, arrangements
+        if not found:
+            yield stdMJ, [x for x, _ in stdMJ.rearrange(self, self.unusedTiles[:])]  # type:ignore[attr-defined]
+
+    def __completed(self, melds:MeldList) ->Tuple[MeldList, Tile]:
+        """all melds of the Hand with the concealed melds, and its last tile.
+        A discarded last tile exposes the shortest meld it completes"""
+        allMelds = MeldList(self.melds[:] + list(melds))
+        lastTile = self.lastTile
+        if self.lastSource and self.lastSource.isDiscarded:
+            lastTile = lastTile.exposed
+            lastMelds = sorted(
+                (x for x in allMelds if not x.isDeclared and lastTile.concealed in x),
+                key=lambda x: len(x)) # pylint: disable=unnecessary-lambda
+            if lastMelds:
+                allMelds.remove(lastMelds[0])
+                allMelds.append(lastMelds[0].exposed)
+        return allMelds, lastTile
+
+    def __unpruned(self, candidates:List[Tuple[MeldList, MeldList, Tile]], bound:'ScoreBound',
+            bestValue:Callable[[], Optional[int]], depth:int=0) ->Generator[Tuple[MeldList, MeldList, Tile], None, None]:
+        """candidates are tuples with the concealed melds, all melds and the last tile.
+        They share their first depth concealed melds. Yield them in their order, but
+        leave out the groups sharing one more meld if they cannot beat the best Hand"""
+        for _, group in groupby(candidates, key=lambda x: tuple(x[0][depth:depth + 1])):
+            groupList = list(group)
+            value = bestValue()
+            if value is not None and bound.prefix(
+                    MeldList(groupList[0][0][:depth + 1]), [x[1] for x in groupList]) <= value:
+                Metrics.count('prunedArrangements', len(groupList))
+                continue
+            if len(groupList) > 1 and any(len(x[0]) > depth + 1 for x in groupList):
+                yield from self.__unpruned(groupList, bound, bestValue, depth + 1)
+            else:
+                yield from groupList
 
     def __arrange(self) ->None:
         """work hard to always return the variant with the highest Mah Jongg value."""
@@ -676,32 +714,44 @@ class Hand(ReprMixin):
                     raise Hand.__NotWon('Long Hand with no unused tiles')
                 self.mjRule = mjRules[0]
             return
-        wonHands = []
-        lostHands = []
-        for mjRule, melds in self.__arrangements():
-            allMelds = self.melds[:] + list(melds)
-            lastTile = self.lastTile
-            if self.lastSource and self.lastSource.isDiscarded:
-                lastTile = lastTile.exposed
-                lastMelds = sorted(
-                    (x for x in allMelds if not x.isDeclared and lastTile.concealed in x),
-                    key=lambda x: len(x)) # pylint: disable=unnecessary-lambda
-                if lastMelds:
-                    allMelds.remove(lastMelds[0])
-                    allMelds.append(lastMelds[0].exposed)
-            _ = self.newString(
-                MeldList(chain(allMelds, self.bonusMelds)),
-                unusedTiles=None, lastTile=lastTile, lastMeld=None)
-            tryHand = Hand(self.player, _, prevHand=self)
-            if tryHand.won:
-                tryHand.mjRule = mjRule
-                wonHands.append((mjRule, melds, tryHand))
-            else:
-                lostHands.append((mjRule, melds, tryHand))
-        # we prefer a won Hand even if a lost Hand might have a higher score
-        tryHands = wonHands if wonHands else lostHands
-        bestRule, bestVariant, _ = max(tryHands, key=lambda x: x[2])
-        if wonHands:
+        # we prefer a won Hand even if a lost Hand might have a higher score.
+        # Only a won Hand can beat the best won Hand, and we only build the
+        # Hands for those arrangements which might score more, see ScoreBound
+        bestWon:Optional[Tuple['Rule', MeldList, 'Hand']] = None
+        bestLost:Optional[Tuple['Rule', MeldList, 'Hand']] = None
+        intelligence = self.player.intelligence
+        # ScoreBound knows total(), other AIs may value hands differently
+        pruning = Hand.pruning and type(intelligence).handValue is AIDefaultAI.handValue
+        bound = ScoreBound(self)
+
+        def bestValue() ->Optional[int]:
+            """the value of the best Hand found so far, None if we cannot prune"""
+            best = bestWon if bestWon or self.won else bestLost
+            if pruning and best and best[2].arranged:
+                return intelligence.handValue(best[2])
+            return None
+
+        for mjRule, arrangements in self.__arrangements():
+            candidates = [(x, *self.__completed(x)) for x in arrangements]
+            for melds, allMelds, lastTile in self.__unpruned(candidates, bound, bestValue):
+                value = bestValue()
+                if value is not None and bound.complete(allMelds, lastTile) <= value:
+                    Metrics.count('prunedArrangements')
+                    continue
+                _ = self.newString(
+                    MeldList(chain(allMelds, self.bonusMelds)),
+                    unusedTiles=None, lastTile=lastTile, lastMeld=None)
+                tryHand = Hand(self.player, _, prevHand=self)
+                if tryHand.won:
+                    tryHand.mjRule = mjRule
+                    if bestWon is None or tryHand > bestWon[2]:
+                        bestWon = (mjRule, melds, tryHand)
+                elif bestLost is None or tryHand > bestLost[2]:
+                    bestLost = (mjRule, melds, tryHand)
+        best = bestWon or bestLost
+        assert best
+        bestRule, bestVariant, _ = best
+        if bestWon:
             self.mjRule = bestRule
         self.melds.extend(bestVariant)
         self.melds.sort()
@@ -832,3 +882,169 @@ class Hand(ReprMixin):
         for part in range(4):
             result = (result << 8) + digest[part]
         return result
+
+
+class Arrangement:
+
+    """stands for the Hand an arrangement of hand would become, as far as
+    the rules for the whole hand can see it before that Hand is built.
+    Without melds, only the tiles are known. Asking for anything else
+    raises Undecided"""
+
+    known = frozenset(('values', 'suits', 'lenOffset', 'lastSource', 'announcements',
+                       'bonusMelds', 'ownWind', 'roundWind', 'player', 'ruleset', 'robbedTile', 'won'))
+
+    class Undecided(UserWarning):
+
+        """the rule needs to know more"""
+
+    def __init__(self, hand:Hand, melds:Optional[MeldList]=None, lastTile:Optional[Tile]=None) ->None:
+        self.hand = hand
+        self.__melds = melds
+        self.lastTile = hand.lastTile if lastTile is None else lastTile
+        self.ruleCache:Dict[Tuple[Type, str], Any] = {}
+
+    def __getattr__(self, name:str) ->Any:
+        if name in self.known:
+            return getattr(self.hand, name)
+        raise Arrangement.Undecided(name)
+
+    def __add__(self, addTiles:Any) ->Hand:
+        """the rule wants to try another Hand"""
+        raise Arrangement.Undecided('+')
+
+    def __sub__(self, subtractTiles:Any) ->Hand:
+        """the rule wants to try another Hand"""
+        raise Arrangement.Undecided('-')
+
+    @property
+    def melds(self) ->MeldList:
+        """all melds if we know them"""
+        if self.__melds is None:
+            raise Arrangement.Undecided('melds')
+        return self.__melds
+
+    @property
+    def declaredMelds(self) ->MeldList:
+        """like Hand.declaredMelds"""
+        return MeldList(x for x in self.melds if x.isDeclared)
+
+    @property
+    def tiles(self) ->TileList:
+        """like Hand.tiles. A discarded last tile will expose some of them,
+        without melds we do not know which"""
+        if self.__melds is not None:
+            return TileList(TileList(TileTuple(self.__melds)).sorted())
+        if self.hand.lastSource.isDiscarded:
+            raise Arrangement.Undecided('tiles')
+        return self.hand.tiles
+
+    def applies(self, rule:'Rule') ->Optional[bool]:
+        """does rule apply to the Hand? None if we cannot know yet"""
+        try:
+            return bool(rule.appliesToHand(self))
+        except Arrangement.Undecided:
+            return None
+
+
+class ScoreBound:
+
+    """the most a Hand made out of the unused tiles of hand can score, without
+    building that Hand: what the meld rules give for its melds, and what the
+    rules for the whole hand may still add. Rules deciding by the tiles alone
+    are only asked once, rules for the whole hand looking at the melds can
+    tell by mayApplyToMelds if they cannot apply to a partial arrangement,
+    see RuleCode"""
+
+    def __init__(self, hand:Hand) ->None:
+        self.hand = hand
+        self.ruleset = hand.ruleset
+        self.meldScores:Dict[Meld, Score] = {}
+        self.__tilesScore:Optional[Score] = None  # the rules applying whatever the melds
+        self.__handRules:List['Rule'] = []  # the rules looking at the melds
+        self.__mjRules:List['Rule'] = []  # a won hand gets one of them
+        self.__mjRulesAsked:List['Rule'] = []  # the MJ rules looking at the melds
+
+    @staticmethod
+    def positive(score:Score) ->Score:
+        """only what a rule can add"""
+        return Score(max(score.points, 0), max(score.doubles, 0), max(score.limits, 0.0))
+
+    def __askTiles(self) ->None:
+        """ask all rules for the whole hand if the tiles decide"""
+        arrangement = Arrangement(self.hand)
+        self.__tilesScore = Score(ruleset=self.ruleset)
+        won = self.hand.won
+        for rule in self.ruleset.handRules + (self.ruleset.winnerRules if won else self.ruleset.loserRules):
+            applies = arrangement.applies(rule)
+            if applies is None:
+                self.__handRules.append(rule)
+            elif applies:
+                self.__tilesScore += self.positive(rule.score)
+        if won:
+            for rule in self.ruleset.mjRules:
+                applies = arrangement.applies(rule)
+                if applies is None:
+                    self.__mjRulesAsked.append(rule)
+                elif applies:
+                    self.__mjRules.append(rule)
+
+    def __mayApply(self, rule:'Rule', melds:MeldList, rest:TileList,
+            arrangement:Optional[Arrangement]) ->bool:
+        """False if rule cannot apply to a Hand with melds. rest are the tiles
+        for more melds. arrangement knows all melds, without it we ask the rule"""
+        if arrangement:
+            applies = arrangement.applies(rule)
+            if applies is not None:
+                return applies
+        if hasattr(rule, 'mayApplyToMelds'):
+            return bool(rule.mayApplyToMelds(self.hand, melds, rest))
+        return True
+
+    def __rules(self, melds:MeldList, rest:TileList, arrangement:Optional[Arrangement]=None) ->Score:
+        """the most the rules for the whole hand can add"""
+        if self.__tilesScore is None:
+            self.__askTiles()
+        assert self.__tilesScore is not None
+        result = self.__tilesScore
+        for rule in self.__handRules:
+            if self.__mayApply(rule, melds, rest, arrangement):
+                result += self.positive(rule.score)
+        mjScores = [self.positive(x.score) for x in chain(self.__mjRules, (
+            x for x in self.__mjRulesAsked if self.__mayApply(x, melds, rest, arrangement)))]
+        if mjScores:
+            result += Score(max(x.points for x in mjScores), max(x.doubles for x in mjScores),
+                            max(x.limits for x in mjScores))
+        return result
+
+    def __melds(self, melds:MeldList) ->Score:
+        """what the meld rules give for melds and the bonus tiles"""
+        result = Score(ruleset=self.ruleset)
+        for meld in chain(melds, self.hand.bonusMelds):
+            if meld not in self.meldScores:
+                self.meldScores[meld] = sum((self.positive(x.score) for x in meld.rules(self.hand)), Score())
+            result += self.meldScores[meld]
+        return result
+
+    def __total(self, score:Score) ->float:
+        """the most a Hand with score can get"""
+        result = score.points * 2 ** score.doubles
+        if not self.ruleset.roofOff:
+            result = min(result, self.ruleset.limit)
+        return max(result, score.limits * self.ruleset.limit)
+
+    def prefix(self, melds:MeldList, candidates:List[MeldList]) ->float:
+        """the most any Hand with all melds from candidates can score.
+        They all have the concealed melds"""
+        meldScores = [self.__melds(x) for x in candidates]
+        rest = TileList(self.hand.unusedTiles)
+        for tile in TileTuple(melds):
+            rest.remove(tile)
+        return self.__total(self.__rules(MeldList(chain(self.hand.melds, melds)), rest) + Score(
+            max(x.points for x in meldScores), max(x.doubles for x in meldScores),
+            max(x.limits for x in meldScores)))
+
+    def complete(self, melds:MeldList, lastTile:Tile) ->float:
+        """the most the Hand with all melds and lastTile can score"""
+        return self.__total(self.__rules(melds, TileList(), Arrangement(self.hand, melds, lastTile))
+                            + self.__melds(melds))
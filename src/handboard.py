@@ -9,7 +9,7 @@ SPDX-License-Identifier: GPL-2.0-only
 
 import weakref
 from collections import defaultdict
-from typing import Optional, TYPE_CHECKING, List, Dict, Union, cast
+from typing import Optional, TYPE_CHECKING, List, Dict, Tuple, Union, cast
 
 from qt import QColor
 from tile import Tile, TileList, Meld, MeldList
@@ -260,12 +260,24 @@ class HandBoard(Board):
         return result
 
     def placeTiles(self, tiles:List[UITile]) ->None:
-        """tiles are all tiles for this board."""
-        oldTiles = defaultdict(list)
-        for uiTile in filter(lambda x: not x.isBonus, tiles):
-            oldTiles[uiTile.tile].append(uiTile)
+        """tiles are all tiles for this board. Tiles already showing
+        the right tile at their new position stay where they are, so adding
+        or removing a tile only moves the tiles right of it"""
+        inPlace:Dict[Tuple[Tile, float, int], UITile] = {}
+        for uiTile in tiles:
+            if uiTile.board is self and not uiTile.isBonus:
+                inPlace[(uiTile.tile, uiTile.xoffset, uiTile.yoffset)] = uiTile
         matches:Dict[UITile, TileAttr] = {}
-        newPositions = self.listNewTilePositions()
+        newPositions:List[TileAttr] = []
+        for newPosition in self.listNewTilePositions():
+            if uiTile := inPlace.pop((newPosition.tile, newPosition.xoffset, newPosition.yoffset), None):
+                matches[uiTile] = newPosition
+            else:
+                newPositions.append(newPosition)
+        oldTiles = defaultdict(list)
+        for uiTile in tiles:
+            if not uiTile.isBonus and uiTile not in matches:
+                oldTiles[uiTile.tile].append(uiTile)
         for newPosition in newPositions:
             assert isinstance(newPosition.tile, Tile)
             candidates = oldTiles.get(newPosition.tile) \
@@ -314,9 +326,11 @@ class HandBoard(Board):
         self.checkTiles()
 
     def checkTiles(self) ->None:
-        """does the logical state match the displayed tiles?"""
+        """does the logical state match the displayed tiles? Only with --debug=checkTiles"""
         # FIXME: when exactly should I call this? afterQueuedAnimations does not help
         #    test case: scoring game. move meld from exposed to concealed using the mouse
+        if not Debug.checkTiles:
+            return
         logExposed:TileList = TileList()
         physExposed:TileList = TileList()
         logConcealed:TileList = TileList()
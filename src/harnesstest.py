@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+tests for kajonggtest.py
+"""
+
+import os
+import math
+import unittest
+from typing import Dict, List
+
+from common import cacheDir
+from kajonggtest import Tournament, Clone
+from rule import PredefinedRuleset
+from testfakes import CacheDirTest
+import predefined
+
+
+def matches(winner:str, loser:str, count:int) ->List[Dict[str, int]]:
+    """count games where winner has the higher balance"""
+    return [{winner: 10, loser: -10}] * count
+
+
+class BradleyTerry(unittest.TestCase):
+
+    """the Elo ratings of the tournament"""
+
+    def testNoGames(self) ->None:
+        """without games, everybody has the same rating"""
+        self.assertEqual(Tournament.ratings(['A', 'B'], []), {'A': 1500.0, 'B': 1500.0})
+
+    def testEven(self) ->None:
+        """as many wins as losses, and draws"""
+        games = matches('A', 'B', 3) + matches('B', 'A', 3) + [{'A': 0, 'B': 0}]
+        ratings = Tournament.ratings(['A', 'B'], games)
+        self.assertAlmostEqual(ratings['A'], 1500.0)
+        self.assertAlmostEqual(ratings['B'], 1500.0)
+
+    def testTwoVariants(self) ->None:
+        """with the virtual draw, A scores 3.5 out of 5: the expected score
+        for a difference of 400*log10(0.7/0.3) Elo"""
+        ratings = Tournament.ratings(['A', 'B'], matches('A', 'B', 3) + matches('B', 'A', 1))
+        self.assertAlmostEqual(ratings['A'] - ratings['B'], 400.0 * math.log10(0.7 / 0.3), places=3)
+        self.assertAlmostEqual(ratings['A'] + ratings['B'], 3000.0)
+
+    def testDraws(self) ->None:
+        """a draw counts half for each"""
+        games = matches('A', 'B', 1) + [{'A': 5, 'B': 5}] * 2
+        ratings = Tournament.ratings(['A', 'B'], games)
+        # A: 1 + 1 + 0.5 of 4
+        self.assertAlmostEqual(ratings['A'] - ratings['B'], 400.0 * math.log10(2.5 / 1.5), places=3)
+
+    def testNeverWins(self) ->None:
+        """a variant which always loses still gets a finite rating"""
+        ratings = Tournament.ratings(['A', 'B'], matches('A', 'B', 50))
+        self.assertGreater(ratings['A'], ratings['B'])
+        self.assertTrue(all(math.isfinite(x) for x in ratings.values()))
+
+    def testTransitive(self) ->None:
+        """A beats B beats C: A is rated higher than C although they never met"""
+        games = matches('A', 'B', 5) + matches('B', 'C', 5)
+        ratings = Tournament.ratings(['A', 'B', 'C'], games)
+        self.assertGreater(ratings['A'], ratings['B'])
+        self.assertGreater(ratings['B'], ratings['C'])
+
+    def testMultiplayerGame(self) ->None:
+        """one game id played by three variants makes three matches"""
+        ratings = Tournament.ratings(['A', 'B', 'C'], [{'A': 30, 'B': 0, 'C': -30}] * 4)
+        self.assertGreater(ratings['A'], ratings['B'])
+        self.assertGreater(ratings['B'], ratings['C'])
+        self.assertAlmostEqual(ratings['A'] - ratings['B'], ratings['B'] - ratings['C'], places=3)
+
+
+class RemoveObsolete(CacheDirTest):
+
+    """only clones of obsolete commits are removed from cacheDir()"""
+
+    @staticmethod
+    def clone(commit:str) ->None:
+        """a clone like Clone makes it"""
+        os.makedirs(os.path.join(cacheDir(), commit, '.git'))
+
+    def testRemoveObsolete(self) ->None:
+        """with the snapshot of the predefined rulesets and other files"""
+        predefined.load()
+        PredefinedRuleset.snapshot = None
+        self.assertTrue(PredefinedRuleset.rulesets()[0].hash)
+        self.clone('1234567')
+        self.clone('abcdef0')
+        with open(os.path.join(cacheDir(), 'predefined.json'), 'w', encoding='utf-8') as _:
+            _.write('written by older versions')
+        before = set(os.listdir(cacheDir()))
+        self.assertIn('predefinedRulesets', before)
+        Clone.removeObsolete({'1234567890abcdef'})
+        self.assertEqual(set(os.listdir(cacheDir())), before - {'abcdef0'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,7 +8,7 @@ SPDX-License-Identifier: GPL-2.0-only
 """
 
 import random
-from typing import List, Optional, TYPE_CHECKING, Type, Any, Tuple, Union, cast
+from typing import List, Optional, TYPE_CHECKING, Type, Any, Tuple, Union, Dict, cast
 
 from twisted.spread import pb
 from twisted.python.failure import Failure
@@ -36,13 +36,13 @@ from player import PlayingPlayer
 from game import PlayingGame
 from visible import VisiblePlayingGame
 from tile import Tile
+from move import Move
 
 
 
 if TYPE_CHECKING:
     from qt import QEvent, QKeyEvent
     from deferredutil import Request
-    from move import Move
     from tile import Meld, MeldList
     from uitile import UITile
     from message import ClientMessage, ServerMessage
@@ -403,6 +403,7 @@ class HumanClient(Client):
 
     """a human client"""
     humanClients : List['HumanClient'] = []
+    voiceDownloads : Dict[str, bytearray] = {}  # incomplete voice archives by md5sum
 
     def __init__(self) ->None:
         super().__init__()
@@ -411,6 +412,8 @@ class HumanClient(Client):
         self.ruleset:Ruleset
         self.connection:Optional[Connection]
         self.beginQuestion:Optional[Deferred] = None
+        self.tableVersions:Dict[Optional[int], Optional[int]] = {}  # None: waiting for a snapshot
+        self.__tableUpdates:Deferred = succeed(None)
         self.tableList:Optional[TableList] = TableList(self)
         Connection(self).login().addCallbacks(
             self.__loggedIn,
@@ -468,7 +471,7 @@ class HumanClient(Client):
         self.callServer('setClientProperties',
                         Internal.db.identifier,
                         voiceId, maxGameId,
-                        Internal.defaultPort).addCallbacks(self.__initTableList, self.__versionError)
+                        Internal.defaultPort, Move.protocol).addCallbacks(self.__initTableList, self.__versionError)
 
     def __initTableList(self, unused:str) ->None:
         """first load of the list. Process options like --demo, --table, --join"""
@@ -556,11 +559,50 @@ class HumanClient(Client):
         if self.tables:
             self.__updateTableList()
 
+    def remote_tableDelta(self, shard:Optional[int], version:int,  # pylint:disable=too-many-positional-arguments
+                          added:List[List[Any]], changed:List[Tuple[int, Dict[int, Any]]],
+                          removed:List[int], snapshot:bool) ->None:
+        """the server tells us how its tables changed, see MJServer.sendTableDelta.
+        If we missed a delta, we ask for a snapshot and ignore everything
+        else from that server process until it arrives"""
+        if not snapshot:
+            expected = self.tableVersions.get(shard, 0)
+            if expected is None:
+                return
+            if version != expected + 1:
+                if Debug.table:
+                    logDebug(f'{self.name} got table delta {version} from {shard}, expected {expected + 1}')
+                self.tableVersions[shard] = None
+                self.callServer('needTables', shard).addErrback(logFailure)
+                return
+        self.tableVersions[shard] = version
+        needRulesets = list({x[1] for x in added if not Ruleset.hashIsKnown(x[1])})
+
+        def getRulesets(unused:Any) ->Optional[Deferred]:
+            """the rulesets of new tables"""
+            if needRulesets:
+                return self.callServer('needRulesets', needRulesets).addCallback(gotRulesets)
+            return None
+
+        def gotRulesets(result:List[bytes]) ->None:
+            """the server sent us the wanted ruleset definitions"""
+            for ruleset in result:
+                Ruleset.cached(ruleset).save()  # make it known to the cache and save in db
+
+        def apply(unused:Any) ->None:
+            """now we know all rulesets"""
+            self.applyTableDelta(shard, added, changed, removed, snapshot)
+            if not Internal.autoPlay and self.hasLocalServer():
+                self.tables = [x for x in self.tables if x.ruleset == self.ruleset]
+            self.__updateTableList()
+        # deltas must be applied in the order they came
+        self.__tableUpdates.addCallback(getRulesets).addCallback(apply).addErrback(logFailure)
+
     def remote_newTables(self, tables:List[List[Any]]) ->None:
         """update table list"""
         assert tables
 
-        def gotRulesets(result:List[Union[int, str]]) ->List[List[Any]]:
+        def gotRulesets(result:List[bytes]) ->List[List[Any]]:
             """the server sent us the wanted ruleset definitions"""
             for ruleset in result:
                 Ruleset.cached(ruleset).save()  # make it known to the cache and save in db
@@ -577,11 +619,40 @@ class HumanClient(Client):
             self.__receiveTables(tables)
 
     @staticmethod
-    def remote_needRuleset(ruleset:str) ->List[List[Union[str, int, float]]]:
+    def remote_voiceChunk(md5sum:str, offset:int, size:int) ->bytes:
+        """the server wants a part of our voice, see VoiceStore"""
+        voice = Voice.locate(md5sum)
+        if not voice:
+            return b''
+        return voice.archiveChunk(offset, size)
+
+    def remote_voiceData(self, md5sum:str, playerName:str,  # pylint:disable=too-many-positional-arguments
+                         total:int, offset:int, chunk:bytes) ->int:
+        """a part of the voice of another player, see VoiceStore.
+        Return the offset we want next"""
+        data = self.voiceDownloads.setdefault(md5sum, bytearray())
+        if len(data) > total:
+            data.clear()
+        if offset == len(data):
+            data.extend(chunk)
+        if len(data) < total:
+            return len(data)
+        del self.voiceDownloads[md5sum]
+        voice = Voice(md5sum, bytes(data))
+        if Debug.sound:
+            logDebug(f'{playerName} gets voice data {voice} from server, language={voice.language()}')
+        if self.game:
+            for player in self.game.players:
+                if player.name == playerName:
+                    player.voice = voice
+        return total
+
+    @staticmethod
+    def remote_needRuleset(ruleset:str) ->bytes:
         """server only knows hash, needs full definition"""
         result = Ruleset.cached(ruleset)
         assert result and result.hash == ruleset
-        return result.toList()
+        return result.toWire()
 
     def tableChanged(self, table:ClientTable) ->Tuple[Optional[ClientTable], ClientTable]:
         """update table list"""
@@ -690,6 +761,19 @@ class HumanClient(Client):
         assert not self.game.isFirstHand()
         return Information(i18n("Ready for next hand?"), modal=False).addCallback(answered).addErrback(logFailure)
 
+    __claimsClosed = (
+        Message.ActivePlayer, Message.Pung, Message.Kong, Message.Chow, Message.MahJongg,
+        Message.UsedDangerousFrom, Message.RobbedTheKong)
+
+    def exec_move(self, move:'Move') ->Deferred:
+        """the server may have decided about claims without waiting for
+        our answer. If so, the question is obsolete"""
+        if not move.notifying and move.message in self.__claimsClosed and Internal.scene:
+            dialog = Internal.scene.clientDialog
+            if dialog and not dialog.answered and dialog.move.message == Message.AskForClaims:
+                dialog.selectButton(Message.NoClaim)
+        return super().exec_move(move)
+
     def ask(self, move:'Move', answers:List['ClientMessage']) ->Deferred:
         """server sends move. We ask the user. answers is a list with possible answers,
         the default answer being the first in the list."""
@@ -10,6 +10,7 @@ SPDX-License-Identifier: GPL-2.0-only
 from typing import TYPE_CHECKING, Sequence, Tuple, Union, Optional, Any, Dict, List, cast
 
 import weakref
+import time
 from itertools import chain
 
 from message import Message
@@ -32,6 +33,8 @@ class AIDefaultAI:
 
     def __init__(self, player:'PlayingPlayer') ->None:
         self._player = weakref.ref(player)
+        self.deadline:Optional[float] = None  # time.monotonic() value, None means no limit
+        self.deadlineWasHit = False
 
     @property
     def player(self) ->'PlayingPlayer':
@@ -44,6 +47,12 @@ class AIDefaultAI:
         """return our name"""
         return self.__class__.__name__[2:]
 
+    def deadlineHit(self) ->bool:
+        """True if we must stop thinking and use the best answer found so far"""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.deadlineWasHit = True
+        return self.deadlineWasHit
+
     @staticmethod
     def weighSameColors(unusedAiInstance:'AIDefaultAI', candidates:'DiscardCandidates') ->'DiscardCandidates':
         """weigh tiles of same group against each other"""
@@ -78,17 +87,13 @@ class AIDefaultAI:
         """the standard"""
         game = self.player.game
         assert game
-        weighRules = game.ruleset.filterRules('weigh')
-        for _ in [self.weighBasics, self.weighSameColors,
-                         self.weighSpecialGames, self.weighCallingHand,
-                         self.weighOriginalCall,
-                         self.alternativeFilter] + weighRules:
-            if _ in weighRules:
-                filterName = _.__class__.__name__
-                aiFilter = _.weigh
-            else:
-                filterName = _.__name__
-                aiFilter = _
+        aiFilters = [(x.__name__, x) for x in [
+            self.weighBasics, self.weighSameColors,
+            self.weighSpecialGames, self.weighCallingHand,
+            self.weighOriginalCall,
+            self.alternativeFilter]]
+        aiFilters.extend((rule.__class__.__name__, weigh) for rule, weigh in game.ruleset.hooks('weigh'))
+        for filterName, aiFilter in aiFilters:
             if Debug.robotAI:
                 prevWeights = ((x.tile, x.keep) for x in candidates)
                 candidates = aiFilter(self, candidates)
@@ -98,6 +103,11 @@ class AIDefaultAI:
                         game.debug(f'{filterName}: {oldW[0]}: {oldW[1]:.3f}->{newW[1]:.3f}')
             else:
                 candidates = aiFilter(self, candidates)
+            if self.deadlineHit():
+                # the candidates are always weighed by weighBasics
+                if Debug.robotAI:
+                    game.debug(f'weighDiscardCandidates: deadline hit after {filterName}')
+                break
         return candidates
 
     @staticmethod
@@ -248,8 +258,8 @@ class AIDefaultAI:
         claimness = IntDict()
         discard = self.player.game.lastDiscard
         if discard:
-            for rule in self.player.game.ruleset.filterRules('claimness'):
-                claimness += rule.claimness(hand, discard)  # type:ignore[attr-defined]
+            for rule, ruleClaimness in self.player.game.ruleset.hooks('claimness'):
+                claimness += ruleClaimness(hand, discard)
                 if Debug.robotAI:
                     hand.debug(
                         f'{rule.name}: claimness in selectAnswer:{claimness}')
@@ -257,6 +267,9 @@ class AIDefaultAI:
             parameter = self.player.sayable[tryAnswer]
             if not parameter:
                 continue
+            if tryAnswer not in (Message.MahJongg, Message.Discard) and self.deadlineHit():
+                # no time left for thinking about optional claims
+                continue
             if claimness[tryAnswer] < 0:
                 continue
             if tryAnswer in [Message.Discard, Message.OriginalCall]:
@@ -11,6 +11,31 @@ SPDX-License-Identifier: GPL-2.0-only
 # pylint: disable=wrong-import-position
 
 import sys
+
+if '--profile-startup' in sys.argv:
+    from startupprofile import StartupProfile
+    StartupProfile.start()
+
+
+def __showRulesetsAndExit() ->None:
+    """kajonggtest.py only wants the names of the rulesets: this needs
+    no QApplication and none of the other options"""
+    from common import Internal
+    from query import initDb
+    if not initDb():
+        raise SystemExit('Cannot initialize database')
+    import predefined
+    predefined.load()
+    from rule import Ruleset
+    for name in dict.fromkeys(x.name for x in Ruleset.selectableRulesets()):
+        print(name)
+    Internal.db.close()
+    sys.exit(0)
+
+
+if '--rulesets' in sys.argv:
+    __showRulesetsAndExit()
+
 import os
 import logging
 from typing import Tuple, List, Optional, Type, Any
@@ -24,19 +49,14 @@ from common import Options, SingleshotOptions, Internal, Debug
 # do not import modules using twisted before our reactor is running
 
 def __initRulesetsOrExit() ->None:
-    """exits if user only wanted to see available rulesets
-    or if the given ruleset does not exist"""
+    """exits if the given ruleset does not exist.
+    --rulesets is handled by __showRulesetsAndExit"""
     import predefined
     predefined.load()
-    if Options.showRulesets or Options.rulesetName:
+    if Options.rulesetName:
         from rule import Ruleset
         rulesets = {x.name: x for x in Ruleset.selectableRulesets()}
-        if Options.showRulesets:
-            for name in rulesets:
-                print(name)
-            Internal.db.close()
-            sys.exit(0)
-        elif Options.rulesetName in rulesets:
+        if Options.rulesetName in rulesets:
             # we have an exact match
             Options.ruleset = rulesets[Options.rulesetName]
         else:
@@ -90,8 +110,11 @@ def defineOptions() -> Tuple[QCommandLineParser, List[CommandLineOption]]:
     option('ruleset', i18n('use RULESET without asking'), 'RULESET', '', optName='rulesetName')
     option('player', i18n('prefer PLAYER for next login'), 'PLAYER', '')
     option('ai', i18n('use AI variant for human player in demo mode'), 'AI', '', optName='AI')
+    option('anytime', i18n('the AI answers within PERCENT of the claim timeout'), 'PERCENT', '0', argType=int)
     option('csv', i18n('write statistics to CSV'), 'CSV', '')
     option('rulesets', i18n('show all available rulesets'), optName='showRulesets')
+    option('profile-startup', i18n('log import times and the time until the window is painted'),
+           optName='profileStartup')
     option('game', i18n('for testing purposes: Initializes the random generator'),
            'seed(/firsthand)(..(lasthand))', '0')
     option('nogui', i18n('show no graphical user interface. Intended only for testing'), optName='gui')
@@ -11,6 +11,8 @@ SPDX-License-Identifier: GPL-2.0-only
 from server import kajonggServer
 from util import checkMemory
 
-kajonggServer()
-checkMemory()
-# profileMe()
+if __name__ == '__main__':
+    # the robot AI processes import this as __mp_main__, see robotpool.py
+    kajonggServer()
+    checkMemory()
+    # profileMe()
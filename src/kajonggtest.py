@@ -16,11 +16,13 @@ import random
 import shutil
 import time
 import gc
+import math
+from collections import defaultdict
 
 import argparse
 from locale import getpreferredencoding
 
-from typing import List, Set, Optional, Any, Generator, Iterable, Union, TYPE_CHECKING, Tuple, cast
+from typing import List, Set, Optional, Any, Generator, Iterable, Union, TYPE_CHECKING, Tuple, Dict, cast
 
 from common import Debug, ReprMixin, cacheDir
 from util import removeIfExists, gitHead, checkMemory, popenReadlines
@@ -63,10 +65,13 @@ class Clone:
 
     @classmethod
     def removeObsolete(cls, knownCommits:Set) ->None:
-        """remove all clones for obsolete commits"""
+        """remove all clones for obsolete commits. cacheDir() also holds
+        things kajongg itself caches, leave them alone"""
         for commitDir in os.listdir(cacheDir()):
+            removeDir = os.path.join(cacheDir(), commitDir)
+            if not os.path.isdir(os.path.join(removeDir, '.git')):
+                continue
             if not any(x.startswith(commitDir) for x in knownCommits):
-                removeDir = os.path.join(cacheDir(), commitDir)
                 shutil.rmtree(removeDir)
 
 
@@ -152,6 +157,10 @@ class Server(ReprMixin):
             cmd.append(f'--socket={self.socketName}')
         if OPTIONS.debug:
             cmd.append(f"--debug={','.join(OPTIONS.debug)}")
+        if OPTIONS.anytime:
+            cmd.append(f'--anytime={OPTIONS.anytime}')
+        if OPTIONS.aiprocesses:
+            cmd.append(f'--aiprocesses={OPTIONS.aiprocesses}')
         if OPTIONS.log:
             self.process = subprocess.Popen(
                 cmd, cwd=job.srcDir(),
@@ -255,6 +264,8 @@ class Job(ReprMixin):
             cmd.append('--nogui')
         if OPTIONS.playopen:
             cmd.append('--playopen')
+        if OPTIONS.anytime:
+            cmd.append(f'--anytime={OPTIONS.anytime}')
         if OPTIONS.debug:
             cmd.append(f"--debug={','.join(OPTIONS.debug)}")
         self.__startProcess(cmd)
@@ -446,6 +457,102 @@ class CSV(ReprMixin):
         return result
 
 
+class Tournament:
+
+    """rate AI variants against each other. The robots on the server
+    always play DefaultAI, the AI variant only plays the seat of the
+    kajongg client. So every game id is played once per AI variant:
+    all variants get the same wall and the same seat, which cancels
+    seat bias and luck. Consecutive game ids rotate the seats.
+    Two variants playing the same game id make a match, won by the
+    variant with the higher balance."""
+
+    bootstraps = 200
+
+    def __init__(self, rows:List[CsvRow]) ->None:
+        self.aiVariants = sorted(OPTIONS.allAis)
+        commits = set(OPTIONS.git or [gitHead()])
+        matches:Dict[Tuple[str, str, str, str], Dict[str, int]] = defaultdict(dict)
+        for row in rows:
+            if row.aiVariant not in self.aiVariants or row.ruleset not in OPTIONS.rulesets:
+                continue
+            if not any(x and row.commit.startswith(x) for x in commits):
+                continue
+            balance = self.testerBalance(row)
+            if balance is not None:
+                matches[(row.game, row.ruleset, row.commit, row.py_version)][row.aiVariant] = balance
+        self.games = [x for x in matches.values() if len(x) > 1]
+
+    @staticmethod
+    def testerBalance(row:CsvRow) ->Optional[int]:
+        """the balance of the player using the AI variant"""
+        for player in row.players:
+            if player.name.startswith('Tüster'):
+                return player.balance
+        return None
+
+    @staticmethod
+    def __score(games:List[Dict[str, int]]) ->Dict[Tuple[str, str], float]:
+        """points for variant A against variant B: 1 per won match, 0.5 per draw"""
+        result:Dict[Tuple[str, str], float] = defaultdict(float)
+        for game in games:
+            for variantA in game:
+                for variantB in game:
+                    if variantA != variantB:
+                        if game[variantA] > game[variantB]:
+                            result[(variantA, variantB)] += 1.0
+                        elif game[variantA] == game[variantB]:
+                            result[(variantA, variantB)] += 0.5
+        return result
+
+    @classmethod
+    def ratings(cls, aiVariants:List[str], games:List[Dict[str, int]]) ->Dict[str, float]:
+        """Elo ratings from a Bradley-Terry fit. Every pairing starts
+        with one virtual draw, so a variant which never wins still
+        gets a finite rating"""
+        score = cls.__score(games)
+        strength = {x: 1.0 for x in aiVariants}
+        for _ in range(100):
+            newStrength = {}
+            for variantA in aiVariants:
+                wins = 0.0
+                weighted = 0.0
+                for variantB in aiVariants:
+                    if variantA != variantB:
+                        played = score[(variantA, variantB)] + score[(variantB, variantA)] + 1.0
+                        wins += score[(variantA, variantB)] + 0.5
+                        weighted += played / (strength[variantA] + strength[variantB])
+                newStrength[variantA] = wins / weighted
+            norm = math.exp(sum(math.log(x) for x in newStrength.values()) / len(newStrength))
+            strength = {x: y / norm for x, y in newStrength.items()}
+        return {x: 1500.0 + 400.0 * math.log10(y) for x, y in strength.items()}
+
+    def evaluate(self) ->None:
+        """print ratings with 95% confidence intervals from bootstrapping the games"""
+        if len(self.aiVariants) < 2:
+            print('a tournament needs at least two AI variants')
+            return
+        if not self.games:
+            print('no tournament games found')
+            return
+        ratings = self.ratings(self.aiVariants, self.games)
+        randomGenerator = random.Random(0)
+        samples:Dict[str, List[float]] = defaultdict(list)
+        for _ in range(self.bootstraps):
+            resampled = [randomGenerator.choice(self.games) for _ in self.games]
+            for variant, rating in self.ratings(self.aiVariants, resampled).items():
+                samples[variant].append(rating)
+        print(f'Tournament over {len(self.games)} games:')
+        for variant in sorted(self.aiVariants, key=lambda x: -ratings[x]):
+            values = sorted(samples[variant])
+            low = values[int(len(values) * 0.025)]
+            high = values[int(len(values) * 0.975) - 1]
+            played = [x[variant] for x in self.games if variant in x]
+            average = sum(played) / len(played) if played else 0
+            print(f'   {variant:<20} Elo {ratings[variant]:6.0f}  95% CI [{low:6.0f}, {high:6.0f}] '
+                  f' games {len(played):5}  average balance {average:8.1f}')
+
+
 def startingDir() ->str:
     """the path of the directory where kajonggtest has been started in"""
     return os.path.dirname(sys.argv[0])
@@ -542,12 +649,24 @@ def parse_options() ->argparse.Namespace:
         help='all robots play with visible concealed tiles', default=False)
     parser.add_argument(
         '--clients', dest='clients',
-        help='start a maximum of CLIENTS kajongg instances. Default is 2',
-        metavar='CLIENTS', type=int, default=2)
+        help='start a maximum of CLIENTS kajongg instances. Default is 2, with --tournament it depends on the CPU count',
+        metavar='CLIENTS', type=int, default=None)
     parser.add_argument(
         '--servers', dest='servers',
-        help='start a maximum of SERVERS kajonggserver instances. Default is 1',
-        metavar='SERVERS', type=int, default=1)
+        help='start a maximum of SERVERS kajonggserver instances. Default is 1, with --tournament CLIENTS/2',
+        metavar='SERVERS', type=int, default=None)
+    parser.add_argument(
+        '--tournament', dest='tournament', action='store_true',
+        help='rate the AI variants given with --ai against each other. Every game is played once'
+        ' by every AI variant, the results are shown as Elo ratings', default=False)
+    parser.add_argument(
+        '--anytime', dest='anytime',
+        help='robots answer within PERCENT of the claim timeout, using the best answer found so far',
+        metavar='PERCENT', type=int, default=0)
+    parser.add_argument(
+        '--aiprocesses', dest='aiprocesses',
+        help='the servers compute the robot answers in AIPROCESSES processes',
+        metavar='AIPROCESSES', type=int, default=0)
     parser.add_argument(
         '--git', dest='git',
         help='check all commits: either a comma separated list or a range from..until')
@@ -560,6 +679,10 @@ def parse_options() ->argparse.Namespace:
 def improve_options() ->None:
     """add sensible defaults"""
     # pylint: disable=too-many-branches,too-many-statements
+    if OPTIONS.clients is None:
+        OPTIONS.clients = max(2, (os.cpu_count() or 1) * 2 // 3) if OPTIONS.tournament else 2
+    if OPTIONS.servers is None:
+        OPTIONS.servers = OPTIONS.clients // 2 if OPTIONS.tournament else 1
     OPTIONS.servers = max(OPTIONS.servers, 1)
 
     cmdPath = os.path.join(startingDir(), 'kajongg.py')
@@ -688,11 +811,18 @@ def main() ->None:
 
     print()
 
+    if OPTIONS.tournament and OPTIONS.count and not OPTIONS.git and gitHead() in ('current', None):
+        print('a tournament needs CSV output: please commit your changes')
+        sys.exit(2)
+
     if OPTIONS.count:
         doJobs()
         if OPTIONS.csv:
             CSV().evaluate()
 
+    if OPTIONS.tournament:
+        Tournament(CSV().rows).evaluate()
+
 def cleanup(sig: Any, unusedFrame: Any) ->None:
     """at program end"""
     Server.stopAll()
@@ -9,23 +9,21 @@ SPDX-License-Identifier: GPL-2.0-only
 
 import logging
 import os
-from typing import TYPE_CHECKING, Union, Protocol, Optional
+from typing import TYPE_CHECKING, Union, Protocol, Optional, Dict
 
 from locale import getpreferredencoding
 
 # we must not import twisted or we need to change kajongg.py
 
 from common import Internal, Debug, isAlive
-from qt import Qt, QEvent, PYQT_VERSION
 from util import elapsedSince, traceback, gitHead, callers
 from mi18n import i18n
-from dialogs import Sorry, Information, NoPrompt
 
 
 if TYPE_CHECKING:
     from twisted.internet.defer import Deferred
     from twisted.python.failure import Failure
-    from qt import QObject
+    from qt import QObject, QEvent
 
 SERVERMARK = '&&SERVER&&'
 
@@ -131,6 +129,8 @@ def logMessage(msg:Union[Exception, str], prio:int, showDialog:bool,
         logSummary(summary, prio)
     if int(Debug.callers):
         __logUnicodeMessage(prio, '    ' + callers(int(Debug.callers)))
+    # dialogs needs Qt and twisted, kajongg.py --rulesets does not
+    from dialogs import Sorry, Information, NoPrompt
     if showDialog and not Internal.isServer:
         return Information(msg) if prio == logging.INFO else Sorry(msg, always=True)
     return NoPrompt(msg)
@@ -179,7 +179,7 @@ def logException(exception: Union[Exception, str], withGamePrefix:bool=True) ->N
 class EventData(str):
 
     """used for generating a nice string"""
-    events = {y: x for x, y in QEvent.__dict__.items() if isinstance(y, int)}
+    events:Dict[int, str] = {}  # filled when first needed
     # the following appear in Qt6/qtbase/src/corelib/kernel/qcoreevent.h but are not included.
     # if they were, we could just print event.type().name, but now name is only 15/16 etc for those
     extra = {
@@ -188,13 +188,17 @@ class EventData(str):
         152: 'AcceptDropsChange',
         154: 'Windows:ZeroTimer'
     }
-    events.update(extra)
-    keys = {y: x for x, y in Qt.__dict__.items() if isinstance(y, int)}
+    keys:Dict[int, str] = {}
 
     prevFocusItem = None
 
     def __new__(cls, receiver:'QObject', event:'QEvent', prefix:Optional[str]=None) ->'EventData':
         """create the wanted string"""
+        if not cls.events:
+            from qt import Qt, QEvent
+            cls.events = {y: x for x, y in QEvent.__dict__.items() if isinstance(y, int)}
+            cls.events.update(cls.extra)
+            cls.keys = {y: x for x, y in Qt.__dict__.items() if isinstance(y, int)}
         name = cls.eventName(event)
         msg = f'{name}.{cls.eventValue(event)}.receiver:{cls.eventReceiver(receiver)}'
         if prefix:
@@ -243,6 +247,7 @@ class EventData(str):
     @classmethod
     def eventName(cls, event:'QEvent') ->str:
         """Format data about event name"""
+        from qt import PYQT_VERSION
         if not PYQT_VERSION:
             # Pyside
             evtype = event.type()
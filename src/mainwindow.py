@@ -10,6 +10,7 @@ SPDX-License-Identifier: GPL-2.0-only
 # pylint: disable=wrong-import-order
 
 import sys
+import importlib
 from itertools import chain
 
 import logging
@@ -41,14 +42,8 @@ try:
     from playerlist import PlayerList
     from tileset import Tileset
     from background import Background
-    from scoring import scoreGame
-    from scoringdialog import ScoreTable, ExplainView
-    from humanclient import HumanClient
-    from rulesetselector import RulesetSelector
     from animation import afterQueuedAnimations, AnimationSpeed
-    from chat import ChatWindow
-    from scene import PlayingScene, ScoringScene
-    from configdialog import ConfigDialog
+    # games, dialogs and the ruleset editor are imported when first needed
     from statesaver import StateSaver
     from util import checkMemory
     from kdestub import Action, KApplication
@@ -65,6 +60,8 @@ if TYPE_CHECKING:
     from twisted.internet.defer import Deferred
     from qt import QSize
     from scene import GameScene
+    from rulesetselector import RulesetSelector
+    from configdialog import ConfigDialog
 
 def cleanExit(*unusedArgs:Any) ->None:
     """close sqlite3 files before quitting"""
@@ -100,8 +97,8 @@ class MainWindow(KXmlGuiWindow):
         self.centralView: FittingView
         self.background:Background = Background()
         self.playerWindow:Optional[PlayerList] = None
-        self.rulesetWindow:Optional[RulesetSelector] = None
-        self.confDialog:Optional[ConfigDialog] = None
+        self.rulesetWindow:Optional['RulesetSelector'] = None
+        self.confDialog:Optional['ConfigDialog'] = None
         self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
         self.__installReactor()
         if Options.gui:
@@ -122,11 +119,14 @@ class MainWindow(KXmlGuiWindow):
                 if 'onfigure' in action.text():
                     action.setPriority(QAction.Priority.LowPriority)
             if Options.host and not Options.demo:
-                self.scene = PlayingScene(self)
-                HumanClient()
+                self.startPlayingGame()
             StateSaver(self)
             self.show()
+            if Options.profileStartup:
+                from startupprofile import StartupProfile
+                StartupProfile.watchFirstPaint(self.centralView.viewport())
         else:
+            from humanclient import HumanClient
             HumanClient()
 
     @staticmethod
@@ -159,13 +159,14 @@ class MainWindow(KXmlGuiWindow):
             self.actionChat.setChecked(False)
             self.actionExplain.setChecked(False)
             self.actionScoreTable.setChecked(False)
-            self.actionExplain.setData(ExplainView)
-            self.actionScoreTable.setData(ScoreTable)
+            self.actionExplain.setData('scoringdialog.ExplainView')
+            self.actionScoreTable.setData('scoringdialog.ScoreTable')
         self._scene = value
         # contrary to what the Qt doc says, scene can be set to None
         self.centralView.setScene(value)  # type:ignore[arg-type]
         self.adjustMainView()
         self.updateGUI()
+        from scene import PlayingScene
         canDemo = not value or isinstance(value, PlayingScene)
         self.actionChat.setEnabled(canDemo)
         self.actionAutoPlay.setEnabled(canDemo)
@@ -254,7 +255,7 @@ class MainWindow(KXmlGuiWindow):
             "games-kajongg-law",
             self.slotRulesets)
         self.actionChat = self._kajonggToggleAction("chat", "call-start",
-                                                    shortcut="Ctrl+H", actionData=ChatWindow)
+                                                    shortcut="Ctrl+H", actionData='chat.ChatWindow')
         self.actionChat.setEnabled(False)
         self.actionAngle = Action(
             self,
@@ -265,11 +266,11 @@ class MainWindow(KXmlGuiWindow):
         self.actionAngle.setEnabled(False)
         self.actionScoreTable = self._kajonggToggleAction(
             "scoreTable", "format-list-ordered",
-            "Ctrl+T", actionData=ScoreTable)
+            "Ctrl+T", actionData='scoringdialog.ScoreTable')
         self.actionScoreTable.setEnabled(False)
         self.actionExplain = self._kajonggToggleAction(
             "explain", "applications-education",
-            "Ctrl+E", actionData=ExplainView)
+            "Ctrl+E", actionData='scoringdialog.ExplainView')
         self.actionExplain.setEnabled(False)
         self.actionFullscreen = self._kajonggToggleAction(
             "fullscreen", "view-fullscreen",
@@ -295,11 +296,15 @@ class MainWindow(KXmlGuiWindow):
 
     def startPlayingGame(self) ->None:
         """play a computer game: log into a server and show its tables"""
+        from scene import PlayingScene
+        from humanclient import HumanClient
         self.scene = PlayingScene(self)
         HumanClient()
 
     def startScoringGame(self) ->None:
         """start a scoring scene"""
+        from scene import ScoringScene
+        from scoring import scoreGame
         scene = ScoringScene(self)
         game = scoreGame()
         if game:
@@ -412,6 +417,7 @@ class MainWindow(KXmlGuiWindow):
         if self.exitConfirmed:
             # now we can get serious
             self.exitReady = False
+            from humanclient import HumanClient
             for widget in chain(
                     (x.tableList for x in HumanClient.humanClients), [
                         self.confDialog,
@@ -565,6 +571,7 @@ class MainWindow(KXmlGuiWindow):
     def slotRulesets(self) ->None:
         """show the player list"""
         if not self.rulesetWindow:
+            from rulesetselector import RulesetSelector
             self.rulesetWindow = RulesetSelector()
         self.rulesetWindow.show()
 
@@ -603,6 +610,7 @@ class MainWindow(KXmlGuiWindow):
         """show preferences dialog. If it already is visible, do nothing"""
         # This is called by the triggered() signal. So why does KDE
         # not return the bool checked?
+        from configdialog import ConfigDialog
         if ConfigDialog.showDialog("settings"):
             return
         # if an animation is running, Qt segfaults somewhere deep
@@ -618,6 +626,10 @@ class MainWindow(KXmlGuiWindow):
         assert isinstance(action, Action), action
         actionData = action.data()
         if checked:
+            if isinstance(actionData, str):
+                # the module with the widget class is imported when first needed
+                moduleName, clsName = actionData.split('.')
+                actionData = getattr(importlib.import_module(moduleName), clsName)
             if isinstance(actionData, type):
                 clsName = actionData.__name__
                 actionData = actionData(scene=self.scene)
@@ -635,6 +647,7 @@ class MainWindow(KXmlGuiWindow):
     def _toggleDemoMode(self, checked:bool) ->None:
         """switch on / off for autoPlay"""
         if self.scene:
+            from scene import PlayingScene
             assert isinstance(self.scene, PlayingScene)
             self.scene.toggleDemoMode(checked)
         else:
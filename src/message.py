@@ -16,7 +16,6 @@ from sound import Voice
 from tile import Tile, TileTuple, Meld, MeldList
 from common import Internal, Debug, Options, ReprMixin
 from wind import Wind
-from dialogs import Sorry
 
 if TYPE_CHECKING:
     from servertable import ServerTable
@@ -548,6 +547,7 @@ class MessageNoGameStart(NotifyAtOnceMessage):
         assert move.player
         client = cast('HumanClient', client)
         if client.beginQuestion or client.game:
+            from dialogs import Sorry
             Sorry(i18n('%1 is not ready to start the game', move.player.name))
         if client.beginQuestion:
             client.beginQuestion.cancel()
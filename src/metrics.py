@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+Counters and latency histograms for the game server.
+
+Everything is collected all the time, this is cheap. Only the memory
+usage is sampled once a minute: counting all objects takes a while with
+many tables. With --metrics the server answers every request on a local
+socket with the current values as JSON, wrapped in a minimal HTTP
+response. So this works:
+
+    curl --unix-socket ~/.kajonggserver/metrics http://localhost/
+
+With --metricslog the server also logs a summary periodically, including
+the last memory sample.
+
+Twisted is only imported by startMetrics: query.py counts here, and
+kajongg.py --rulesets should not need twisted.
+"""
+
+import os
+import sys
+import time
+import json
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Dict, List, Any, Callable, Optional
+
+from common import Internal, Options
+from log import logInfo, logWarning
+from util import memoryUsage
+
+if TYPE_CHECKING:
+    from server import MJServer
+
+
+class Histogram:
+
+    """latencies in buckets with fixed upper bounds, in seconds"""
+
+    bounds = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+    def __init__(self) ->None:
+        self.buckets:List[int] = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, seconds:float) ->None:
+        """one more value"""
+        self.buckets[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, percent:float) ->float:
+        """the upper bound of the bucket holding that percentile,
+        but not more than the maximum"""
+        wanted = self.count * percent / 100
+        seen = 0
+        for idx, count in enumerate(self.buckets):
+            seen += count
+            if seen >= wanted and count:
+                return min(self.bounds[idx], self.maximum) if idx < len(self.bounds) else self.maximum
+        return 0.0
+
+    def toDict(self) ->Dict[str, Any]:
+        """for JSON"""
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.maximum,
+            'buckets': dict(zip([str(x) for x in self.bounds] + ['inf'], self.buckets))}
+
+    def __str__(self) ->str:
+        return (f'n={self.count} p50={self.percentile(50) * 1000:.0f}ms '
+                f'p99={self.percentile(99) * 1000:.0f}ms max={self.maximum * 1000:.0f}ms')
+
+
+class Metrics:
+
+    """all counters, histograms and gauges of this process"""
+
+    started = time.monotonic()
+    counters:Dict[str, int] = {}
+    histograms:Dict[str, Histogram] = {}
+    tables:Dict[int, Dict[str, Histogram]] = {}
+    gauges:Dict[str, Callable[[], Any]] = {}
+    memory:Dict[str, Any] = {}
+    memoryInterval = 60
+    __lastLog:Optional[float] = None
+    __lastCounters:Dict[str, int] = {}
+
+    @classmethod
+    def count(cls, name:str, value:int=1) ->None:
+        """increment a counter"""
+        cls.counters[name] = cls.counters.get(name, 0) + value
+
+    @classmethod
+    def observe(cls, name:str, seconds:float, tableid:Optional[int]=None) ->None:
+        """record a latency, also for the table if given"""
+        if name not in cls.histograms:
+            cls.histograms[name] = Histogram()
+        cls.histograms[name].observe(seconds)
+        if tableid is not None:
+            table = cls.tables.setdefault(tableid, {})
+            if name not in table:
+                table[name] = Histogram()
+            table[name].observe(seconds)
+
+    @classmethod
+    def sampleMemory(cls) ->None:
+        """called every memoryInterval seconds"""
+        cls.memory = memoryUsage()
+        cls.memory['sampledAt'] = time.monotonic() - cls.started
+
+    @classmethod
+    def forgetTable(cls, tableid:int) ->None:
+        """the table is gone"""
+        cls.tables.pop(tableid, None)
+
+    @classmethod
+    def toDict(cls) ->Dict[str, Any]:
+        """everything we know, for JSON"""
+        uptime = time.monotonic() - cls.started
+        return {
+            'pid': os.getpid(),
+            'shard': Options.shard,
+            'uptime': uptime,
+            'counters': dict(cls.counters),
+            'perSecond': {k: v / uptime for k, v in cls.counters.items()} if uptime else {},
+            'gauges': {k: v() for k, v in cls.gauges.items()},
+            'memory': cls.memory,
+            'histograms': {k: v.toDict() for k, v in cls.histograms.items()},
+            'tables': {str(k): {name: x.toDict() for name, x in v.items()} for k, v in cls.tables.items()}}
+
+    @classmethod
+    def logSummary(cls) ->None:
+        """a short summary for the log. Rates are for the time since the last summary"""
+        now = time.monotonic()
+        elapsed = now - (cls.__lastLog or cls.started)
+        cls.__lastLog = now
+        parts = [f'{k}={v()}' for k, v in cls.gauges.items()]
+        for name, value in sorted(cls.counters.items()):
+            rate = (value - cls.__lastCounters.get(name, 0)) / elapsed if elapsed else 0.0
+            parts.append(f'{name}={value} ({rate:.1f}/s)')
+        cls.__lastCounters = dict(cls.counters)
+        parts.extend(f'{k}: {v}' for k, v in sorted(cls.histograms.items()))
+        parts.extend(f'{k}={v}' for k, v in sorted(cls.memory.items()) if k != 'sampledAt')
+        logInfo('metrics: ' + ', '.join(parts))
+
+
+def startMetrics(server:'MJServer') ->None:
+    """register the gauges of server, listen on Options.metrics
+    and start logging if wanted"""
+    from twisted.internet import protocol, task, error
+
+    class MetricsProtocol(protocol.Protocol):
+
+        """answers the first request with the metrics"""
+
+        answered = False
+
+        def dataReceived(self, data:bytes) ->None:
+            """we do not care about the request"""
+            if self.answered:
+                return
+            self.answered = True
+            body = json.dumps(Metrics.toDict(), indent=1).encode()
+            assert self.transport
+            self.transport.write(
+                b'HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n'
+                + f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+            self.transport.loseConnection()
+
+    Metrics.gauges['tables'] = lambda: len(server.tables)
+    Metrics.gauges['runningTables'] = lambda: sum(x.running for x in server.tables.values())
+    Metrics.gauges['users'] = lambda: len(server.srvUsers)
+    if Options.metrics:
+        factory = protocol.Factory.forProtocol(MetricsProtocol)
+        try:
+            if Options.metrics.isdigit():
+                Internal.reactor.listenTCP(  # type:ignore[attr-defined]
+                    int(Options.metrics), factory, interface='127.0.0.1')
+            elif sys.platform != 'win32':
+                if os.path.exists(Options.metrics):
+                    os.remove(Options.metrics)
+                Internal.reactor.listenUNIX(Options.metrics, factory)  # type:ignore[attr-defined]
+            else:
+                logWarning(f'--metrics needs a port number on Windows, not {Options.metrics}')
+        except error.CannotListenError as errObj:
+            logWarning(str(errObj))
+    if Options.metrics or Options.metricsLog:
+        task.LoopingCall(Metrics.sampleMemory).start(Metrics.memoryInterval)
+    if Options.metricsLog:
+        task.LoopingCall(Metrics.logSummary).start(Options.metricsLog, now=False)
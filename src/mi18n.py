@@ -21,11 +21,6 @@ from typing import Any, List, Generator, Optional
 
 # pylint: disable=wrong-import-order
 
-# here come the replacements:
-
-# pylint: disable=wildcard-import,unused-wildcard-import
-from qt import *
-
 from common import Internal, Debug
 from util import uniqueList
 
@@ -37,7 +32,7 @@ try:
 except ImportError:
     LOCALEPATH = None
 
-__all__ = ['i18n', 'i18nc', 'qi18nc', 'i18nE', 'i18ncE', 'KDETranslator', 'MLocale']
+__all__ = ['i18n', 'i18nc', 'qi18nc', 'i18nE', 'i18ncE', 'MLocale']
 
 
 ENGLISHDICT = {}
@@ -136,35 +131,6 @@ def english(i18nstring:str) ->str:
     return ENGLISHDICT.get(i18nstring, i18nstring)
 
 
-class KDETranslator(QTranslator):
-
-    """we also want Qt-only strings translated. Make Qt call this
-    translator for its own strings. Use this with qi18nc()"""
-
-    def __init__(self, parent:QObject) ->None:
-        super().__init__(parent)
-
-    def translate(self, context:str, text:str,  # type:ignore[override]
-        disambiguation:Optional[bytes]=None, numerus:int=-1) ->str:
-        """context should be the class name defined by Qt.
-        PyQt uses str, Pyside uses bytes - so just ignore typing warnings"""
-        # Qt doc says str but on Debian Bookworm, .pyi says bytes
-        if Debug.neutral:
-            return text  # type:ignore[return-value]
-        result = super().translate(context, text, disambiguation, numerus)  # type:ignore[arg-type]
-        if result:
-            return result  # type:ignore[return-value]
-        if not MLocale.currentLanguages():
-            # when starting kajongg.py, Qt loads translators for the system default
-            # language. I do not know how to avoid that. And I cannot delete
-            # translators I do not own. So if we want no translation, just return text.
-            # But we still need to install our own QTranslator overriding the ones
-            # mentioned above. It will never find a translation, so we come here.
-            assert Internal.app.translators == [self]
-        return text  # type:ignore[return-value]
-
-
-
 class MLocale:
     """xxxx"""
 
@@ -15,7 +15,7 @@ SPDX-License-Identifier: GPL-2.0-only
 import os
 import sys
 
-from typing import Optional, Generator, List, Dict, cast
+from typing import Optional, Generator, List, Dict, Tuple, cast
 
 from qt import QStandardPaths
 from log import logWarning, logException, logError
@@ -36,12 +36,14 @@ class Resource:
 
     cache : Optional[Dict[str, 'Resource']] = None  # common cache: tiles and background must not share identical names!
 
+    # the desktop files in a resource directory, and its mtime when we listed them
+    listings : Dict[str, Tuple[float, List[str]]] = {}
+
     def __new__(cls, name:Optional[str]=None) ->'Resource':
+        # only the selector dialogs need all resources: see available()
         if cls.cache is None:
             cls.cache = {}
-            cls.loadAll()
-        if name is None:
-            return cls.available()[0]
+        name = name or 'default'
         return cls.cache.get(name) or cls.cache.get(cls.__name(name)) or cls.__build(name)
 
     @classmethod
@@ -66,15 +68,26 @@ class Resource:
         logException(f'cannot find kmahjongg{cls.resourceName} {which} in {cls.__directories()}')
         return None
 
+    @classmethod
+    def __desktopFiles(cls, directory:str) ->List[str]:
+        """the desktop files in directory. We only list it again after it changed"""
+        mtime = os.stat(directory).st_mtime
+        if directory in cls.listings and cls.listings[directory][0] == mtime:
+            return cls.listings[directory][1]
+        result = [os.path.join(directory, x) for x in sorted(os.listdir(directory))
+                  if x.endswith('.desktop') and not x.endswith(('alphabet.desktop', 'egypt.desktop'))]
+        cls.listings[directory] = (mtime, result)
+        return result
+
     @classmethod
     def loadAll(cls) ->None:
-        """loads all available resources into cache"""
-        resourceDirectories = cls.__directories()
-        for directory in resourceDirectories:
-            for name in os.listdir(directory):
-                if name.endswith('.desktop'):
-                    if not name.endswith('alphabet.desktop') and not name.endswith('egypt.desktop'):
-                        cls(os.path.join(directory, name))
+        """loads all available resources into cache which are not yet there"""
+        if cls.cache is None:
+            cls.cache = {}
+        for directory in cls.__directories():
+            for path in cls.__desktopFiles(directory):
+                if path not in cls.cache:
+                    cls(path)
 
     @classmethod
     def available(cls) ->List['Resource']:
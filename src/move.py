@@ -22,6 +22,17 @@ if TYPE_CHECKING:
 class Move(ReprMixin):  # pylint: disable=too-many-instance-attributes
     """used for decoded move information from the game server"""
 
+    # the wire protocol understood by this version.
+    # 0: tiles and melds are sent as strings like 'S6S6S6', one move per call
+    # 1: tiles and melds are sent as bytes holding Tile.key, a meld list as
+    #    a list of such bytes. Notifications may come batched, see Client.remote_moves
+    # 2: the table list is kept up to date with versioned deltas, see
+    #    MJServer.sendTableDelta and Client.remote_tableDelta
+    # 3: full rulesets are sent compressed, see Ruleset.toWire
+    # 4: voices are sent in chunks in the background, see VoiceStore
+    # 5: batched notifications are answered move by move, see Client.remote_moves
+    protocol = 5
+
     def __init__(self, player:Optional['PlayingPlayer'],
         command:Union[Message, str], kwargs:Dict[Any,Any]) ->None:
 
@@ -60,9 +71,10 @@ class Move(ReprMixin):  # pylint: disable=too-many-instance-attributes
         self.tableid:int
         self.gameid:int
         for key, value in kwargs.items():
-            assert not isinstance(value, bytes), f'value is bytes:{repr(value)}'
             if value is None:
                 self.__setattr__(key, None)
+            elif isinstance(value, (bytes, list)) and self.isTileKey(key):
+                self.__setattr__(key, self.__decode(key, value))
             else:
                 if key.lower().endswith('tile'):
                     self.__setattr__(key, Tile(value))
@@ -80,6 +92,40 @@ class Move(ReprMixin):  # pylint: disable=too-many-instance-attributes
                 else:
                     self.__setattr__(key, value)
 
+    @staticmethod
+    def isTileKey(key:str) ->bool:
+        """does the value for key hold tiles or melds?"""
+        return any(key.lower().endswith(x) for x in ('tile', 'tiles', 'meld', 'melds'))
+
+    @staticmethod
+    def __decode(key:str, value:Union[bytes, List[bytes]]) ->Any:
+        """decode the compact form of protocol 1"""
+        key = key.lower()
+        if key.endswith('melds'):
+            return MeldList(Meld([Tile.fromKey(x) for x in meld]) for meld in value)
+        assert isinstance(value, bytes), f'{key}:{value!r}'
+        if key.endswith('tile'):
+            return Tile.fromKey(value[0])
+        tiles = [Tile.fromKey(x) for x in value]
+        return Meld(tiles) if key.endswith('meld') else TileTuple(tiles)
+
+    @classmethod
+    def compact(cls, kwargs:Dict[str, Any]) ->Dict[str, Any]:
+        """encode tiles and melds for protocol 1. They come as str
+        like for protocol 0."""
+        result = kwargs.copy()
+        for key, value in kwargs.items():
+            if value is None or not isinstance(value, str) or not cls.isTileKey(key):
+                continue
+            lowerKey = key.lower()
+            if lowerKey.endswith('melds'):
+                result[key] = [bytes(x.key for x in meld) for meld in MeldList(value)]
+            elif lowerKey.endswith('tile'):
+                result[key] = bytes([Tile(value).key])
+            else:
+                result[key] = bytes(x.key for x in TileTuple(value))
+        return result
+
     @staticmethod
     def __convertWinds(tuples:List[Tuple[str, str]]) ->List[Tuple[Wind, str]]:
         """convert wind strings to Wind objects"""
@@ -17,7 +17,7 @@ from common import IntDict, Debug
 from common import ReprMixin, Internal
 from wind import East, Wind
 from query import Query
-from tile import Tile, TileList, TileTuple, PieceList, elements, Meld, MeldList
+from tile import Tile, Piece, TileList, TileTuple, PieceList, elements, Meld, MeldList
 from tilesource import TileSource
 from permutations import Permutations
 from message import Message
@@ -445,7 +445,7 @@ class Player(ReprMixin):
     def _computeHandWithDiscard(self, discard:Tile) -> Hand:
         """what if"""
         lastSource = self.lastSource # TODO: recompute
-        save = (self.lastTile, self.lastSource)
+        save = (self.lastTile, self.__lastSource)
         try:
             self.lastSource = lastSource
             if discard:
@@ -453,7 +453,11 @@ class Player(ReprMixin):
                 self._concealedTiles.append(discard)
             return self.__computeHand()
         finally:
-            self.lastTile, self.lastSource = save
+            self.lastTile = save[0]
+            if self.__lastSource != save[1]:
+                # not the setter, it would adapt the source to the wall
+                self.__lastSource = save[1]
+                self._hand = None
             if discard:
                 self._concealedTiles.pop(-1)
 
@@ -467,6 +471,37 @@ class Player(ReprMixin):
         parts.extend(str(x) for x in self._bonusTiles)
         return ' '.join(parts)
 
+    def handState(self) ->Dict[str, Any]:
+        """the current hand as plain data for the robot AI
+        in another process, see robotpool.py"""
+        return {
+            'concealedTiles': str(self._concealedTiles),
+            'concealedMelds': str(self._concealedMelds),
+            'exposedMelds': str(self._exposedMelds),
+            'bonusTiles': str(self._bonusTiles),
+            'lastTile': str(self.__lastTile),
+            'lastMeld': str(self.lastMeld),
+            'lastSource': self.__lastSource.__name__,
+            'mayWin': self.__mayWin,
+            'originalCall': self.__originalCall,
+            'originalCallingHand': str(self.originalCallingHand) if self.originalCallingHand else None}
+
+    def restoreHandState(self, state:Dict[str, Any]) ->None:
+        """the counterpart to handState. Sets the attributes directly
+        because the setters would also apply game logic"""
+        self.clearHand()
+        self._concealedTiles = PieceList(TileTuple(state['concealedTiles']))
+        self._concealedMelds = MeldList(state['concealedMelds'])
+        self._exposedMelds = MeldList(state['exposedMelds'])
+        self._bonusTiles = TileList(state['bonusTiles'])
+        self.__lastTile = Tile(state['lastTile'])
+        self.lastMeld = Meld(state['lastMeld'])
+        self.__lastSource = getattr(TileSource, state['lastSource'])
+        self.__mayWin = state['mayWin']
+        self.__originalCall = state['originalCall']
+        if state['originalCallingHand']:
+            self.originalCallingHand = Hand(self, state['originalCallingHand'])
+
     def sortRulesByX(self, rules:List['UsedRule']) ->List['UsedRule']:
         """if this game has a GUI, sort rules by GUI order"""
         return rules
@@ -647,6 +682,8 @@ class PlayingPlayer(Player):  # pylint:disable=too-many-instance-attributes
         """return True if Original Call is possible"""
         assert self.game
         for tileName in sorted(set(self.concealedTiles)):
+            if self.intelligence.deadlineHit():
+                return False
             newHand = self.hand - tileName
             if newHand.callingHands:
                 if Debug.originalCall:
@@ -661,16 +698,31 @@ class PlayingPlayer(Player):  # pylint:disable=too-many-instance-attributes
         Message.Chow: __maySayChow,
         Message.MahJongg: __maySayMahjongg,
         Message.OriginalCall: __maySayOriginalCall}
+    __optionalSayables = (Message.OriginalCall, Message.Kong, Message.Pung, Message.Chow)
 
     def computeSayable(self, move:'Move', answers:List['ClientMessage']) ->None:
         """find out what the player can legally say with this hand"""
         self.sayable = {}
         for message in Message.defined.values():
             if message in answers and message in self.__sayables:
-                self.sayable[message] = self.__sayables[message](self, move)
+                if message in self.__optionalSayables and self.intelligence.deadlineHit():
+                    # the anytime AI has no time left for optional claims
+                    self.sayable[message] = None
+                else:
+                    self.sayable[message] = self.__sayables[message](self, move)
             else:
                 self.sayable[message] = True
 
+    def mayClaim(self, claim:Message) ->bool:
+        """could the player legally claim the last discard? Used by the server
+        where the concealed tiles are Pieces"""
+        assert self.game
+        if not self.game.lastDiscard:
+            return False
+        if claim == Message.MahJongg:
+            return self._computeHandWithDiscard(Piece(self.game.lastDiscard)).won
+        return bool(self.__sayables[claim](self, None))
+
     def maybeDangerous(self, msg:Message) ->MeldList:
         """could answering with msg lead to dangerous game?
         If so return a list of resulting melds
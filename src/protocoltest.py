@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+tests for the wire protocol between game server and client
+"""
+
+import unittest
+from types import SimpleNamespace
+from typing import Any, List, Tuple
+
+from twisted.internet.defer import Deferred, succeed
+from twisted.spread import pb
+
+from client import Client
+from message import Message
+from move import Move
+from server import MJServer
+from rule import Ruleset, PredefinedRuleset
+from testfakes import User, dmjlRuleset
+import predefined
+
+predefined.load()
+RULESET = dmjlRuleset()
+
+
+class Server(MJServer):
+
+    """no data base, no connections. Remembers what it sends,
+    every remote call gets answers"""
+
+    def __init__(self, answers:Any=None) ->None:  # pylint:disable=super-init-not-called
+        self.tables = {}
+        self.sent:List[Tuple[Any, ...]] = []
+        self.answers = answers
+
+    def callRemote(self, user:Any, *args:Any, **kwargs:Any) ->Deferred:
+        self.sent.append(args)
+        return succeed(self.answers)
+
+
+class Encoding(unittest.TestCase):
+
+    """the compact encoding of tiles and melds, protocol 1"""
+
+    kwargs = {
+        'tile': 'S6', 'lastTile': 'b3', 'withDiscardTile': 'Dg',
+        'tiles': 'S6S7S8DrDr', 'meld': 'b1b1b1b1', 'lastMeld': 's4s5s6',
+        'melds': 'B1B2B3 c5c5c5 DgDgDg', 'exposedMeld': None,
+        'score': 1234, 'show': True, 'notifying': True, 'token': 'abc'}
+
+    def testCompact(self) ->None:
+        """only tiles and melds are encoded, as bytes"""
+        compact = Move.compact(self.kwargs)
+        for key, value in compact.items():
+            if Move.isTileKey(key) and value is not None:
+                self.assertIsInstance(value, (bytes, list), key)
+            else:
+                self.assertEqual(value, self.kwargs[key], key)
+
+    def testRoundTrip(self) ->None:
+        """the client decodes the compact form into what protocol 0 gives"""
+        plain = Move(None, Message.Discard, self.kwargs)
+        compact = Move(None, Message.Discard, Move.compact(self.kwargs))
+        for key in self.kwargs:
+            if key != 'token':
+                self.assertEqual(getattr(compact, key), getattr(plain, key), key)
+        self.assertEqual(compact.token, 'abc')
+
+    def testBatch(self) ->None:
+        """a batch of notifications survives jellyAll"""
+        args, kwargs = Message.jellyAll(['S', Message.Discard.name], Move.compact(self.kwargs))
+        move = Move(None, args[1], kwargs)
+        self.assertEqual(move.melds, Move(None, Message.Discard, self.kwargs).melds)
+
+
+class Mirror(Client):
+
+    """a client which fails for Error moves"""
+
+    def exec_move(self, move:Move) ->Deferred:
+        if move.message == Message.Error:
+            raise ValueError('cannot do that')
+        return succeed(None)
+
+
+class Batch(unittest.TestCase):
+
+    """a batch of notifications, protocol 5: one failing move
+    does not fail the others"""
+
+    @staticmethod
+    def move(command:Message) ->Tuple[List[Any], Any]:
+        """a notification as sent in a batch"""
+        return [None, command.name], {'notifying': True, 'token': None}
+
+    def testClient(self) ->None:
+        """the client answers move by move"""
+        result:List[Any] = []
+        Mirror().remote_moves(
+            [self.move(Message.OK), self.move(Message.Error), self.move(Message.OK)]).addCallback(result.append)
+        self.assertEqual(result, [[(True, 'OK'), (False, 'cannot do that'), (True, 'OK')]])
+
+    def flush(self, answers:List[Any], protocol:int=Move.protocol) ->List[Any]:
+        """let the server distribute answers to the deferreds of three queued moves"""
+        user:Any = User('T1', protocol=protocol)
+        results:List[Any] = []
+        for _ in range(3):
+            result:Deferred = Deferred()
+            result.addBoth(results.append)
+            user.pendingMoves.append((result, [None, Message.OK.name], {'notifying': True}))
+        Server(answers).flushMoves(user)
+        return results
+
+    def testServer(self) ->None:
+        """only the deferred of the failing move errbacks"""
+        results = self.flush([(True, 'OK'), (False, 'cannot do that'), (True, 'OK')])
+        self.assertEqual(results[0], 'OK')
+        self.assertTrue(results[1].check(pb.Error))
+        self.assertEqual(results[1].getErrorMessage(), 'cannot do that')
+        self.assertEqual(results[2], 'OK')
+
+    def testOldProtocol(self) ->None:
+        """before protocol 5, the answers come without success flags"""
+        self.assertEqual(self.flush(['OK', 'NO', 'OK'], protocol=4), ['OK', 'NO', 'OK'])
+
+    def testConnectionLost(self) ->None:
+        """without answers, all deferreds get None"""
+        self.assertEqual(self.flush([]), [None, None, None])
+
+
+class ServerTable(SimpleNamespace):
+
+    """stands for a ServerTable"""
+
+    def __init__(self, tableid:int, names:Tuple[str, ...]=('T1', )) ->None:
+        super().__init__(tableid=tableid, names=names, running=False, hidden=False)
+
+    def visibleFor(self, unusedUser:Any) ->bool:
+        """the table list of the user shows this table"""
+        return not self.hidden
+
+    def asSimpleList(self) ->List[Any]:
+        """like ServerTable.asSimpleList"""
+        return [self.tableid, RULESET.hash, None, None, self.running, False, False, '42',
+                self.names, tuple(True for _ in self.names), None]
+
+
+class TableDelta(unittest.TestCase):
+
+    """the table list is kept up to date with versioned deltas, protocol 2"""
+
+    def setUp(self) ->None:
+        self.server = Server()
+        self.sent = self.server.sent
+        self.user:Any = User('T1')
+        self.client = Client()
+        self.client.name = 'T1'
+
+    def send(self, *tables:Any, snapshot:bool=False) ->None:
+        """the server tells the client what changed"""
+        self.server.sendTableDelta(self.user, list(tables), snapshot=snapshot)
+        if self.sent:
+            _, shard, _, added, changed, removed, isSnapshot = self.sent[-1]
+            self.client.applyTableDelta(shard, added, changed, removed, isSnapshot)
+
+    def clientSees(self) ->List[List[Any]]:
+        """the tables of the client as the server would send them"""
+        return sorted(x.simpleList for x in self.client.tables)
+
+    def add(self, *tables:ServerTable) ->None:
+        """the server has new tables"""
+        for table in tables:
+            self.server.tables[table.tableid] = table
+
+    def testAdded(self) ->None:
+        """new tables go as a full list"""
+        first, second = ServerTable(1), ServerTable(2)
+        self.add(first, second)
+        self.send(first, second, snapshot=True)
+        self.assertEqual(self.clientSees(), [first.asSimpleList(), second.asSimpleList()])
+        self.assertEqual(self.sent[-1][2], 1)
+
+    def testChanged(self) ->None:
+        """for a changed table, only the changed fields are sent"""
+        table = ServerTable(1)
+        self.add(table)
+        self.send(table)
+        table.names = ('T1', 'T2')
+        self.send(table)
+        _, _, version, added, changed, removed, _ = self.sent[-1]
+        self.assertEqual((version, added, removed), (2, [], []))
+        self.assertEqual(changed, [(1, {8: ('T1', 'T2'), 9: (True, True)})])
+        self.assertEqual(self.clientSees(), [table.asSimpleList()])
+
+    def testRemoved(self) ->None:
+        """tables the user does not see anymore are removed by id"""
+        first, second = ServerTable(1), ServerTable(2)
+        self.add(first, second)
+        self.send(first, second)
+        second.hidden = True
+        self.send(second)
+        self.assertEqual(self.sent[-1][5], [2])
+        del self.server.tables[1]
+        self.send(first)
+        self.assertEqual(self.sent[-1][5], [1])
+        self.assertEqual(self.clientSees(), [])
+
+    def testUnchanged(self) ->None:
+        """nothing changed: nothing is sent, the version stays"""
+        table = ServerTable(1)
+        self.add(table)
+        self.send(table)
+        self.send(table)
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual(self.user.tableVersion, 1)
+
+    def testSnapshot(self) ->None:
+        """a snapshot replaces everything the client got before"""
+        first, second = ServerTable(1), ServerTable(2)
+        self.add(first, second)
+        self.send(first, second)
+        del self.server.tables[1]
+        self.user.knownTables.clear()
+        self.send(second, snapshot=True)
+        self.assertEqual(self.clientSees(), [second.asSimpleList()])
+        self.user.knownTables.clear()
+        self.send(snapshot=True)
+        self.assertEqual(self.clientSees(), [])
+        self.assertEqual(self.user.tableVersion, 3)
+
+
+class RulesetWire(unittest.TestCase):
+
+    """full rulesets go over the wire compressed, protocol 3"""
+
+    foreignHash = 'f' * 32
+
+    def tearDown(self) ->None:
+        Ruleset.cache.pop(self.foreignHash, None)
+
+    def foreign(self) ->Ruleset:
+        """a ruleset which is not predefined"""
+        rules = RULESET.toList()
+        rules[0] = [-7, self.foreignHash, 'foreign', 'not predefined']
+        return Ruleset(rules)
+
+    def testRoundTrip(self) ->None:
+        """fromWire gives back what toList says"""
+        self.assertEqual(Ruleset.fromWire(RULESET.toWire()), RULESET.toList())
+
+    def testCompressed(self) ->None:
+        """the compressed form is much smaller and only computed once"""
+        wire = RULESET.toWire()
+        self.assertIsInstance(wire, bytes)
+        self.assertLess(len(wire) * 3, len(repr(RULESET.toList())))
+        self.assertIs(RULESET.toWire(), wire)
+
+    def testPredefined(self) ->None:
+        """a predefined ruleset is found by the hash in the wired data"""
+        self.assertIs(Ruleset.cached(RULESET.toWire()), PredefinedRuleset.byHash()[RULESET.hash])
+
+    def testForeign(self) ->None:
+        """other rulesets are built once and then found in the cache"""
+        wire = self.foreign().toWire()
+        ruleset = Ruleset.cached(wire)
+        self.assertEqual((ruleset.hash, ruleset.name), (self.foreignHash, 'foreign'))
+        self.assertEqual(len(ruleset.allRules), len(RULESET.allRules))
+        self.assertIs(Ruleset.cached(wire), ruleset)
+        self.assertIs(Ruleset.cached(self.foreignHash), ruleset)
+
+    def testNeedRulesets(self) ->None:
+        """the server sends every wanted ruleset only once"""
+        server = Server()
+        foreign = self.foreign()
+        for tableid, used in enumerate((RULESET, foreign, RULESET)):
+            table:Any = SimpleNamespace(ruleset=used)
+            server.tables[tableid] = table
+        self.assertEqual(server.needRulesets([RULESET.hash]), [RULESET.toWire()])
+        self.assertEqual(
+            server.needRulesets([RULESET.hash, self.foreignHash]), [RULESET.toWire(), foreign.toWire()])
+        self.assertEqual(server.needRulesets(['0' * 32]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
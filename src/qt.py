@@ -50,6 +50,7 @@ from qtpy.QtCore import QSizeF
 from qtpy.QtCore import QSocketNotifier
 from qtpy.QtCore import QTimer
 from qtpy.QtCore import QTranslator
+from qtpy.QtCore import QVariantAnimation
 from qtpy.QtCore import QLocale
 from qtpy.QtCore import Property
 from qtpy.QtCore import Signal
@@ -90,6 +91,7 @@ from qtpy.QtWidgets import QHBoxLayout
 from qtpy.QtWidgets import QHeaderView
 from qtpy.QtWidgets import QGroupBox
 from qtpy.QtGui import QIcon
+from qtpy.QtGui import QImage
 from qtpy.QtGui import QImageReader
 from qtpy.QtCore import QItemSelectionModel
 from qtpy.QtWidgets import QLabel
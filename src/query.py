@@ -11,6 +11,7 @@ SPDX-License-Identifier: GPL-2.0-only
 """
 
 import os
+import time
 import traceback
 import datetime
 import random
@@ -22,6 +23,7 @@ from mi18n import i18n, i18ncE
 from util import Duration
 from log import logInfo, logWarning, logException, logError, logDebug
 from common import Options, Internal, Debug, appdataDir, ReprMixin
+from metrics import Metrics
 
 class QueryException(Exception):
 
@@ -47,6 +49,7 @@ class DBCursor(sqlite3.Cursor, ReprMixin):
         self.parameters = parameters
         if not silent:
             logDebug(repr(self))
+        started = time.monotonic()
         try:
             with Duration(f'{self!r}', 60.0 if Debug.neutral else 3.0):
                 if isinstance(parameters, list):
@@ -65,6 +68,8 @@ class DBCursor(sqlite3.Cursor, ReprMixin):
                 if not failSilent:
                     logError(msg)
                 raise
+        finally:
+            Metrics.observe('query', time.monotonic() - started)
 
     def __str__(self) ->str:
         """the statement"""
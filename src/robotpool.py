@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+With --aiprocesses, the game server computes the answers of its robot
+players in a pool of worker processes, so the reactor does not block
+while a robot thinks.
+
+The robot client sends a snapshot of what its player sees: the hands
+of all players as far as it knows them, all discards, the size of the
+living wall and the hash of the ruleset. Only plain data goes over the
+process boundary. A worker process rebuilds that view in a game of its
+own and returns the answer together with the state of the random
+generator.
+
+Within a hand, only the AI uses the random generator of a robot. So
+the questions for one robot are answered one after the other, each
+starting with the random state left by the previous answer, and a
+seeded game goes on exactly as if the robot had answered in the server
+process, even if the server did not wait for an answer. That is not
+so if a worker process fails: the robot then thinks in the server with
+the random state it has at that time.
+"""
+
+import multiprocessing
+import weakref
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Optional, List, Dict, Tuple, Set, Any
+
+from twisted.internet.defer import Deferred, fail
+
+from common import Internal, Debug, Options
+from log import logDebug
+from message import Message
+from move import Move
+from rand import CountingRandom
+from rule import Ruleset, PredefinedRuleset
+from tile import Tile, TileTuple
+from wind import Wind
+
+if TYPE_CHECKING:
+    from client import Client
+    from game import PlayingGame
+    from message import ClientMessage
+    from player import PlayingPlayer
+
+
+class UnknownRuleset(Exception):
+
+    """the worker process does not yet know this ruleset"""
+
+
+def _counts(tiles:Dict[Tile, int]) ->List[Tuple[str, int]]:
+    """an IntDict as plain data"""
+    return [(str(tile), count) for tile, count in tiles.items() if count]
+
+
+def _dangerous(dangerous:List[Tuple[Set[Tile], str]]) ->List[Tuple[str, str]]:
+    """dangerous tiles as plain data"""
+    return [(''.join(str(x) for x in tiles), txt) for tiles, txt in dangerous]
+
+
+def _moveData(move:Move) ->Tuple[Optional[str], str, Dict[str, Any]]:
+    """a move as plain data"""
+    return (move.player.name if move.player else None, move.message.name,
+            {key: Message.jelly(key, value) for key, value in move.kwargs.items()})
+
+
+def _handId(game:'PlayingGame') ->str:
+    """the random generator is seeded for every hand, see Game._setHandSeed"""
+    return f'{game.seed}/{game.point}'
+
+
+def snapshot(game:'PlayingGame', move:Move, answers:List['ClientMessage'],
+             deadline:Optional[float]) ->Dict[str, Any]:
+    """what the robot player myself knows about the game"""
+    assert game.wall
+    return {
+        'ruleset': game.ruleset.hash,
+        'game': _handId(game),
+        'players': [(str(x.wind), x.name) for x in game.players],
+        'myself': game.myself.name,
+        'hands': {x.name: x.handState() for x in game.players},
+        'playerDiscards': {x.name: [str(y) for y in x.discarded] for x in game.players},
+        'active': game.activePlayer.name,
+        'lastDiscard': str(game.lastDiscard) if game.lastDiscard else None,
+        'wall': len(game.wall.living),
+        'discarded': _counts(game.discardedTiles),
+        'dangerous': _dangerous(game.dangerousTiles),
+        'visible': {x.name: _counts(x.visibleTiles) for x in game.players},
+        'playerDangerous': {x.name: _dangerous(x.dangerousTiles) for x in game.players},
+        'moves': [_moveData(x) for x in game.moves
+                  if x.message == Message.Discard or x is game.moves[-1]],
+        'move': _moveData(move),
+        'answers': [x.name for x in answers],
+        'random': game.randomGenerator.getstate(),
+        'deadline': deadline}
+
+
+class RobotPool:
+
+    """the worker processes for the robot AI"""
+
+    executor:Optional[ProcessPoolExecutor] = None
+    thinking:'weakref.WeakKeyDictionary[Client, Deferred]' = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def __executor(cls) ->ProcessPoolExecutor:
+        """start the worker processes when they are first needed"""
+        if cls.executor is None:
+            cls.executor = ProcessPoolExecutor(
+                max_workers=Options.aiProcesses,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=initProcess, initargs=(Debug.argString, ))
+            if Debug.robotAI:
+                logDebug(f'started {Options.aiProcesses} processes for the robot AI')
+        return cls.executor
+
+    @classmethod
+    def shutdown(cls) ->None:
+        """the server terminates, see server.cleanExit"""
+        if cls.executor:
+            cls.executor.shutdown(cancel_futures=True)
+            cls.executor = None
+
+    @classmethod
+    def selectAnswer(cls, client:'Client', move:Move, answers:List['ClientMessage'],
+                     deadline:Optional[float]=None) ->Deferred:
+        """the robot AI for client, computed by a worker process.
+        The Deferred fires with answer and parameter"""
+        assert client.game
+        view = snapshot(client.game, move, answers, deadline)
+        result:Deferred = Deferred()
+        done:Deferred = Deferred()
+        result.addBoth(cls.__done, done)
+        previous = cls.thinking.get(client)
+        cls.thinking[client] = done
+        if previous is None or previous.called:
+            cls.__submit(client, view, result)
+        else:
+            previous.addCallback(cls.__submitNext, client, view, result)
+        return result
+
+    @staticmethod
+    def __done(answer:Any, done:Deferred) ->Any:
+        """the next question for this robot may now be submitted"""
+        done.callback(None)
+        return answer
+
+    @classmethod
+    def __submitNext(cls, unused:Any, client:'Client', view:Dict[str, Any], result:Deferred) ->None:
+        """the previous answer of client is in. Start with the random state it left"""
+        if client.game and _handId(client.game) == view['game']:
+            view['random'] = client.game.randomGenerator.getstate()
+        cls.__submit(client, view, result)
+
+    @classmethod
+    def __submit(cls, client:'Client', view:Dict[str, Any], result:Deferred) ->None:
+        """let a worker process compute the answer"""
+        def done(future:Future) ->None:
+            """called by the thread managing the executor"""
+            Internal.reactor.callFromThread(gotAnswer, future)  # type:ignore[attr-defined]
+
+        def gotAnswer(future:Future) ->None:
+            """back in the reactor thread"""
+            exception = future.exception()
+            if isinstance(exception, UnknownRuleset) and 'rules' not in view:
+                assert client.game
+                view['rules'] = client.game.ruleset.toList()
+                cls.__submit(client, view, result)
+            elif exception:
+                result.errback(exception)
+            else:
+                result.callback(cls.__answered(client, view, future.result()))
+        try:
+            cls.__executor().submit(think, view).add_done_callback(done)
+        except (BrokenProcessPool, RuntimeError) as exception:
+            cls.executor = None
+            fail(exception).chainDeferred(result)
+
+    @staticmethod
+    def __answered(client:'Client', view:Dict[str, Any],
+                   answer:Tuple[str, Any, Any, int, bool]) ->Tuple[Message, Any]:
+        """the worker process found an answer. Continue with its random
+        generator unless we needed it ourselves meanwhile"""
+        name, parameter, randomState, randomCalls, deadlineWasHit = answer
+        game = client.game
+        if game:
+            if game.randomGenerator.getstate() == view['random']:
+                game.randomGenerator.setstate(randomState)
+                CountingRandom.count += randomCalls
+            elif Debug.random:
+                game.debug(f'{game.myself}: random generator was used while the AI process was thinking')
+            game.myself.intelligence.deadlineWasHit = deadlineWasHit
+        return Message.defined[name], parameter
+
+
+# everything below runs in the worker processes
+
+_rulesets:Dict[str, Ruleset] = {}
+_clients:Dict[Tuple[Any, ...], 'Client'] = {}
+
+
+def initProcess(debugArgs:Optional[str]) ->None:
+    """a new worker process"""
+    Internal.isServer = True
+    Internal.logPrefix = 'S'
+    Debug.setOptions(debugArgs)  # type:ignore[arg-type]
+    import predefined  # pylint:disable=import-outside-toplevel
+    predefined.load()
+    _rulesets.update((x.hash, x) for x in PredefinedRuleset.rulesets())
+
+
+def __game(view:Dict[str, Any]) ->'PlayingGame':
+    """a game with the players of view. The same game is used for all
+    answers of a robot within a hand"""
+    from client import Client  # pylint:disable=import-outside-toplevel
+    from game import PlayingGame  # pylint:disable=import-outside-toplevel
+    key = (view['ruleset'], view['game'], view['myself'], tuple(tuple(x) for x in view['players']))
+    if key not in _clients:
+        if view['ruleset'] not in _rulesets:
+            if 'rules' not in view:
+                raise UnknownRuleset(view['ruleset'])
+            _rulesets[view['ruleset']] = Ruleset.cached(view['rules'])
+        if len(_clients) >= 50:
+            # forget the game used least recently
+            del _clients[next(iter(_clients))]
+        client = Client(view['myself'])
+        client.game = PlayingGame(
+            [(Wind(wind), name) for wind, name in view['players']], _rulesets[view['ruleset']],
+            wantedGame=view['game'], client=client)
+    else:
+        client = _clients.pop(key)
+    _clients[key] = client
+    result = client.game
+    assert result
+    return result
+
+
+def __dangerous(dangerous:List[Tuple[str, str]]) ->List[Tuple[Set[Tile], str]]:
+    """the counterpart to _dangerous"""
+    return [(set(TileTuple(tiles)), txt) for tiles, txt in dangerous]
+
+
+def __move(game:'PlayingGame', data:Tuple[Optional[str], str, Dict[str, Any]]) ->Move:
+    """the counterpart to _moveData"""
+    playerName, command, kwargs = data
+    player = game.players.byName(playerName) if playerName else None
+    return Move(player, command, dict(kwargs, token=None))  # type:ignore[arg-type]
+
+
+def __restore(game:'PlayingGame', view:Dict[str, Any]) ->None:
+    """make game look like the game of the robot in the server"""
+    assert game.wall
+    for player in game.players:
+        player.restoreHandState(view['hands'][player.name])
+        player.discarded = [Tile(x) for x in view['playerDiscards'][player.name]]
+        for tile, count in view['visible'][player.name]:
+            player.visibleTiles[Tile(tile)] = count
+        player.dangerousTiles = __dangerous(view['playerDangerous'][player.name])
+    game.discardedTiles.clear()
+    for tile, count in view['discarded']:
+        game.discardedTiles[Tile(tile)] = count
+    game.dangerousTiles = __dangerous(view['dangerous'])
+    game.wall.living = game.wall.tiles[:view['wall']]
+    game.lastDiscard = Tile(view['lastDiscard']) if view['lastDiscard'] else None
+    game.activePlayer = game.players.byName(view['active'])  # type:ignore[assignment]
+    game.moves = [__move(game, x) for x in view['moves']]
+    game.randomGenerator.setstate(view['random'])
+
+
+def think(view:Dict[str, Any]) ->Tuple[str, Any, Any, int, bool]:
+    """the robot AI in a worker process. Returns the answer, its
+    parameter, and what the random generator needs to go on"""
+    game = __game(view)
+    __restore(game, view)
+    myself:'PlayingPlayer' = game.myself  # type:ignore[assignment]
+    myself.intelligence.deadline = view['deadline']
+    myself.intelligence.deadlineWasHit = False
+    answers = [Message.defined[x] for x in view['answers']]
+    randomCalls = CountingRandom.count
+    myself.computeSayable(__move(game, view['move']), answers)  # type:ignore[arg-type]
+    answer, parameter = myself.intelligence.selectAnswer(answers)  # type:ignore[arg-type]
+    return (answer.name, Message.jelly('parameter', parameter), game.randomGenerator.getstate(),
+            CountingRandom.count - randomCalls, myself.intelligence.deadlineWasHit)
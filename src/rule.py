@@ -7,14 +7,18 @@ SPDX-License-Identifier: GPL-2.0-only
 Read the user manual for a description of the interface to this scoring engine
 """
 
+import os
+import sys
 import types
+import json
+import zlib
 from hashlib import md5
 from typing import Any, List, Tuple, Dict, Type, Union, Optional, TYPE_CHECKING
-from typing import Sequence, Set
+from typing import Sequence, Set, Callable
 import sqlite3
 
 from common import Internal, Debug
-from common import ReprMixin
+from common import ReprMixin, cacheDir
 from log import logException, logDebug
 from mi18n import i18n, i18nc, i18nE, i18ncE, english
 from query import Query
@@ -309,25 +313,32 @@ class Ruleset:
 
     __hash__ = None  # type: ignore
 
+    # rulesets by id and by hash. The hash identifies the content,
+    # so a ruleset with a known hash never has to be built again
     cache : Dict[Union[int, str], 'Ruleset'] = {}
     hits = 0
     misses = 0
+    __knownHashes : Set[str] = set()  # all hashes in Internal.db
+    __knownHashesDb : Any = None  # the db __knownHashes was read from
+    hookNames = ('claimness', 'rotate', 'weigh')  # optional methods of rules, see hooks()
 
     @staticmethod
-    def cached(name:Union[int, str]) ->'Ruleset':
+    def cached(name:Union[int, str, bytes, List[Any]]) ->'Ruleset':
         """If a Ruleset instance is never changed, we can use a cache"""
+        if isinstance(name, bytes):
+            name = Ruleset.fromWire(name)
         if isinstance(name, list):
             # we got the rules over the wire
-            _, wiredHash, _, _ = name[0]
+            _, key, _, _ = name[0]
         else:
-            wiredHash = None
-        for predefined in PredefinedRuleset.rulesets():
-            if predefined.hash in (name, wiredHash):
-                return predefined
+            key = name
+        predefined = PredefinedRuleset.byHash().get(key)  # type:ignore[call-overload]
+        if predefined:
+            return predefined
         cache = Ruleset.cache
-        if not isinstance(name, list) and name in cache:
-            return cache[name]
-        result = Ruleset(name)
+        if key in cache:
+            return cache[key]
+        result = Ruleset(name)  # type:ignore[arg-type]
         cache[result.rulesetId] = result
         cache[result.hash] = result
         return result
@@ -342,10 +353,12 @@ class Ruleset:
         self.name:str
         self.rulesetId:int = 0
         self.__hash:str = ''
+        self.__wire:Tuple[str, bytes] = ('', b'')  # hash and toWire() for that hash
         self.allRules:List[Rule] = []
         self.__dirty = False  # only the ruleset editor is supposed to make us dirty
         self.__loaded = False
         self.__filteredLists:Dict[str, List[RuleBase]] = {}
+        self.__hooks:Dict[str, List[Tuple[RuleBase, Callable[..., Any]]]] = {}
         self.description = ''
         self.rawRules:Optional[List[List[str]]] = None  # used when we get the rules over the network
         self.doublingMeldRules:List[Rule] = []
@@ -398,6 +411,8 @@ into a situation where you have to pay a penalty"""))
         """have we been modified since load or last save?"""
         self.__dirty = dirty
         if dirty:
+            self.__filteredLists = {}
+            self.__hooks = {}
             self.__computeHash()
 
     @property
@@ -426,12 +441,31 @@ into a situation where you have to pay a penalty"""))
 
     @staticmethod
     def hashIsKnown(value:str) ->bool:
-        """return False or True"""
-        result = any(x.hash == value for x in PredefinedRuleset.rulesets())
-        if not result:
-            query = Query("select id from ruleset where hash=?", (value,))
-            result = bool(query.records)
-        return result
+        """return False or True. The hashes in the database are
+        only read once, save() and friends keep them up to date"""
+        if value in PredefinedRuleset.byHash():
+            return True
+        if Ruleset.__knownHashesDb is not Internal.db:
+            Ruleset.__knownHashesDb = Internal.db
+            Ruleset.__knownHashes = {x[0] for x in Query('select hash from ruleset').records}
+        return value in Ruleset.__knownHashes
+
+    @staticmethod
+    def _forgetKnownHashes() ->None:
+        """the table ruleset changed, read it again when needed"""
+        Ruleset.__knownHashesDb = None
+
+    def toWire(self) ->bytes:
+        """toList, compressed for the network"""
+        if self.__wire[0] != self.hash:
+            self.__wire = (self.hash, zlib.compress(
+                json.dumps(self.toList(), separators=(',', ':')).encode('utf-8'), 9))
+        return self.__wire[1]
+
+    @staticmethod
+    def fromWire(data:bytes) ->List[Any]:
+        """the counterpart to toWire"""
+        return json.loads(zlib.decompress(data).decode('utf-8'))
 
     def _initRuleset(self) ->None:
         """load ruleset headers but not the rules"""
@@ -490,6 +524,7 @@ into a situation where you have to pay a penalty"""))
                 self.standardMJRule = mjRule
                 break
         assert self.standardMJRule
+        self.__indexHooks()
         return self
 
     def __loadQuery(self) ->Query:
@@ -544,6 +579,19 @@ into a situation where you have to pay a penalty"""))
             self.__filteredLists[attrName] = [x for x in self.allRules if hasattr(x, attrName)]
         return self.__filteredLists[attrName]
 
+    def __indexHooks(self) ->None:
+        """for every hook, the rules having it together with the method to call"""
+        for hookName in self.hookNames:
+            self.__hooks[hookName] = [(x, getattr(x, hookName)) for x in self.filterRules(hookName)]
+
+    def hooks(self, hookName:str) ->List[Tuple['RuleBase', Callable[..., Any]]]:
+        """the rules implementing hookName with their method. Those are
+        called for every claim and discard, so they are indexed by load()"""
+        if not self.__hooks:
+            # the ruleset editor changed us
+            self.__indexHooks()
+        return self.__hooks[hookName]
+
     @staticmethod
     def newId(minus:bool=False) ->int:
         """return an unused ruleset id. This is not multi user safe."""
@@ -613,6 +661,7 @@ into a situation where you have to pay a penalty"""))
         with Internal.db:
             Query("DELETE FROM rule WHERE ruleset=?", (self.rulesetId,))
             Query("DELETE FROM ruleset WHERE id=?", (self.rulesetId,))
+        self._forgetKnownHashes()
 
     def __computeHash(self) ->None:
         """compute the hash for this ruleset using all rules but not name and
@@ -648,6 +697,7 @@ into a situation where you have to pay a penalty"""))
                 "UPDATE ruleset SET hash=? WHERE id=?",
                 (self.hash,
                  self.rulesetId))
+        self._forgetKnownHashes()
 
     def save(self, minus:bool=False, forced:bool=False) ->None:
         """save the ruleset to the database.
@@ -682,6 +732,7 @@ into a situation where you have to pay a penalty"""))
                 'points, doubles, limits, parameter) VALUES(?,?,?,?,?,?,?,?,?)'
             args = [self.ruleRecord(x) for x in self.allRules]
             Query(cmd, args)
+        self._forgetKnownHashes()
 
     @staticmethod
     def availableRulesets() ->List['Ruleset']:
@@ -1050,10 +1101,69 @@ class PredefinedRuleset(Ruleset):
 
     classes : Set[Type] = set()  # only those will be playable
     preRulesets : List['PredefinedRuleset'] = []
+    preHashes : Dict[str, 'PredefinedRuleset'] = {}
+    snapshot : Optional[Dict[str, str]] = None  # the hashes by class name, see __readSnapshot
 
     def __init__(self, name:str='') ->None:
         super().__init__(name or 'general predefined ruleset')
 
+    @property
+    def hash(self) ->str:
+        """predefined rulesets only change with the program, so their hashes
+        are kept in cacheDir(). Knowing the hash, we need not load the rules"""
+        snapshot = PredefinedRuleset.__readSnapshot()
+        return snapshot.get(self.__class__.__name__) or Ruleset.hash.fget(self)  # type:ignore[attr-defined]
+
+    @staticmethod
+    def __sourceChecksum() ->str:
+        """changes with the code defining the predefined rulesets.
+        Empty if we cannot read the source files"""
+        result = md5()
+        paths = {sys.modules[x.__module__].__file__ for x in PredefinedRuleset.classes}
+        paths.add(__file__)
+        try:
+            for path in sorted(paths):  # type:ignore[type-var]
+                with open(path, 'rb') as source:  # type:ignore[arg-type]
+                    result.update(source.read())
+        except (OSError, TypeError):
+            return ''
+        result.update(' '.join(sorted(x.__name__ for x in PredefinedRuleset.classes)).encode())
+        return result.hexdigest()
+
+    @staticmethod
+    def __readSnapshot() ->Dict[str, str]:
+        """the hashes from the last run with the same source code.
+        If there was none, compute them the hard way and save them"""
+        if PredefinedRuleset.snapshot is None:
+            PredefinedRuleset.snapshot = {}
+            checksum = PredefinedRuleset.__sourceChecksum()
+            if not checksum:
+                return PredefinedRuleset.snapshot
+            path = os.path.join(cacheDir(), 'predefinedRulesets', 'hashes.json')
+            try:
+                with open(path, encoding='utf-8') as snapshotFile:
+                    content = json.load(snapshotFile)
+                if content['checksum'] == checksum:
+                    PredefinedRuleset.snapshot = content['hashes']
+                    return PredefinedRuleset.snapshot  # type:ignore[return-value]
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+            hashes = {x.__class__.__name__: Ruleset.hash.fget(x)  # type:ignore[attr-defined]
+                      for x in PredefinedRuleset.rulesets()}
+            if Debug.sql:
+                logDebug(f'writing {path} for source checksum {checksum}')
+            try:
+                # other processes may read it meanwhile
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                newPath = f'{path}.{os.getpid()}'
+                with open(newPath, 'w', encoding='utf-8') as snapshotFile:
+                    json.dump({'checksum': checksum, 'hashes': hashes}, snapshotFile)
+                os.replace(newPath, path)
+            except OSError:
+                pass
+            PredefinedRuleset.snapshot = hashes
+        return PredefinedRuleset.snapshot
+
     @staticmethod
     def rulesets() ->Sequence[Ruleset]:
         """a list of instances for all predefined rulesets"""
@@ -1062,6 +1172,13 @@ class PredefinedRuleset(Ruleset):
                 x() for x in sorted(PredefinedRuleset.classes, key=lambda x: x.__name__)]
         return PredefinedRuleset.preRulesets
 
+    @staticmethod
+    def byHash() ->Dict[str, 'PredefinedRuleset']:
+        """all predefined rulesets by hash"""
+        if not PredefinedRuleset.preHashes:
+            PredefinedRuleset.preHashes = {x.hash: x for x in PredefinedRuleset.rulesets()}  # type:ignore[misc]
+        return PredefinedRuleset.preHashes
+
     def rules(self) ->None:
         """here the predefined rulesets can define their rules"""
 
@@ -54,6 +54,13 @@ class RuleCode:
         This is used to find all winning hands which only need
         one tile: The calling hands (after calling)
 
+    mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList):
+        Optional for rules looking at the melds of the whole hand.
+        False if the rule cannot apply to any arrangement of hand having
+        melds. hand is not yet arranged, the tiles in rest will make more
+        melds and the meld with the last tile may still be exposed, so
+        only return False if the rule can never apply. See Hand.__arrange
+
     """
 
     cache : Tuple[str, ...] = ()
@@ -252,18 +259,27 @@ class ZeroPointHand(RuleCode):
     def appliesToHand(hand:'Hand') ->bool:
         return not any(x.meld for x in hand.usedRules if x.meld and len(x.meld) > 1)
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return not any(len(x) > 1 and x.rules(hand) and x.exposed.rules(hand) for x in melds)
+
 
 class NoChow(RuleCode):
 
     def appliesToHand(hand:'Hand') ->bool:
         return not any(x.isChow for x in hand.melds)
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return not any(x.isChow for x in melds)
+
 
 class OnlyConcealedMelds(RuleCode):
 
     def appliesToHand(hand:'Hand') ->bool:
         return not any((x.isExposed and not x.isClaimedKong) for x in hand.melds)
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return not any((x.isExposed and not x.isClaimedKong) for x in melds)
+
 
 class FalseColorGame(RuleCode):
 
@@ -284,6 +300,9 @@ class Purity(RuleCode):
         return (len(hand.suits) == 1 and hand.suits < set(Tile.colors)
                 and not any(x.isChow for x in hand.melds))
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return NoChow.mayApplyToMelds(hand, melds, rest)
+
 
 class ConcealedTrueColorGame(RuleCode):
 
@@ -292,6 +311,9 @@ class ConcealedTrueColorGame(RuleCode):
             return False
         return not any((x.isExposed and not x.isClaimedKong) for x in hand.melds)
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return OnlyConcealedMelds.mayApplyToMelds(hand, melds, rest)
+
 
 class OnlyMajors(RuleCode):
 
@@ -312,6 +334,9 @@ class HiddenTreasure(RuleCode):
                 and bool(hand.lastTile) and hand.lastTile.isConcealed
                 and len(hand.melds) == 5)
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return NoChow.mayApplyToMelds(hand, melds, rest) and OnlyConcealedMelds.mayApplyToMelds(hand, melds, rest)
+
 
 class BuriedTreasure(RuleCode):
 
@@ -320,6 +345,9 @@ class BuriedTreasure(RuleCode):
                 and sum(x.isPung for x in hand.melds) == 4
                 and all((x.isPung and x.isConcealed) or x.isPair for x in hand.melds))
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return all((x.isPung and x.isConcealed) or x.isPair for x in melds)
+
 
 class AllTerminals(RuleCode):
 
@@ -612,6 +640,9 @@ class WrigglingSnake(MJRule):
             return False
         return len(set(hand.values)) == 13
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return WrigglingSnake.appliesToHand(hand)
+
 
 class CallingHand(RuleCode):
 
@@ -685,6 +716,9 @@ class TripleKnitting(MJRule):
         return (len(triples) == 4 and len(rest) == 2
                 and rest[0].group != rest[1].group and rest[0].value == rest[1].value)
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return sum(x.isDeclared for x in melds) < 2
+
     def winningTileCandidates(cls, hand:'Hand') ->Set[Tile]:
         if hand.declaredMelds:
             return set()
@@ -768,6 +802,9 @@ class Knitting(MJRule):
             return False
         return len(cls.findCouples(hand)[0]) == 7
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return sum(x.isDeclared for x in melds) < 2
+
     def winningTileCandidates(cls, hand:'Hand') ->Set[Tile]:
         if hand.declaredMelds:
             return set()
@@ -858,6 +895,9 @@ class AllPairHonors(MJRule):
             return False
         return {len([x for x in hand.tiles if x == y]) for y in hand.tiles} == {2}
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return sum(x.isDeclared for x in melds) < 2
+
     def winningTileCandidates(cls, hand:'Hand') ->Set[Tile]:
         if not cls.maybeCallingOrWon(hand):
             return set()
@@ -920,18 +960,28 @@ class ThreeGreatScholars(RuleCode):
         return (BigThreeDragons.appliesToHand(hand)
                 and ('nochow' not in cls.options or not any(x.isChow for x in hand.melds)))
 
+    def mayApplyToMelds(cls, hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return (BigThreeDragons.mayApplyToMelds(hand, melds, rest)
+                and ('nochow' not in cls.options or NoChow.mayApplyToMelds(hand, melds, rest)))
+
 
 class BigThreeDragons(RuleCode):
 
     def appliesToHand(hand:'Hand') ->bool:
         return len([x for x in hand.melds if x.isDragonMeld and x.isPungKong]) == 3
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return len([x for x in melds if x.isDragonMeld and x.isPungKong]) + sum(x.isDragon for x in rest) // 3 >= 3
+
 
 class BigFourJoys(RuleCode):
 
     def appliesToHand(hand:'Hand') ->bool:
         return len([x for x in hand.melds if x.isWindMeld and x.isPungKong]) == 4
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return len([x for x in melds if x.isWindMeld and x.isPungKong]) + sum(x.isWind for x in rest) // 3 >= 4
+
 
 class LittleFourJoys(RuleCode):
 
@@ -939,18 +989,31 @@ class LittleFourJoys(RuleCode):
         lengths = sorted(min(len(x), 3) for x in hand.melds if x.isWindMeld)
         return lengths == [2, 3, 3, 3]
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        lengths = [min(len(x), 3) for x in melds if x.isWindMeld]
+        return (1 not in lengths and lengths.count(2) <= 1 and lengths.count(3) <= 3
+                and sum(lengths) + sum(x.isWind for x in rest) >= 11)
+
 
 class LittleThreeDragons(RuleCode):
 
     def appliesToHand(hand:'Hand') ->bool:
         return sorted(min(len(x), 3) for x in hand.melds if x.isDragonMeld) == [2, 3, 3]
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        lengths = [min(len(x), 3) for x in melds if x.isDragonMeld]
+        return (1 not in lengths and lengths.count(2) <= 1 and lengths.count(3) <= 2
+                and sum(lengths) + sum(x.isDragon for x in rest) >= 8)
+
 
 class FourBlessingsHoveringOverTheDoor(RuleCode):
 
     def appliesToHand(hand:'Hand') ->bool:
         return len([x for x in hand.melds if x.isPungKong and x.isWindMeld]) == 4
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return BigFourJoys.mayApplyToMelds(hand, melds, rest)
+
 
 class AllGreen(RuleCode):
 
@@ -1098,6 +1161,10 @@ class GatesOfHeaven(StandardMahJongg):
         surplus = values_list[0]
         return 1 < surplus < 9
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        """the declared melds of hand are also declared in its arrangements"""
+        return GatesOfHeaven.appliesToHand(hand)
+
     def winningTileCandidates(hand:'Hand') ->Set[Tile]:
         if hand.declaredMelds:
             return set()
@@ -1159,6 +1226,9 @@ class NineGates(GatesOfHeaven):
         surplus = values_list[0]
         return bool(hand.lastTile) and surplus == hand.lastTile.value
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return NineGates.appliesToHand(hand)
+
     def winningTileCandidates(hand:'Hand') ->Set[Tile]:
         if hand.declaredMelds:
             return set()
@@ -1308,6 +1378,10 @@ class ThreeConcealedPongs(RuleCode):
         return len([x for x in hand.melds if (
             x.isConcealed or x.isClaimedKong) and x.isPungKong]) >= 3
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return len([x for x in melds if (
+            x.isConcealed or x.isClaimedKong) and x.isPungKong]) + len(rest) // 3 >= 3
+
 
 class MahJonggWithOriginalCall(RuleCode):
 
@@ -1315,6 +1389,9 @@ class MahJonggWithOriginalCall(RuleCode):
         return ('a' in hand.announcements
                 and sum(x.isExposed for x in hand.melds) < 3)
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return 'a' in hand.announcements and sum(x.isExposed for x in melds) < 3
+
     def selectable(hand:'Hand') ->bool:
         """for scoring game"""
         # one tile may be claimed before declaring OC and one for going MJ
@@ -1358,6 +1435,9 @@ class BlessingOfHeaven(RuleCode):
         assert hand.lastTile is Tile.none, f'{hand}: Blessing of Heaven: There can be no last tile'
         return True
 
+    def mayApplyToMelds(hand:'Hand', melds:MeldList, rest:TileList) ->bool:
+        return not any(x.isExposed for x in melds)
+
     def selectable(hand:'Hand') ->bool:
         """for scoring game"""
         return (hand.ownWind is East
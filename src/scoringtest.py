@@ -12,6 +12,7 @@ import unittest
 from typing import Optional, List, Tuple, Union, TYPE_CHECKING
 
 from common import Debug
+from metrics import Metrics
 from wind import Wind, East, South, West, North
 from player import Players
 from game import PlayingGame
@@ -183,6 +184,48 @@ class Base(unittest.TestCase):
 
 
 
+class ArrangementPruning(Base):
+
+    """arrangements which cannot beat the best one found are skipped.
+    This must not change the result"""
+
+    hands = ('RC1C1C1C2C3C4C5C6C7C8C9C9C9C5 LC5', 'RC1C9B9B1S1S9S9WeDgWnWwDbDr LDb',
+             'RB1B1B1B2B2B2B3B3B3S1S1 c3c4c5 Lc3c3c4c5', 'b1b1b1b1 RB2B3B4B5B6B7B8B8B2B2B2 fe fs fn fw LB3B2B3B4',
+             'wewewe wswsws wnwnwnWn RWwWwWwC3C3 LC3',
+             # the first arrangement found is not the best one
+             'RB1B1B1B1B2B3B4B5B6B8B8B2B2 fe fs fn fw LB4',
+             # the last tile is discarded and exposes a meld
+             'RB1B1B1B2B2B2B3B3B3B4B4B4S5S5 md LB2', 'RDrDrDrDgDgDgDbDbC1C2C3S5S5S5 md LDb')
+
+    def tearDown(self) ->None:
+        Hand.pruning = True
+
+    @staticmethod
+    def arranged(pruning:bool) ->Tuple[int, int, List[Tuple[str, str, str]]]:
+        """the number of pruned arrangements, of computed Hands and the hands for all rulesets"""
+        Hand.pruning = pruning
+        before = Metrics.counters.get('prunedArrangements', 0)
+        computed = Metrics.counters.get('handsComputed', 0)
+        result = []
+        for game in GAMES:
+            game.winner = game.myself = game.players[East]
+            for string in ArrangementPruning.hands:
+                game.winner.clearCache()
+                hand = Hand(game.winner, string)
+                result.append((str(hand), str(hand.score), hand.mjRule.name if hand.mjRule else ''))
+        return (Metrics.counters.get('prunedArrangements', 0) - before,
+                Metrics.counters.get('handsComputed', 0) - computed, result)
+
+    def testMe(self) ->None:
+        """same hands with and without pruning, but fewer Hand objects"""
+        pruned, computed, hands = self.arranged(pruning=True)
+        notPruned, computedNotPruned, handsNotPruned = self.arranged(pruning=False)
+        self.assertGreater(pruned, 0)
+        self.assertEqual(notPruned, 0)
+        self.assertLess(computed, computedNotPruned)
+        self.assertEqual(hands, handsNotPruned)
+
+
 class Partials(Base):
 
     """some partial hands"""
@@ -16,7 +16,7 @@ O'Reilly Media, Inc., ISBN 0-596-10032-9
 import sys
 import os
 import logging
-import datetime
+import time
 import argparse
 from typing import TYPE_CHECKING, Tuple, Any, Optional, Sequence, List, Mapping, Dict, Union, cast, Type
 
@@ -27,12 +27,15 @@ def cleanExit(*unusedArgs: Any) ->None:
     """we want to cleanly close sqlite3 files"""
     if Debug.quit:
         logDebug('cleanExit')
-    if Options.socket and sys.platform != 'win32':
-        try:
-            os.remove(Options.socket)
-        except FileNotFoundError:
-            pass
+    if sys.platform != 'win32':
+        for path in (Options.socket, Options.metrics):
+            if path and not path.isdigit():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
     try:
+        RobotPool.shutdown()
         if Internal.db:
             Internal.db.close()
                               # setting to None does not call close(), do we
@@ -64,6 +67,7 @@ from twisted.internet import reactor as reactor_module
 from twisted.internet.error import ReactorNotRunning
 if TYPE_CHECKING:
     from twisted.python.failure import Failure
+    from twisted.internet.base import DelayedCall
 
 reactor = cast(IReactorCore, reactor_module)
 reactor.addSystemEventTrigger('before', 'shutdown', cleanExit)  # type:ignore[arg-type]
@@ -73,12 +77,13 @@ from player import Players
 from query import Query, initDb
 from log import logDebug, logWarning, logError, logInfo, logException, SERVERMARK, logFailure
 from mi18n import i18n, i18nE
-from util import elapsedSince
 from message import Message, ChatMessage
 from deferredutil import DeferredBlock
+from robotpool import RobotPool
+from metrics import Metrics, startMetrics
 from rule import Ruleset
 from servercommon import srvError, srvMessage
-from user import User
+from user import User, IdleUsers
 from servertable import ServerTable, ServerGame
 
 
@@ -131,8 +136,11 @@ class MJServer:
         self.tables:Dict[int, ServerTable] = {}
         self.srvUsers:List[User] = []
         Players.load()
-        self.lastPing = datetime.datetime.now()
+        self.lastPing = time.monotonic()
+        self.idleUsers = IdleUsers(60)
+        self.pingCheck:Optional['DelayedCall'] = None
         self.checkPings()
+        startMetrics(self)
 
     def chat(self, chatString:str) ->None:
         """a client sent us a chat message"""
@@ -146,10 +154,14 @@ class MJServer:
         """accept a new user"""
         if user not in self.srvUsers:
             self.srvUsers.append(user)
+            self.idleUsers.add(user)
             self.loadSuspendedTables(user)
 
     def callRemote(self, user:User, *args: Any, **kwargs:Mapping[Any, Any]) ->Deferred:
         """if we still have a connection, call remote, otherwise clean up"""
+        if user.pendingMoves:
+            # they must arrive first
+            self.flushMoves(user)
         if user.mind:
             try:
                 args2, kwargs2 = Message.jellyAll(args, kwargs)
@@ -159,6 +171,54 @@ class MJServer:
                 self.logout(user)
         return succeed([])
 
+    def queueMove(self, user:User, *args: Any, **kwargs:Any) ->Deferred:
+        """like callRemote('move', ...) but for notifications: they are collected
+        until control returns to the reactor or until something else is sent
+        to user. Then they go out as one remote call"""
+        if not user.pendingMoves:
+            reactor.callLater(0, self.flushMoves, user)  # type:ignore[attr-defined]
+        result:Deferred = Deferred()
+        user.pendingMoves.append((result, args, kwargs))
+        return result
+
+    def flushMoves(self, user:User) ->None:
+        """send all queued notifications for user"""
+        pending = user.pendingMoves
+        if not pending:
+            return
+        user.pendingMoves = []
+        if len(pending) == 1:
+            result, args, kwargs = pending[0]
+            self.callRemote(user, 'move', *args, **kwargs).chainDeferred(result)
+            return
+
+        def answered(answers:Optional[List[Any]]) ->None:
+            """distribute the answers. If the connection is lost, there are none.
+            Since protocol 5, every answer tells if its move failed"""
+            if not isinstance(answers, list):
+                answers = []
+            for idx, (result, _, _) in enumerate(pending):
+                if idx >= len(answers):
+                    result.callback(None)
+                elif user.protocol < 5:
+                    result.callback(answers[idx])
+                else:
+                    success, answer = answers[idx]
+                    if success:
+                        result.callback(answer)
+                    else:
+                        result.errback(pb.Error(answer))
+
+        def failed(failure:'Failure') ->None:
+            """the call itself failed, so all of them failed"""
+            for result, _, _ in pending:
+                result.errback(failure)
+
+        if Debug.traffic:
+            logDebug(f'-> {user.name}: {len(pending)} moves in one call')
+        batch = [Message.jellyAll(args, kwargs) for _, args, kwargs in pending]
+        self.callRemote(user, 'moves', batch).addCallbacks(answered, failed)
+
     @staticmethod
     def __stopAfterLastDisconnect() ->None:
         """as the name says"""
@@ -171,21 +231,31 @@ class MJServer:
                 pass
 
     def checkPings(self) ->None:
-        """are all clients still alive? If not log them out"""
-        since = elapsedSince(self.lastPing)
+        """are all clients still alive? If not log them out.
+        Only users whose deadline passed are looked at, and we
+        sleep until the next deadline"""
+        now = time.monotonic()
+        since = now - self.lastPing
         if self.srvUsers and since > 30:
             if Debug.quit:
-                logDebug(f'no ping since {elapsedSince(self.lastPing)} seconds but we still have users:{self.srvUsers}')
+                logDebug(f'no ping since {since:.0f} seconds but we still have users:{self.srvUsers}')
         if not self.srvUsers and since > 30:
             # no user at all since 30 seconds, but we did already have a user
             self.__stopAfterLastDisconnect()
-        for user in self.srvUsers:
-            if elapsedSince(user.lastPing) > 60:
-                logInfo(
-                    f'No messages from {user.name} since 60 seconds, clearing connection now')
-                user.mind = None
-                self.logout(user)
-        reactor.callLater(10, self.checkPings)
+        if Options.shard is not None:
+            # the front process checks its users
+            return
+        for user in self.idleUsers.expired(now):
+            logInfo(
+                f'No messages from {user.name} since 60 seconds, clearing connection now')
+            user.mind = None
+            self.logout(user)
+        delay = 10.0
+        nextDeadline = self.idleUsers.nextDeadline()
+        if self.srvUsers and nextDeadline is not None:
+            # nobody can expire earlier
+            delay = max(nextDeadline - now, 0.1)
+        self.pingCheck = reactor.callLater(delay, self.checkPings)
 
     @staticmethod
     def ignoreLostConnection(failure: 'Failure') ->None:
@@ -202,6 +272,11 @@ class MJServer:
             tables = [
                 x for x in self.tables.values()
                 if not x.running and (not x.suspendedAt or x.hasName(user.name))]
+            if user.protocol >= 2:
+                user.knownTables.clear()
+                return self.sendTableDelta(user, tables, snapshot=True)
+        if user.protocol >= 2:
+            return self.sendTableDelta(user, tables)
         if tables:
             data = [x.asSimpleList() for x in tables]
             if Debug.table:
@@ -210,6 +285,58 @@ class MJServer:
             return self.callRemote(user, 'newTables', data)
         return succeed([])
 
+    def sendTableDelta(self, user:User, tables:List[ServerTable], snapshot:bool=False) ->Deferred:
+        """tell user what changed in tables since he last heard of them:
+        new tables as a full list, changed tables only with the changed fields,
+        and the ids of tables he does not see anymore. Every delta has the next
+        version number, so the client notices if it missed one. A snapshot
+        replaces everything the client got from this process before"""
+        added = []
+        changed = []
+        removed = []
+        for table in tables:
+            known = user.knownTables.get(table.tableid)
+            if table.tableid in self.tables and table.visibleFor(user):
+                data = table.asSimpleList()
+                if known is None:
+                    added.append(data)
+                else:
+                    fields = {idx: value for idx, value in enumerate(data) if value != known[idx]}
+                    if fields:
+                        changed.append((table.tableid, fields))
+                user.knownTables[table.tableid] = data
+            elif known is not None:
+                del user.knownTables[table.tableid]
+                removed.append(table.tableid)
+        if not (added or changed or removed or snapshot):
+            return succeed([])
+        user.tableVersion += 1
+        if Debug.table:
+            logDebug(f'table delta {user.tableVersion} for {user.name}: '
+                     f'added={added} changed={changed} removed={removed} snapshot={snapshot}')
+        return self.callRemote(user, 'tableDelta', Options.shard, user.tableVersion,
+                               added, changed, removed, snapshot)
+
+    def needTables(self, user:User, unusedShard:Optional[int]) ->Deferred:
+        """the client missed a delta and wants a snapshot"""
+        return self.sendTables(user)
+
+    def tableChanged(self, table:ServerTable, where:str) ->DeferredBlock:
+        """tell all users about a changed table. Old clients get the
+        full table, the others a delta"""
+        block = DeferredBlock(table, where=where)
+        oldClients = [x for x in self.srvUsers if x.protocol < 2]
+        if oldClients:
+            block.tell(
+                None,
+                oldClients,
+                Message.TableChanged,
+                source=table.asSimpleList())
+        for user in self.srvUsers:
+            if user.protocol >= 2:
+                self.sendTableDelta(user, [table])
+        return block
+
     def _lookupTable(self, tableid: int) ->ServerTable:
         """return table by id or raise exception"""
         if tableid not in self.tables:
@@ -220,15 +347,20 @@ class MJServer:
         return self.tables[tableid]
 
     def generateTableId(self) ->int:
-        """generates a new table id: the first free one"""
+        """generates a new table id: the first free one. A worker
+        process only uses ids belonging to it"""
         usedIds = set(self.tables or [0])
-        availableIds = set(x for x in range(1, 2 + max(usedIds)))
+        if Options.shard is not None:
+            first = Options.shard or Options.workers
+            availableIds = set(range(first, first + Options.workers * (1 + len(usedIds)), Options.workers))
+        else:
+            availableIds = set(x for x in range(1, 2 + max(usedIds)))
         return min(availableIds - usedIds)
 
     def newTable(self, user:User, ruleset:str, playOpen:bool,
                  autoPlay:bool, wantedGame:str, tableId:Optional[int]=None) ->Optional[Deferred]:
         """user creates new table and joins it"""
-        def gotRuleset(ruleset:str) ->None:
+        def gotRuleset(ruleset:bytes) ->None:
             """now we have the full ruleset definition from the client"""
             Ruleset.cached(
                 ruleset).save()  # make it known to the cache and save in db
@@ -270,24 +402,16 @@ class MJServer:
         assert result
         return result
 
-    def needRulesets(self, rulesetHashes: List[str]) -> List[List[List[Union[int, str, float]]]]:
-        """the client wants those full rulesets"""
-        result = []
-        for table in self.tables.values():
-            if table.ruleset.hash in rulesetHashes:
-                result.append(table.ruleset.toList())
-        return result
+    def needRulesets(self, rulesetHashes: List[str]) -> List[bytes]:
+        """the client wants those full rulesets, see Ruleset.toWire"""
+        rulesets = {x.ruleset.hash: x.ruleset for x in self.tables.values() if x.ruleset.hash in rulesetHashes}
+        return [x.toWire() for x in rulesets.values()]
 
     def joinTable(self, user: User, tableid: int) ->bool:
         """user joins table"""
         table = self._lookupTable(tableid)
         table.addUser(user)
-        block = DeferredBlock(table, where='joinTable')
-        block.tell(
-            None,
-            self.srvUsers,
-            Message.TableChanged,
-            source=table.asSimpleList())
+        block = self.tableChanged(table, 'joinTable')
         if len(table.users) == table.maxSeats():
             if Debug.table:
                 logDebug(f'Table {table}: All seats taken, starting')
@@ -317,13 +441,7 @@ class MJServer:
                 else:
                     table.delUser(user)
                     if self.srvUsers:
-                        block = DeferredBlock(table, where='leaveTable')
-                        block.tell(
-                            None,
-                            self.srvUsers,
-                            Message.TableChanged,
-                            source=table.asSimpleList())
-                        block.callback(False)
+                        self.tableChanged(table, 'leaveTable').callback(False)
         return True
 
     def startGame(self, user: User, tableid: int) ->None:
@@ -339,6 +457,7 @@ class MJServer:
                 f"{f'{int(table.game.seed)}:' if table.game else ''}{i18n(message, *args)} ", withGamePrefix=False)
         if table.tableid in self.tables:
             del self.tables[table.tableid]
+            Metrics.forgetTable(table.tableid)
             if reason == 'silent':
                 tellUsers = []
             else:
@@ -346,6 +465,9 @@ class MJServer:
             for user in tellUsers:
                 # this may in turn call removeTable again!
                 self.callRemote(user, reason, table.tableid, message, *args)
+            for user in self.srvUsers:
+                if user.protocol >= 2:
+                    self.sendTableDelta(user, [table])
             for user in table.users:
                 table.delUser(user)
             if Debug.table:
@@ -359,6 +481,10 @@ class MJServer:
         if user not in self.srvUsers:
             return
         self.srvUsers.remove(user)
+        self.idleUsers.remove(user)
+        if not self.srvUsers and self.pingCheck and self.pingCheck.active():
+            # do not wait for the deadline of the last user
+            self.pingCheck.reset(10)
         for tableid in self.tablesWith(user):
             self.leaveTable(
                 user,
@@ -400,6 +526,9 @@ class MJServer:
                       " and s.scoretime = (select max(scoretime) from score where game=g.id) limit 10",
                       (user.name, user.name, user.name, user.name))
         for gameid, _, seed, ruleset, suspendTime in query.records:
+            if Options.shard is not None and gameid % Options.workers != Options.shard:
+                # another worker process will load it
+                continue
             if gameid not in (x.game.gameid for x in self.tables.values() if x.game):
                 table = ServerTable(
                     self, None, ruleset, suspendTime, playOpen=False,
@@ -445,10 +574,36 @@ def parseArgs() -> argparse.Namespace:
     parser.add_argument(
         '--continue', dest='continueServer', action='store_true',
         help=i18n('do not terminate local game server after last client disconnects'), default=False)
+    parser.add_argument(
+        '--anytime', dest='anytime', type=int, metavar='PERCENT',
+        help=i18n('robot players answer within PERCENT of the claim timeout'), default=0)
+    parser.add_argument(
+        '--workers', dest='workers', type=int, metavar='COUNT',
+        help=i18n('distribute the tables over COUNT worker processes'), default=0)
+    parser.add_argument(
+        '--aiprocesses', dest='aiProcesses', type=int, metavar='COUNT',
+        help=i18n('compute the answers of robot players in COUNT processes'), default=0)
+    parser.add_argument(
+        '--metrics', dest='metrics', metavar='SOCKET',
+        help=i18n('answer requests for server metrics on SOCKET, or on a local port if SOCKET is a number'),
+        default=None)
+    parser.add_argument(
+        '--metricslog', dest='metricsLog', type=int, metavar='SECONDS',
+        help=i18n('log server metrics every SECONDS'), default=0)
+    parser.add_argument(
+        '--shard', dest='shard', type=int, help=argparse.SUPPRESS, default=None)
     parser.add_argument('--debug', dest='debug',
                       help=Debug.help())
     args = parser.parse_args(sys.argv[1:])
     Options.continueServer |= args.continueServer
+    Options.anytime = args.anytime
+    Options.workers = args.workers
+    Options.shard = args.shard
+    Options.aiProcesses = args.aiProcesses
+    if args.metrics:
+        Options.metrics = os.path.expanduser(args.metrics)
+    Options.metricsLog = args.metricsLog
+    Options.port = args.port
     if args.dbpath:
         Options.dbPath = os.path.expanduser(args.dbpath)
     if args.socket:
@@ -464,11 +619,35 @@ def kajonggServer() ->None:
     options = parseArgs()
     if not initDb():
         sys.exit(1)
-    realm = MJRealm()
-    realm.server = MJServer()
-    kajonggPortal = portal.Portal(realm, [DBPasswordChecker()])  # type: ignore[arg-type,list-item]
     import predefined
     predefined.load()
+    if Options.shard is not None:
+        import shard
+        if shard.listenForFront(MJServer()):
+            reactor.run()  # type:ignore[misc]
+        return
+    realm = MJRealm()
+    kajonggPortal = portal.Portal(realm, [DBPasswordChecker()])  # type: ignore[arg-type,list-item]
+    if Options.workers:
+        import shard
+        realm.server = front = shard.FrontServer()
+
+        def workersStarted(unused:Any) ->None:
+            """only now we accept clients"""
+            if not listen(options, kajonggPortal):
+                reactor.stop()  # type:ignore[misc]
+        front.startWorkers().addCallback(workersStarted).addErrback(logFailure)
+        reactor.run()  # type:ignore[misc]
+        return
+    realm.server = MJServer()
+    if listen(options, kajonggPortal):
+        reactor.run()  # type:ignore[misc]
+    else:
+        sys.exit(1)
+
+
+def listen(options:argparse.Namespace, kajonggPortal:portal.Portal) ->bool:
+    """listen for clients"""
     try:
         if Options.socket:
             # we do not want tracebacks to go from server to client,
@@ -490,9 +669,8 @@ def kajonggServer() ->None:
             reactor.listenTCP(options.port, pb.PBServerFactory(kajonggPortal))
     except error.CannotListenError as errObj:
         logWarning(errObj)
-        sys.exit(1)
-    else:
-        reactor.run()  # type:ignore[misc]
+        return False
+    return True
 
 
 def profileMe() ->None:
@@ -19,7 +19,7 @@ import sqlite3
 
 from typing import TYPE_CHECKING, Any, Optional, List, Callable, Tuple, Dict, cast, Union
 
-from common import Debug, Internal, ReprMixin
+from common import Debug, Internal, Options, ReprMixin
 from wind import Wind
 from tilesource import TileSource
 from util import Duration
@@ -30,6 +30,7 @@ from query import Query
 from client import Client, Table
 from wall import WallEmpty
 from sound import Voice
+from voicestore import VoiceStore
 from servercommon import srvError
 from user import User
 from game import PlayingGame
@@ -96,6 +97,95 @@ class ServerGame(PlayingGame):
                              f'to show discard of tile {tileName} but does not have it, he has {player.concealedTiles}')
         return tileName
 
+class ClaimArbitration:
+
+    """collects the answers of one DeferredBlock as they arrive and
+    decides which of them the server executes: only claims with the
+    highest priority survive, and if several players say Mah Jongg,
+    the one following the active player in seat order wins.
+    Answers like Discard are not claims, they are always kept.
+
+    Once decided, later answers are ignored."""
+
+    claims = (Message.MahJongg, Message.Kong, Message.Pung, Message.Chow)
+    nothing = (Message.NoClaim, Message.OK, None)
+
+    def __init__(self, game:Optional[ServerGame]) ->None:
+        self.game = game
+        self.others:List['Request'] = []
+        self.best:List['Request'] = []
+        self.bestRank = len(self.claims)
+        self.bestDistance = 4
+        self.closed = False
+        self.__mayClaim:Dict[Tuple[int, Message], bool] = {}
+
+    def distance(self, player:Optional['PlayingPlayer']) ->int:
+        """seat distance after the active player: 0 for the next player,
+        3 for the active player himself"""
+        assert self.game and player
+        players = self.game.players
+        return (players.index(player) - players.index(self.game.activePlayer) - 1) % 4
+
+    def add(self, request:'Request') ->None:
+        """one more answer"""
+        answer = request.answer
+        if self.closed or answer in self.nothing:
+            return
+        if answer not in self.claims:
+            self.others.append(request)
+            return
+        rank = self.claims.index(answer)
+        if rank > self.bestRank:
+            return
+        if rank < self.bestRank:
+            self.bestRank = rank
+            self.best = []
+            self.bestDistance = 4
+        if answer == Message.MahJongg and self.game:
+            distance = self.distance(request.player)
+            if distance > self.bestDistance:
+                return
+            if distance < self.bestDistance:
+                self.bestDistance = distance
+                self.best = []
+        self.best.append(request)
+
+    def mayClaim(self, request:'Request', claim:Message) ->bool:
+        """could the player of request legally claim the discard? We only know
+        that for robots, a human might say anything"""
+        if not isinstance(request.user, Client):
+            return True
+        player = request.player
+        assert player
+        key = (id(player), claim)
+        if key not in self.__mayClaim:
+            self.__mayClaim[key] = player.mayClaim(claim)
+        return self.__mayClaim[key]
+
+    def mayBeat(self, request:'Request') ->bool:
+        """could the outstanding request still beat the best claim?
+        The cheap checks come first, Mah Jongg last"""
+        for rank in reversed(range(self.bestRank + 1)):
+            if rank == len(self.claims):
+                continue
+            if rank == self.bestRank and (rank != 0 or self.distance(request.player) > self.bestDistance):
+                continue
+            if self.mayClaim(request, self.claims[rank]):
+                return True
+        return False
+
+    def decided(self, outstanding:List['Request']) ->bool:
+        """True if no outstanding answer could change the result"""
+        if not self.closed and self.game:
+            self.closed = not any(self.mayBeat(x) for x in outstanding)
+        return self.closed
+
+    def result(self, requests:List['Request']) ->List['Request']:
+        """the answers to be executed, in the order of requests"""
+        kept = {id(x) for x in self.others + self.best}
+        return [x for x in requests if id(x) in kept]
+
+
 class ServerTable(Table, ReprMixin):
 
     """a table on the game server"""
@@ -130,6 +220,12 @@ class ServerTable(Table, ReprMixin):
         assert self.game
         return bool(self.game) and any(x.name == name for x in self.game.players)
 
+    def visibleFor(self, user:'User') ->bool:
+        """does user see this table in his table list?"""
+        if user in self.users:
+            return True
+        return not self.running and (not self.suspendedAt or self.hasName(user.name))
+
     def asSimpleList(self, withFullRuleset:bool=False) ->List[Any]:
         """return the table attributes to be sent to the client"""
         game = self.game
@@ -401,11 +497,14 @@ class ServerTable(Table, ReprMixin):
                 logDebug(
                     f"make running table {self} invisible for {','.join(str(x) for x in foreigners)}")
             for srvUser in foreigners:
-                self.server.callRemote(
-                    srvUser,
-                    'tableRemoved',
-                    self.tableid,
-                    '')
+                if srvUser.protocol >= 2:
+                    self.server.sendTableDelta(srvUser, [self])
+                else:
+                    self.server.callRemote(
+                        srvUser,
+                        'tableRemoved',
+                        self.tableid,
+                        '')
 
     def sendVoiceIds(self) ->None:
         """tell each player what voice ids the others have. By now the client has a Game instance!"""
@@ -436,6 +535,9 @@ class ServerTable(Table, ReprMixin):
         if not self.running:
             return
         assert self.game
+        if all(x.protocol >= 4 for x in self.remotes.values() if isinstance(x, User)):
+            self.__sendVoicesInBackground(requests)
+            return
         block = DeferredBlock(self, where='collectVoiceData')
         voiceDataRequests = []
         for request in requests:
@@ -459,6 +561,22 @@ class ServerTable(Table, ReprMixin):
                         Message.ServerWantsVoiceData)
         block.callback(self.sendVoiceData, voiceDataRequests)
 
+    def __sendVoicesInBackground(self, requests:List['Request']) ->None:
+        """the server sends the wanted voices while the game goes on"""
+        assert self.game
+        for request in requests:
+            if request.answer == Message.ClientWantsVoiceData:
+                assert request.args
+                voiceId = request.args[0]
+                for player in self.game.players:
+                    owner = self.remotes[player]
+                    if isinstance(owner, User) and owner.voiceId == voiceId:
+                        if Debug.sound:
+                            logDebug(f'client {request.user.name} wants voice data {voiceId} for {player}')
+                        VoiceStore.send(self.server, owner, request.user, player.name, voiceId)
+                        break
+        self.assignVoices()
+
     def sendVoiceData(self, requests:List['Request'], voiceDataRequests:List[Tuple[User, 'PlayingPlayer']]) ->None:
         """sends voice sounds to other human players"""
         self.processAnswers(requests)
@@ -703,6 +821,8 @@ class ServerTable(Table, ReprMixin):
             if Debug.process and sys.platform != 'win32':
                 logDebug(
                     f'MEM:{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}')  # pylint:disable=possibly-used-before-assignment
+            if Options.anytime and Debug.robotAI:
+                logDebug(Client.anytimeStatistics())
             return
         self.game.sortPlayers()
         self.tellAll(None, Message.ReadyForHandStart, self.startHand,
@@ -861,44 +981,24 @@ class ServerTable(Table, ReprMixin):
 
     def prioritize(self, requests: List['Request']) ->List['Request']:
         """return only requests we want to execute"""
-        if not self.running:
+        if not self.running or not requests:
             return []
-        answers = [
-            x for x in requests if x.answer not in [
-                Message.NoClaim,
-                Message.OK,
-                None]]
-        if len(answers) > 1:
-            claims = [
-                Message.MahJongg,
-                Message.Kong,
-                Message.Pung,
-                Message.Chow]
-            for claim in claims:
-                if claim in [x.answer for x in answers]:
-                    # ignore claims with lower priority:
-                    answers = [
-                        x for x in answers if x.answer == claim or x.answer not in claims]
-                    break
-        mjAnswers = [x for x in answers if x.answer == Message.MahJongg]
-        if len(mjAnswers) > 1:
-            assert self.game
-            mjPlayers = [x.player for x in mjAnswers]
-            nextPlayer = self.game.nextPlayer()
-            while nextPlayer not in mjPlayers:
-                nextPlayer = self.game.nextPlayer(nextPlayer)
-            answers = [
-                x for x in answers if x.player == nextPlayer or x.answer != Message.MahJongg]
-        return answers
+        arbitration = requests[0].block.arbitration
+        if arbitration is None:
+            arbitration = ClaimArbitration(self.game)
+            for request in requests:
+                arbitration.add(request)
+        return arbitration.result(requests)
 
     def _askForClaims(self, unusedRequests:List['Request'], unusedMsg:'ServerMessage') ->None:
         """ask all players if they want to claim"""
         if self.running:
             assert self.game
-            self.tellOthers(
-                self.game.activePlayer,
-                Message.AskForClaims,
-                self.moved)
+            block = DeferredBlock(self, where='askForClaims')
+            block.arbitration = ClaimArbitration(self.game)
+            block.metric = 'claimRoundTrip'
+            block.tellOthers(self.game.activePlayer, Message.AskForClaims)
+            block.callback(self.moved)
 
     def processAnswers(self, requests: List['Request']) ->List['Request']:
         """a player did something"""
@@ -908,10 +1008,9 @@ class ServerTable(Table, ReprMixin):
         if not answers:
             return []
         for answer in answers:
-            msg = f'<-  {answer}'
             if Debug.traffic:
-                logDebug(msg)
-            with Duration(msg):
+                logDebug(f'<-  {answer}')
+            with Duration(answer):
                 assert answer.answer
                 cast(ServerMessage, answer.answer).serverAction(self, answer)
         return answers
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+The sharded game server: with --workers, the front process accepts the
+logins and routes every table to one of several worker processes. The
+table id decides which worker owns a table: worker K only uses ids with
+id % workers == K. The workers own the tables with their games and
+robot players, so a busy table does not stall tables in other workers.
+
+Every user logged into the front is also logged into every worker,
+as a ShardUser. Everything a worker wants to send to a client goes
+through the front, which keeps the real connection.
+
+A worker trusts its front: it believes who the users are. So a worker
+only talks to the process knowing the secret the front passed to it
+when starting it, see ShardGate. The UNIX sockets of the workers are
+only accessible for the user running the server.
+"""
+
+import os
+import sys
+import hmac
+import secrets
+import subprocess
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Tuple, Union
+
+from twisted.spread import pb
+from twisted.internet import error
+from twisted.internet.defer import Deferred, DeferredList, succeed
+
+from common import Options, Internal, Debug, socketName
+from log import logDebug, logWarning, logFailure
+from message import ChatMessage
+from server import MJServer
+from user import User
+
+if TYPE_CHECKING:
+    from twisted.python.failure import Failure
+
+
+SECRET = 'KAJONGG_SHARD_SECRET'  # the environment variable passing the secret to a worker
+
+
+def workerAddress(shard:int) ->Union[str, int]:
+    """the UNIX socket or the local TCP port where worker shard listens"""
+    if sys.platform == 'win32':
+        return int(Options.port or Internal.defaultPort) + 1 + shard
+    return f'{socketName()}.shard{shard}'
+
+
+class FrontMind:
+
+    """stands in for the RemoteReference to the client within a worker:
+    all calls are relayed by the front"""
+
+    def __init__(self, front:pb.RemoteReference, name:str) ->None:
+        self.front = front
+        self.name = name
+
+    def callRemote(self, method:str, *args:Any, **kwargs:Any) ->Deferred:
+        """relay to the client"""
+        if method == 'serverDisconnects':
+            # the front tells the client itself, exactly once
+            return succeed(None)
+        return self.front.callRemote('relay', self.name, method, args, kwargs)
+
+
+class ShardUser(User):
+
+    """a user logged into the front, as seen by a worker"""
+
+    def __init__(self, userid:str, front:pb.RemoteReference) ->None:
+        super().__init__(userid)
+        self.mind = FrontMind(front, self.name)  # type:ignore[assignment]
+
+    def source(self) ->str:
+        """how did he connect?"""
+        return 'front'
+
+
+class ShardGate(pb.Root):
+
+    """what a worker process offers to everybody: only the front
+    knows the secret, and only the front gets the ShardWorker"""
+
+    def __init__(self, worker:'ShardWorker', secret:str) ->None:
+        self.worker = worker
+        self.secret = secret
+
+    def remote_attach(self, secret:str, front:pb.RemoteReference) ->'ShardWorker':
+        """the front connected to us"""
+        if self.worker.front is not None or not hmac.compare_digest(str(secret), self.secret):
+            logWarning(f'worker {Options.shard} refuses a connection which is not from its front')
+            raise pb.Error('this worker only talks to its front')
+        self.worker.attach(front)
+        return self.worker
+
+
+class ShardWorker(pb.Referenceable):
+
+    """a worker process: the front calls us"""
+
+    userCalls = ('newTable', 'joinTable', 'leaveTable', 'startGame', 'needTables')
+
+    def __init__(self, server:MJServer) ->None:
+        self.server = server
+        self.users:Dict[str, ShardUser] = {}
+        self.front:Optional[pb.RemoteReference] = None
+
+    def attach(self, front:pb.RemoteReference) ->None:
+        """the front proved who it is. We live as long as the front"""
+        self.front = front
+        front.notifyOnDisconnect(self.frontLost)
+
+    @staticmethod
+    def frontLost(unused:pb.RemoteReference) ->None:
+        """no front, no work"""
+        if Debug.connections:
+            logDebug(f'worker {Options.shard} lost the front process, terminating')
+        try:
+            Internal.reactor.stop()  # type:ignore[attr-defined]
+        except error.ReactorNotRunning:
+            pass
+
+    def remote_login(self, userid:str, dbIdent:str, voiceId:Optional[str],
+                     maxGameId:int, protocol:int) ->Deferred:
+        """a user logged into the front. Send him our tables"""
+        assert self.front
+        user = ShardUser(userid, self.front)
+        user.server = self.server
+        user.dbIdent = dbIdent
+        user.voiceId = voiceId
+        user.maxGameId = maxGameId
+        user.protocol = protocol
+        self.users[user.name] = user
+        self.server.login(user)
+        return self.server.sendTables(user)
+
+    def remote_logout(self, name:str) ->None:
+        """the user logged out from the front"""
+        user = self.users.pop(name, None)
+        if user:
+            self.server.logout(user)
+
+    def remote_call(self, name:str, method:str, *args:Any) ->Any:
+        """a user wants something from a table owned by us"""
+        if method not in self.userCalls:
+            raise pb.Error(f'worker {Options.shard}: {method} is not for users')
+        user = self.users.get(name)
+        if user is None:
+            raise pb.Error(f'worker {Options.shard}: {name} is not logged in')
+        user.pinged()
+        return getattr(self.server, method)(user, *args)
+
+    def remote_chat(self, chatString:str) ->None:
+        """a chat message for one of our tables"""
+        self.server.chat(chatString)
+
+    def remote_needRulesets(self, rulesetHashes:List[str]) ->List[bytes]:
+        """rulesets used by our tables"""
+        return self.server.needRulesets(rulesetHashes)
+
+
+class FrontRelay(pb.Referenceable):
+
+    """the workers send everything for the clients through us"""
+
+    def __init__(self, server:'FrontServer') ->None:
+        self.server = server
+
+    def remote_relay(self, name:str, method:str, args:Tuple[Any, ...], kwargs:Dict[str, Any]) ->Deferred:
+        """pass a call from a worker to the client"""
+        user = self.server.usersByName.get(name)
+        if user is None:
+            return succeed([])
+        return self.server.callRemote(user, method, *args, **kwargs)
+
+
+class FrontServer(MJServer):
+
+    """accepts the logins and routes every table to its worker.
+    The front itself owns no tables"""
+
+    def __init__(self) ->None:
+        super().__init__()
+        self.workers:List[pb.RemoteReference] = [None] * Options.workers  # type:ignore[list-item]
+        self.processes:List[subprocess.Popen] = []
+        self.nextWorker = 0
+        self.usersByName:Dict[str, User] = {}
+        self.secret = secrets.token_hex(16)
+
+    def startWorkers(self) ->Deferred:
+        """start the worker processes and connect to all of them"""
+        for shard in range(Options.workers):
+            self.__startWorker(shard)
+        return DeferredList([self.__connect(x) for x in range(Options.workers)], fireOnOneErrback=True)
+
+    def __startWorker(self, shard:int) ->None:
+        """start one worker process"""
+        if sys.argv[0].endswith('.py'):
+            args = [sys.executable, os.path.abspath(sys.argv[0])]
+        else:
+            args = [sys.argv[0]]
+        args.extend([f'--workers={Options.workers}', f'--shard={shard}'])
+        address = workerAddress(shard)
+        if isinstance(address, int):
+            args.append(f'--port={address}')
+        else:
+            if os.path.exists(address):
+                os.remove(address)
+            args.append(f'--socket={address}')
+        if Options.dbPath:
+            args.append(f'--db={Options.dbPath}')
+        if Options.anytime:
+            args.append(f'--anytime={Options.anytime}')
+        if Options.aiProcesses:
+            args.append(f'--aiprocesses={Options.aiProcesses}')
+        if Options.metrics:
+            if Options.metrics.isdigit():
+                args.append(f'--metrics={int(Options.metrics) + 1 + shard}')
+            else:
+                args.append(f'--metrics={Options.metrics}.shard{shard}')
+        if Options.metricsLog:
+            args.append(f'--metricslog={Options.metricsLog}')
+        if Debug.argString:
+            args.append(f'--debug={Debug.argString}')
+        self.processes.append(subprocess.Popen(  # pylint:disable=consider-using-with
+            args, env=dict(os.environ, **{SECRET: self.secret})))
+        if Debug.connections:
+            logDebug(f'started worker {shard}: pid={self.processes[-1].pid} {" ".join(args)}')
+
+    def __connect(self, shard:int, attempt:int=0) ->Deferred:
+        """connect to worker shard. It may need some time until it listens"""
+        def gotRoot(root:pb.RemoteReference) ->Deferred:
+            """tell the worker who we are"""
+            return root.callRemote('attach', self.secret, FrontRelay(self)).addCallback(gotWorker)
+
+        def gotWorker(worker:pb.RemoteReference) ->None:
+            """the worker believes us"""
+            self.workers[shard] = worker
+
+        def retry(failure:'Failure') ->Deferred:
+            """the worker does not listen yet"""
+            if attempt > 150:
+                return failure  # type:ignore[return-value]
+            result:Deferred = Deferred()
+            Internal.reactor.callLater(  # type:ignore[attr-defined]
+                0.2, lambda: self.__connect(shard, attempt + 1).chainDeferred(result))
+            return result
+
+        factory = pb.PBClientFactory()
+        address = workerAddress(shard)
+        if isinstance(address, int):
+            Internal.reactor.connectTCP('127.0.0.1', address, factory)  # type:ignore[attr-defined]
+        else:
+            Internal.reactor.connectUNIX(address, factory)  # type:ignore[attr-defined]
+        return factory.getRootObject().addCallbacks(gotRoot, retry)
+
+    def workerFor(self, tableid:Optional[int]) ->pb.RemoteReference:
+        """the worker owning tableid. A new table without wanted id
+        goes to the next worker"""
+        if tableid is None:
+            self.nextWorker = (self.nextWorker + 1) % len(self.workers)
+            return self.workers[self.nextWorker]
+        return self.workers[tableid % len(self.workers)]
+
+    def login(self, user:User) ->None:
+        """accept a new user. The workers learn about him in sendTables"""
+        if user not in self.srvUsers:
+            self.srvUsers.append(user)
+            self.usersByName[user.name] = user
+            self.idleUsers.add(user)
+
+    def sendTables(self, user:User, tables:Optional[List[Any]]=None) ->Deferred:
+        """the client told us his properties: now log him into all workers.
+        They send their tables themselves"""
+        assert tables is None
+        return DeferredList([
+            x.callRemote('login', user.userid, user.dbIdent, user.voiceId,
+                         user.maxGameId, user.protocol).addErrback(logFailure)
+            for x in self.workers])
+
+    def logout(self, user:User) ->None:
+        """remove user from all workers"""
+        if user in self.srvUsers:
+            for worker in self.workers:
+                worker.callRemote('logout', user.name).addErrback(logFailure)
+            if self.usersByName.get(user.name) is user:
+                del self.usersByName[user.name]
+        super().logout(user)
+
+    def newTable(self, user:User, ruleset:str, playOpen:bool,
+                 autoPlay:bool, wantedGame:str, tableId:Optional[int]=None) ->Deferred:
+        """user creates new table and joins it"""
+        return self.workerFor(tableId).callRemote(
+            'call', user.name, 'newTable', ruleset, playOpen, autoPlay, wantedGame, tableId)
+
+    def joinTable(self, user:User, tableid:int) ->Deferred:  # type:ignore[override]
+        """user joins table"""
+        return self.workerFor(tableid).callRemote('call', user.name, 'joinTable', tableid)
+
+    def leaveTable(self, user:User, tableid:int, message:str, *args:str) ->Deferred:  # type:ignore[override]
+        """user leaves table"""
+        return self.workerFor(tableid).callRemote('call', user.name, 'leaveTable', tableid, message, *args)
+
+    def startGame(self, user:User, tableid:int) ->Deferred:  # type:ignore[override]
+        """try to start the game"""
+        return self.workerFor(tableid).callRemote('call', user.name, 'startGame', tableid)
+
+    def needTables(self, user:User, shard:Optional[int]) ->Deferred:  # type:ignore[override]
+        """the client missed a delta from worker shard"""
+        if shard is None or not 0 <= shard < len(self.workers):
+            return succeed([])
+        return self.workers[shard].callRemote('call', user.name, 'needTables', shard)
+
+    def chat(self, chatString:str) ->None:
+        """a client sent us a chat message"""
+        chatLine = ChatMessage(chatString)  # type:ignore[arg-type]
+        self.workerFor(chatLine.tableid).callRemote('chat', chatString).addErrback(logFailure)
+
+    def needRulesets(self, rulesetHashes:List[str]) ->Deferred:  # type:ignore[override]
+        """the client wants those full rulesets. Ask all workers"""
+        def collect(results:List[Tuple[bool, List[bytes]]]) ->List[bytes]:
+            """merge the answers"""
+            result:Dict[bytes, None] = {}
+            for success, rulesets in results:
+                if success:
+                    result.update(dict.fromkeys(rulesets))
+            return list(result)
+        return DeferredList([x.callRemote('needRulesets', rulesetHashes) for x in self.workers]).addCallback(collect)
+
+
+def listenForFront(server:MJServer) ->bool:
+    """a worker only talks to the front"""
+    secret = os.environ.pop(SECRET, None)
+    if not secret:
+        logWarning(f'worker {Options.shard} did not get the secret of its front')
+        return False
+    factory = pb.PBServerFactory(ShardGate(ShardWorker(server), secret), unsafeTracebacks=False)
+    address = Options.socket or Options.port
+    try:
+        if isinstance(address, int):
+            Internal.reactor.listenTCP(address, factory, interface='127.0.0.1')  # type:ignore[attr-defined]
+        else:
+            Internal.reactor.listenUNIX(address, factory, mode=0o600)  # type:ignore[attr-defined]
+    except error.CannotListenError as errObj:
+        logWarning(str(errObj))
+        return False
+    if Debug.connections:
+        logDebug(f'worker {Options.shard} listening on {address}')
+    return True
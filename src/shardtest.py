@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+tests for the protocol between the front and the workers, see shard.py
+"""
+
+import os
+import stat
+import tempfile
+import unittest
+from types import SimpleNamespace
+from typing import Any, List
+
+from twisted.spread import pb
+
+from common import Options
+from shard import SECRET, ShardGate, ShardWorker, FrontRelay, listenForFront
+import testfakes
+from testfakes import User
+
+
+class Front(SimpleNamespace):
+
+    """stands for the RemoteReference to the front"""
+
+    def notifyOnDisconnect(self, unusedCallback:Any) ->None:
+        """the front never goes away"""
+
+
+class Server(testfakes.Server):
+
+    """stands for the MJServer of a worker"""
+
+    def startGame(self, user:Any, tableid:int) ->str:
+        """record the call"""
+        self.calls.append((user.name, 'startGame', (tableid, ), {}))
+        return 'started'
+
+
+class Worker(unittest.TestCase):
+
+    """the worker only talks to its front"""
+
+    def setUp(self) ->None:
+        self.server:Any = Server()
+        self.worker = ShardWorker(self.server)
+        self.gate = ShardGate(self.worker, 'secret')
+
+    def testWrongSecret(self) ->None:
+        """without the secret, there is no worker"""
+        self.assertRaises(pb.Error, self.gate.remote_attach, 'guess', Front())
+        self.assertIsNone(self.worker.front)
+
+    def testAttach(self) ->None:
+        """the front gets the worker, but only once"""
+        front = Front()
+        self.assertIs(self.gate.remote_attach('secret', front), self.worker)
+        self.assertIs(self.worker.front, front)
+        self.assertRaises(pb.Error, self.gate.remote_attach, 'secret', Front())
+        self.assertIs(self.worker.front, front)
+
+    def testGateOffersNothingElse(self) ->None:
+        """users and calls are only reachable through the worker"""
+        for method in ('login', 'logout', 'call', 'chat', 'needRulesets'):
+            self.assertFalse(hasattr(self.gate, f'remote_{method}'), method)
+            self.assertTrue(hasattr(self.worker, f'remote_{method}'), method)
+
+    def testCall(self) ->None:
+        """a call for a user goes to the server"""
+        user:Any = User('T1')
+        self.worker.users['T1'] = user
+        self.assertEqual(self.worker.remote_call('T1', 'startGame', 5), 'started')
+        self.assertEqual(self.server.calls, [('T1', 'startGame', (5, ), {})])
+        self.assertEqual(user.pings, 1)
+
+    def testUnknownUser(self) ->None:
+        """a clean error for a user the worker does not know"""
+        self.assertRaises(pb.Error, self.worker.remote_call, 'T2', 'startGame', 5)
+        self.assertEqual(self.server.calls, [])
+
+    def testUnknownMethod(self) ->None:
+        """only the methods for users may be called"""
+        user:Any = User('T1')
+        self.worker.users['T1'] = user
+        self.assertRaises(pb.Error, self.worker.remote_call, 'T1', 'logout')
+        self.assertRaises(pb.Error, self.worker.remote_call, 'T1', '__init__')
+
+
+class Relay(unittest.TestCase):
+
+    """the front relays calls from the workers to the clients"""
+
+    def setUp(self) ->None:
+        self.front:Any = testfakes.Server(usersByName={'T1': User('T1', move=lambda *args, **kwargs: 'OK')})
+        self.relay = FrontRelay(self.front)
+
+    def testRelay(self) ->None:
+        """the call goes to the client of the user"""
+        result:List[Any] = []
+        self.relay.remote_relay('T1', 'move', ('E', 'Discard'), {'tile': b'\x01'}).addCallback(result.append)
+        self.assertEqual(result, ['OK'])
+        self.assertEqual(self.front.calls, [('T1', 'move', ('E', 'Discard'), {'tile': b'\x01'})])
+
+    def testGone(self) ->None:
+        """the user logged out meanwhile"""
+        result:List[Any] = []
+        self.relay.remote_relay('T2', 'move', (), {}).addCallback(result.append)
+        self.assertEqual(result, [[]])
+        self.assertEqual(self.front.calls, [])
+
+
+class Socket(unittest.TestCase):
+
+    """the UNIX socket of a worker"""
+
+    def setUp(self) ->None:
+        self.saved = Options.socket, Options.port
+        self.server:Any = Server()
+        self.directory = tempfile.TemporaryDirectory()  # pylint:disable=consider-using-with
+        Options.socket = os.path.join(self.directory.name, 'socket.shard0')
+
+    def tearDown(self) ->None:
+        os.environ.pop(SECRET, None)
+        Options.socket, Options.port = self.saved
+        self.directory.cleanup()
+
+    def testNoSecret(self) ->None:
+        """a worker started without secret does not listen"""
+        self.assertFalse(listenForFront(self.server))
+        self.assertFalse(os.path.exists(Options.socket))
+
+    @unittest.skipIf(os.name == 'nt', 'workers listen on TCP')
+    def testPrivate(self) ->None:
+        """only the server user may connect"""
+        os.environ[SECRET] = 'secret'
+        self.assertTrue(listenForFront(self.server))
+        self.assertNotIn(SECRET, os.environ)
+        mode = stat.S_IMODE(os.stat(Options.socket).st_mode)
+        self.assertEqual(mode & (stat.S_IRWXG | stat.S_IRWXO), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
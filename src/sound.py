@@ -9,19 +9,20 @@ SPDX-License-Identifier: GPL-2.0-only
 
 import os
 import sys
+import json
 import tarfile
 import subprocess
-import datetime
+import time
+from collections import deque
 from io import BytesIO
+from functools import partial
 from hashlib import md5
-from typing import List, Any, Optional
+from typing import List, Any, Optional, Dict, Tuple, Deque
 
 from common import Debug, Internal, ReprMixin, cacheDir
-from util import which, removeIfExists, uniqueList, elapsedSince
+from util import which, removeIfExists, uniqueList
 from log import logWarning, i18n, logDebug, logException
 
-from qt import QStandardPaths
-
 from tile import Tile
 
         # Phonon does not work with short files - it plays them
@@ -45,17 +46,31 @@ class SoundPopen(subprocess.Popen):
     def __init__(self, what:str, args:Any) ->None:
         super().__init__(args)
         self.name = what
-        self.startTime = datetime.datetime.now()
+        self.startTime = time.monotonic()
 
 
 class Sound:
 
     """the sound interface. Use class variables and class methods,
-    thusly ensuring no two instances try to speak"""
+    thusly ensuring no two instances try to speak.
+
+    Utterances are queued and played one after the other by a single
+    player process. If several are waiting, one process plays them all.
+    Utterances waiting for more than maxAge seconds or belonging to
+    another game are dropped, so the sounds never lag far behind the game"""
     __oggBinary = None
     __bonusOgg = None
-    playProcesses : List[SoundPopen] = []
-    lastCleaned = None
+    process : Optional[SoundPopen] = None
+    waiting : Deque[Tuple[str, float, Any]] = deque()  # file name, time queued, game
+    maxAge = 2.0
+    maxWaiting = 4
+    maxPlayTime = 10.0  # kill the player process after that many seconds
+    pollInterval = 0.1
+    # counters, see stats()
+    queued = 0
+    played = 0
+    dropped = 0
+    processes = 0
 
     @staticmethod
     def findOggBinary() ->str:
@@ -83,40 +98,75 @@ class Sound:
         return Sound.__oggBinary
 
     @staticmethod
-    def cleanProcesses() ->None:
-        """terminate ogg123 children"""
-        now = datetime.datetime.now()
-        if Sound.lastCleaned and (now - Sound.lastCleaned).seconds < 2:
+    def stats() ->Dict[str, int]:
+        """the counters"""
+        return {'queued': Sound.queued, 'played': Sound.played,
+                'dropped': Sound.dropped, 'processes': Sound.processes,
+                'waiting': len(Sound.waiting)}
+
+    @staticmethod
+    def __drop(entry:Tuple[str, float, Any], why:str) ->None:
+        """we will not play this"""
+        Sound.dropped += 1
+        if Debug.sound:
+            logDebug(f'dropped sound {entry[0]}: {why}. {Sound.stats()}')
+
+    @staticmethod
+    def __playWaiting() ->None:
+        """start the player process for everything still worth playing"""
+        if Sound.process:
             return
-        Sound.lastCleaned = now
-        remaining = []
-        for process in Sound.playProcesses:
-            if process.poll() is not None:
-                # ogg123 self-finished
-                continue
-            diff = now - process.startTime
-            if diff.seconds > 10:
-                try:
-                    process.kill()
-                except OSError:
-                    pass
-                try:
-                    os.waitpid(process.pid, 0)
-                except OSError:
-                    pass
-                if Debug.sound:
-                    assert Internal.scene
-                    game = Internal.scene.game
-                    assert game
-                    game.debug(f'10 seconds passed. Killing {process.name}')
+        game = Internal.scene.game if Internal.scene else None
+        now = time.monotonic()
+        files = []
+        while Sound.waiting:
+            entry = Sound.waiting.popleft()
+            if entry[2] is not game:
+                Sound.__drop(entry, 'the game has changed')
+            elif now - entry[1] > Sound.maxAge:
+                Sound.__drop(entry, f'waited {now - entry[1]:.1f} seconds')
             else:
-                remaining.append(process)
-        Sound.playProcesses = remaining
+                files.append(entry[0])
+        if not files:
+            return
+        args = [Sound.findOggBinary(), '-q']
+        args.extend(files)
+        if Debug.sound:
+            logDebug(' '.join(args))
+        try:
+            Sound.process = SoundPopen(' '.join(files), args)
+        except OSError as exc:
+            logWarning(f'cannot start {args[0]}: {exc}')
+            return
+        Sound.processes += 1
+        Sound.played += len(files)
+        assert Internal.reactor
+        Internal.reactor.callLater(Sound.pollInterval, Sound.__checkProcess)
+
+    @staticmethod
+    def __checkProcess() ->None:
+        """is the player process done? Then play what came meanwhile"""
+        process = Sound.process
+        if process is None:
+            return
+        if process.poll() is None:
+            if time.monotonic() - process.startTime < Sound.maxPlayTime:
+                assert Internal.reactor
+                Internal.reactor.callLater(Sound.pollInterval, Sound.__checkProcess)
+                return
+            try:
+                process.kill()
+                process.wait()
+            except OSError:
+                pass
+            if Debug.sound:
+                logDebug(f'{Sound.maxPlayTime} seconds passed. Killing {process.name}')
+        Sound.process = None
+        Sound.__playWaiting()
 
     @staticmethod
     def speak(what:str) ->None:
         """this is what the user of this module will call."""
-        # pylint: disable=too-many-branches
         if not Internal.scene:
             return
         assert Internal.Preferences
@@ -125,51 +175,43 @@ class Sound:
         game = Internal.scene.game
         if not game:
             return
-        reactor = Internal.reactor
-        assert reactor
-        if game and not game.autoPlay and len(Sound.playProcesses) > 0:
-            # in normal play, wait a moment between two speaks. Otherwise
-            # sometimes too many simultaneous speaks make them ununderstandable
-            lastSpeakStart = max(x.startTime for x in Sound.playProcesses)
-            if elapsedSince(lastSpeakStart) < 0.3:
-                assert reactor
-                reactor.callLater(1, Sound.speak, what)
-                return
         if os.path.exists(what):
             oggBinary = Sound.findOggBinary()
             if oggBinary:
                 if sys.platform == 'win32':
-                    # convert to .wav, store .wav in cacheDir
-                    name, ext = os.path.splitext(what)
-                    assert ext == '.ogg', f'what: {what} name: {name} ext: {ext}'
-                    if 'bell' in name:
-                        nameParts = ['bell']
-                    else:
-                        nameParts = os.path.normpath(name).split(os.sep)
-                        nameParts = nameParts[nameParts.index('voices') + 1:]
-                    wavName = os.path.normpath(
-                        f"{cacheDir()}/{'_'.join(nameParts)}.wav")
-                    if not os.path.exists(wavName):
-                        args = [oggBinary, '-a', '-w', wavName, os.path.normpath(what)]
-                        startupinfo = subprocess.STARTUPINFO()
-                        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                        subprocess.call(args, startupinfo=startupinfo)
-                        if Debug.sound:
-                            logDebug(f'converted {what} to wav {wavName}')
-                    try:
-                        winsound.PlaySound(
-                            wavName,
-                            winsound.SND_FILENAME | winsound.SND_NODEFAULT)
-                    except RuntimeError:
-                        pass
-                else:
-                    args = [oggBinary, '-q', what]
-                    if Debug.sound:
-                        game.debug(' '.join(args))
-                    process = SoundPopen(what, args)
-                    Sound.playProcesses.append(process)
-                    reactor.callLater(3, Sound.cleanProcesses)
-                    reactor.callLater(6, Sound.cleanProcesses)
+                    Sound.__speakWindows(oggBinary, what)
+                    return
+                Sound.queued += 1
+                Sound.waiting.append((what, time.monotonic(), game))
+                while len(Sound.waiting) > Sound.maxWaiting:
+                    Sound.__drop(Sound.waiting.popleft(), 'too many sounds are waiting')
+                Sound.__playWaiting()
+
+    @staticmethod
+    def __speakWindows(oggBinary:str, what:str) ->None:
+        """convert to .wav, store .wav in cacheDir"""
+        name, ext = os.path.splitext(what)
+        assert ext == '.ogg', f'what: {what} name: {name} ext: {ext}'
+        if 'bell' in name:
+            nameParts = ['bell']
+        else:
+            nameParts = os.path.normpath(name).split(os.sep)
+            nameParts = nameParts[nameParts.index('voices') + 1:]
+        wavName = os.path.normpath(
+            f"{cacheDir()}/{'_'.join(nameParts)}.wav")
+        if not os.path.exists(wavName):
+            args = [oggBinary, '-a', '-w', wavName, os.path.normpath(what)]
+            startupinfo = subprocess.STARTUPINFO()  # type:ignore[attr-defined]
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW  # type:ignore[attr-defined]
+            subprocess.call(args, startupinfo=startupinfo)
+            if Debug.sound:
+                logDebug(f'converted {what} to wav {wavName}')
+        try:
+            winsound.PlaySound(
+                wavName,
+                winsound.SND_FILENAME | winsound.SND_NODEFAULT)
+        except RuntimeError:
+            pass
 
     @staticmethod
     def bonus() ->None:
@@ -200,10 +242,15 @@ class Voice(ReprMixin):
 
     __availableVoices : List['Voice'] = []
     md5sumLength = 32 # magical constant
+    # directory: ogg file names with size and mtime, and their md5sum.
+    # Persisted in cacheDir(), so we only read ogg files if they changed
+    __fingerprints : Optional[Dict[str, Tuple[List[Any], str]]] = None
+    __fingerprintsPending = False  # they changed, writing them is scheduled
 
     def __init__(self, directory:str, content:Optional[bytes]=None) ->None:
         """give this name a voice"""
         self.__md5sum:Optional[str] = None
+        self.__archive:Optional[bytes] = None  # the content of the archive file
         if not os.path.split(directory)[0]:
             if Debug.sound:
                 logDebug(f'place voice {directory} in {cacheDir()}')
@@ -238,15 +285,21 @@ class Voice(ReprMixin):
             result = 'en_US'
         return result
 
+    @staticmethod
+    def __parentDirectories() ->List[str]:
+        """the directories holding voice directories"""
+        from qt import QStandardPaths
+        result = QStandardPaths.locateAll(
+            QStandardPaths.StandardLocation.AppDataLocation, 'voices', QStandardPaths.LocateOption.LocateDirectory)
+        result.insert(0, os.path.join('share', 'kajongg', 'voices'))
+        return result
+
     @staticmethod
     def availableVoices() ->List['Voice']:
         """a list of all voice directories"""
         if not Voice.__availableVoices:
             result:List['Voice'] = []
-            directories = QStandardPaths.locateAll(
-                QStandardPaths.StandardLocation.AppDataLocation, 'voices', QStandardPaths.LocateOption.LocateDirectory)
-            directories.insert(0, os.path.join('share', 'kajongg', 'voices'))
-            for parentDirectory in directories:
+            for parentDirectory in Voice.__parentDirectories():
                 for (dirpath, _, _) in os.walk(parentDirectory, followlinks=True):
                     if os.path.exists(os.path.join(dirpath, 's1.ogg')):
                         result.append(Voice(dirpath))
@@ -264,10 +317,22 @@ class Voice(ReprMixin):
     @staticmethod
     def locate(name:str) ->Optional['Voice']:
         """return Voice or None if no foreign or local voice matches.
-        In other words never return a predefined voice"""
+        In other words never return a predefined voice.
+        Checksums are only computed if name looks like one"""
+        maybeMd5sum = len(name) == Voice.md5sumLength
+        if not maybeMd5sum and not Voice.__availableVoices:
+            # try the usual place before searching all voice directories
+            for parentDirectory in Voice.__parentDirectories():
+                directory = os.path.join(parentDirectory, name)
+                if os.path.exists(os.path.join(directory, 's1.ogg')):
+                    voice = Voice(directory)
+                    if voice.language() == 'local':
+                        if Debug.sound:
+                            logDebug(f'locate found {name} in {directory}')
+                        return voice
         for voice in Voice.availableVoices():
             dirname = os.path.split(voice.directory)[-1]
-            if name == voice.md5sum:
+            if maybeMd5sum and name == voice.md5sum:
                 if Debug.sound:
                     logDebug(
                         f'locate found {name} by md5sum in {voice.directory}')
@@ -336,6 +401,83 @@ class Voice(ReprMixin):
             return sorted(x for x in os.listdir(self.directory) if x.endswith('.ogg'))
         return []
 
+    def fingerprint(self) ->List[Any]:
+        """name, size and mtime of all ogg files. Cheap, no file is read"""
+        result:List[Any] = []
+        for oggFile in self.oggFiles():
+            stat = os.stat(os.path.join(self.directory, oggFile))
+            result.append([oggFile, stat.st_size, stat.st_mtime_ns])
+        return result
+
+    def sizes(self) ->List[Tuple[str, int]]:
+        """name and size of all ogg files. Voices with different
+        sizes cannot have the same md5sum"""
+        return [(x[0], x[1]) for x in self.fingerprint()]
+
+    @staticmethod
+    def __fingerprintFile() ->str:
+        """where we persist the fingerprints. Not directly in cacheDir(),
+        other programs like kajonggtest.py expect only directories there"""
+        return os.path.join(cacheDir(), 'voiceFingerprints', 'fingerprints.json')
+
+    @staticmethod
+    def __loadFingerprints() ->Dict[str, Tuple[List[Any], str]]:
+        """read them once"""
+        if Voice.__fingerprints is None:
+            Voice.__fingerprints = {}
+            try:
+                with open(Voice.__fingerprintFile(), 'r', encoding='utf-8') as _:
+                    Voice.__fingerprints = {k: (v[0], v[1]) for k, v in json.load(_).items()}
+            except (OSError, ValueError, TypeError, IndexError, AttributeError):
+                pass
+        return Voice.__fingerprints
+
+    @staticmethod
+    def __fingerprintsChanged() ->None:
+        """write them when control returns to the reactor, so looking
+        at all voices writes them only once"""
+        if Voice.__fingerprintsPending:
+            return
+        if hasattr(Internal, 'reactor') and Internal.reactor.running:
+            Voice.__fingerprintsPending = True
+            Internal.reactor.callLater(0, Voice.__saveFingerprints)
+        else:
+            Voice.__saveFingerprints()
+
+    @staticmethod
+    def __saveFingerprints() ->None:
+        """write them, failures do not matter"""
+        Voice.__fingerprintsPending = False
+        fileName = Voice.__fingerprintFile()
+        try:
+            os.makedirs(os.path.dirname(fileName), exist_ok=True)
+            with open(fileName + '.new', 'w', encoding='utf-8') as _:
+                json.dump(Voice.__fingerprints, _)
+            os.replace(fileName + '.new', fileName)
+        except OSError as exc:
+            if Debug.sound:
+                logDebug(f'cannot write {fileName}: {exc}')
+
+    def __md5sumOfFiles(self, ogg:List[str]) ->str:
+        """the md5sum over all ogg files. Reuse the last result if
+        the fingerprint did not change"""
+        fingerprints = self.__loadFingerprints()
+        fingerprint = self.fingerprint()
+        known = fingerprints.get(self.directory)
+        if known and known[0] == fingerprint:
+            return known[1]
+        md5sum = md5()
+        for oggFile in ogg:
+            with open(os.path.join(self.directory, oggFile), 'rb') as _:
+                for chunk in iter(partial(_.read, 65536), b''):
+                    md5sum.update(chunk)
+        result = md5sum.hexdigest()
+        fingerprints[self.directory] = (fingerprint, result)
+        self.__fingerprintsChanged()
+        if Debug.sound:
+            logDebug(f'computed md5sum {result} for {self}')
+        return result
+
     def __computeMd5sum(self) ->None:
         """update md5sum file. If it changed, return True.
         If unchanged or no ogg files exist, remove archive and md5sum and return False.
@@ -352,12 +494,8 @@ class Voice(ReprMixin):
             self.__md5sum = None
             logDebug(f'no ogg files in {self}')
             return
-        md5sum = md5()
-        for oggFile in ogg:
-            with open(os.path.join(self.directory, oggFile), 'rb') as _:
-                md5sum.update(_.read())
         # the md5 stamp goes into the old archive directory 'username'
-        self.__md5sum = md5sum.hexdigest()
+        self.__md5sum = self.__md5sumOfFiles(ogg)
         existingMd5sum = self.savedmd5Sum()
         md5Name = self.md5FileName()
         if self.__md5sum != existingMd5sum:
@@ -385,10 +523,14 @@ class Voice(ReprMixin):
                 os.remove(self.archiveName())
 
     def __buildArchive(self) ->None:
-        """write the archive file and set self.__md5sum"""
+        """write the archive file and set self.__md5sum. The ogg files
+        are already compressed, so we only use fast gzip compression"""
         self.__computeMd5sum()
         if not os.path.exists(self.archiveName()):
-            with tarfile.open(self.archiveName(), mode='w:bz2') as tarFile:
+            self.__archive = None
+            # the bz2 archive written by older versions
+            removeIfExists(os.path.join(self.directory, 'content.tbz'))
+            with tarfile.open(self.archiveName(), mode='w:gz', compresslevel=1) as tarFile:
                 for oggFile in self.oggFiles():
                     tarFile.add(
                         os.path.join(
@@ -398,7 +540,7 @@ class Voice(ReprMixin):
 
     def archiveName(self) ->str:
         """ the full path of the archive file"""
-        return os.path.join(self.directory, 'content.tbz')
+        return os.path.join(self.directory, 'content.tgz')
 
     def md5FileName(self) ->str:
         """the name of the md5sum file"""
@@ -431,7 +573,7 @@ class Voice(ReprMixin):
         if not os.path.exists(self.directory):
             os.makedirs(self.directory)
         filelike = BytesIO(content)
-        with tarfile.open(mode='r|bz2', fileobj=filelike) as tarFile:
+        with tarfile.open(mode='r|*', fileobj=filelike) as tarFile:
             tarFile.extractall(path=self.directory)
             if Debug.sound:
                 logDebug(f'extracted archive into {self.directory}')
@@ -441,9 +583,14 @@ class Voice(ReprMixin):
     def archiveContent(self) ->Optional[bytes]:
         """the content of the tarfile"""
         self.__buildArchive()
-        if os.path.exists(self.archiveName()):
-            return open(self.archiveName(), 'rb').read()
-        return None
+        if self.__archive is None and os.path.exists(self.archiveName()):
+            with open(self.archiveName(), 'rb') as archive:
+                self.__archive = archive.read()
+        return self.__archive
+
+    def archiveChunk(self, offset:int, size:int) ->bytes:
+        """a part of the archive, see VoiceStore"""
+        return (self.archiveContent or b'')[offset:offset + size]
 
     @archiveContent.setter
     def archiveContent(self, content:Optional[bytes]) ->None:
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+Where does the client spend its time until the first window is painted?
+
+With --profile-startup, kajongg.py starts this before importing anything
+else. Every module import is timed, and when the central view of the main
+window is painted for the first time, the totals and the slowest imports
+go to the log.
+
+This module must only import from the standard library: everything else
+should be timed.
+"""
+
+import sys
+import time
+import builtins
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Optional
+
+if TYPE_CHECKING:
+    from qt import QWidget
+
+
+class StartupProfile:
+
+    """import times and time to first paint"""
+
+    shown = 20  # that many of the slowest imports go to the log
+
+    started:Optional[float] = None
+    imports:Dict[str, Tuple[float, float]] = {}  # module: (own seconds, seconds with nested imports)
+    __stack:List[float] = []  # seconds spent in nested imports, per running import
+    __originalImport = builtins.__import__
+    __watcher:Any = None
+
+    @classmethod
+    def start(cls) ->None:
+        """from now on, time all imports"""
+        cls.started = time.perf_counter()
+        builtins.__import__ = cls.__timedImport
+
+    @classmethod
+    def __timedImport(cls, name:str, globalsDict:Any=None, localsDict:Any=None,
+                      fromlist:Any=(), level:int=0) ->Any:
+        """time the import if it loads new modules. For an already loaded package,
+        this may be a submodule in fromlist"""
+        known = len(sys.modules)
+        key = f'{name}.{",".join(fromlist)}' if name in sys.modules and fromlist else name
+        cls.__stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return cls.__originalImport(name, globalsDict, localsDict, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = cls.__stack.pop()
+            if len(sys.modules) > known:
+                if cls.__stack:
+                    cls.__stack[-1] += elapsed
+                if key not in cls.imports:
+                    cls.imports[key] = (elapsed - nested, elapsed)
+
+    @classmethod
+    def watchFirstPaint(cls, widget:'QWidget') ->None:
+        """report when widget is painted for the first time"""
+        from qt import QObject, QEvent
+
+        class PaintWatcher(QObject):
+
+            """waits for the first paint event"""
+
+            def eventFilter(self, receiver:Any, event:Any) ->bool:
+                """report and stop watching"""
+                if event.type() == QEvent.Type.Paint:
+                    receiver.removeEventFilter(self)
+                    cls.__watcher = None
+                    cls.report()
+                return False
+
+        cls.__watcher = PaintWatcher()
+        widget.installEventFilter(cls.__watcher)
+
+    @classmethod
+    def report(cls) ->None:
+        """log what we measured and stop timing imports"""
+        assert cls.started is not None
+        builtins.__import__ = cls.__originalImport
+        from log import logInfo
+        elapsed = time.perf_counter() - cls.started
+        importTime = sum(x[0] for x in cls.imports.values())
+        logInfo(f'startup: first paint after {elapsed * 1000:.0f}ms, '
+                f'{len(cls.imports)} imports took {importTime * 1000:.0f}ms')
+        slowest = sorted(cls.imports.items(), key=lambda x: -x[1][0])[:cls.shown]
+        for name, (own, total) in slowest:
+            logInfo(f'startup: import {name}: {own * 1000:.1f}ms, with nested imports {total * 1000:.1f}ms')
@@ -8,6 +8,7 @@ SPDX-License-Identifier: GPL-2.0-only
 """
 
 import datetime
+from bisect import bisect_left
 
 from typing import TYPE_CHECKING, Optional, List, Any, cast, Union
 
@@ -25,12 +26,12 @@ from log import logDebug
 from statesaver import StateSaver
 from rule import Ruleset
 from guiutil import ListComboBox, MJTableView, decorateWindow
-from differ import RulesetDiffer
 from common import Internal, Debug
 from modeltest import ModelTest
 from chat import ChatMessage, ChatWindow
 
 if TYPE_CHECKING:
+    from differ import RulesetDiffer
     from client import ClientTable
     from qt import QObject, QEvent, QItemSelection, QPersistentModelIndex
     from qt import QPushButton
@@ -47,6 +48,31 @@ class TablesModel(QAbstractTableModel):
         self.tables = tables
         assert isinstance(tables, list)
 
+    def update(self, tables:List['ClientTable']) ->None:
+        """make our rows look like tables, sorted by tableid. Only changed rows
+        are touched, so the view keeps its selection"""
+        wanted = {x.tableid: x for x in tables}
+        for row in reversed(range(len(self.tables))):
+            table = self.tables[row]
+            if table.tableid not in wanted:
+                if table.chatWindow:
+                    table.chatWindow.hide()
+                    table.chatWindow = None
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.tables[row]
+                self.endRemoveRows()
+        for row, table in enumerate(self.tables):
+            newTable = wanted.pop(table.tableid)
+            if newTable is not table:
+                newTable.chatWindow = table.chatWindow
+                self.tables[row] = newTable
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+        for table in sorted(wanted.values(), key=lambda x: x.tableid):
+            row = bisect_left([x.tableid for x in self.tables], table.tableid)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.tables.insert(row, table)
+            self.endInsertRows()
+
     def headerData(
             self, section:int,
             orientation:Qt.Orientation, role:int=Qt.ItemDataRole.DisplayRole) ->Any:
@@ -174,7 +200,7 @@ class TableList(QWidget):
         self.setObjectName('TableList')
         self.resize(700, 400)
         self.view = MJTableView(self)
-        self.__differ:RulesetDiffer
+        self.__differ:'RulesetDiffer'
         self.debugModelTest:ModelTest
         self.requestedNewTable = False
         self.view.setItemDelegateForColumn(
@@ -401,6 +427,7 @@ class TableList(QWidget):
         """compare the ruleset of this table against ours"""
         table = self.selectedTable()
         if table:
+            from differ import RulesetDiffer
             self.__differ = RulesetDiffer([table.ruleset], Ruleset.availableRulesets())
             self.__differ.show()
 
@@ -461,6 +488,15 @@ class TableList(QWidget):
             return _.tableid
         return 0
 
+    def __updateModel(self, model:TablesModel, tables:List['ClientTable'], preselectTableId:int) ->None:
+        """the model already exists: only apply the changes"""
+        selected = self.selectedTable()
+        model.update(tables)
+        if tables and (selected is None or preselectTableId != selected.tableid):
+            _ = [x for x in tables if x.tableid >= preselectTableId]
+            self.selectTable(tables.index(_[0]) if _ else 0)
+        self.updateButtonsForTable(self.selectedTable())
+
     def loadTables(self, tables:List['ClientTable']) ->None:
         """build and use a model around the tables.
         Show all new tables (no gameid given yet) and all suspended
@@ -476,6 +512,10 @@ class TableList(QWidget):
         tables = [x for x in tables if not x.gameid or x.gameExistsLocally()]
         tables.sort(key=lambda x: x.tableid)
         preselectTableId = self.__preselectTableId(tables)
+        model = cast(TablesModel, self.view.model())
+        if model:
+            self.__updateModel(model, tables, preselectTableId)
+            return
         self.__keepChatWindows(tables)
         model = TablesModel(tables)
         self.view.setModel(model)
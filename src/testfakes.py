@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+stand-ins shared by the unit tests. Importing this module also keeps
+the tests from creating their players in the data base.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from typing import Any
+
+from twisted.internet.defer import Deferred, succeed, maybeDeferred
+
+from player import Players
+from move import Move
+from rule import Ruleset
+from predefined import ClassicalChineseDMJL
+
+Players.createIfUnknown = str  # type: ignore
+
+
+def dmjlRuleset() ->Ruleset:
+    """the loaded Classical Chinese DMJL ruleset"""
+    result = ClassicalChineseDMJL()
+    result.load()
+    return result
+
+
+class User(SimpleNamespace):
+
+    """stands for a User in the server, with what the tests need.
+    connected is True or the number of remote calls it still answers"""
+
+    def __init__(self, name:str, **kwargs:Any) ->None:
+        attributes = {
+            'name': name, 'protocol': Move.protocol, 'pendingMoves': [], 'knownTables': {},
+            'tableVersion': 0, 'pings': 0, 'connected': True}
+        attributes.update(kwargs)
+        super().__init__(**attributes)
+
+    def pinged(self) ->None:
+        """count pings"""
+        self.pings += 1
+
+
+class Server(SimpleNamespace):
+
+    """stands for the MJServer. Remote calls go directly to the
+    methods of the user while it is connected"""
+
+    def __init__(self, **kwargs:Any) ->None:
+        super().__init__(calls=[], tables={}, **kwargs)
+
+    def callRemote(self, user:User, method:str, *args:Any, **kwargs:Any) ->Deferred:
+        """like MJServer.callRemote: without connection, the answer is []"""
+        self.calls.append((user.name, method, args, kwargs))
+        if user.connected is not True:
+            if not user.connected:
+                return succeed([])
+            user.connected -= 1
+        return maybeDeferred(getattr(user, method), *args, **kwargs)
+
+
+class CacheDirTest(unittest.TestCase):
+
+    """cacheDir() is an empty temporary directory"""
+
+    def setUp(self) ->None:
+        self.savedCacheHome = os.environ.get('XDG_CACHE_HOME')
+        self.tmpDir = tempfile.mkdtemp()
+        os.environ['XDG_CACHE_HOME'] = self.tmpDir
+
+    def tearDown(self) ->None:
+        if self.savedCacheHome is None:
+            del os.environ['XDG_CACHE_HOME']
+        else:
+            os.environ['XDG_CACHE_HOME'] = self.savedCacheHome
+        shutil.rmtree(self.tmpDir)
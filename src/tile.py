@@ -240,6 +240,11 @@ class Tile(ReprMixin):  # pylint:disable=too-many-instance-attributes
                                        f"existing are: {','.join(repr(x) for x in existing)} "
                                        f"keys are:{','.join(repr(x) for x in cls.cache if x == 1)}")
 
+    @classmethod
+    def fromKey(cls, key:int) ->'Tile':
+        """the inverse of Tile.key"""
+        return cls(cls.hashTable[key * 2 - 2:key * 2])
+
     def name2(self) ->str:
         """__str__ might be changed by a subclass"""
         return self.group + self.char
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+All tile backgrounds and faces of a tileset, rasterized into one pixmap
+at the resolution of the device. Painting a tile then only copies two
+rectangles out of that pixmap instead of rendering two SVG elements.
+
+The SVG elements are rasterized one by one into TilePixmaps, shared by
+all atlases and kept for every size. An atlas is only put together
+from them. There is one atlas per device scale, so the boards with tiles
+of different size each get their own.
+
+While the view is being resized, tiles are rendered from the SVG: the
+atlas for every intermediate size would be used only once. When the size
+settles, the elements for the visible tiles are rasterized a few per
+reactor turn before painting from the atlases again.
+"""
+
+import math
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Dict, List, Tuple, Set
+
+from qt import Qt, QRectF, QPointF, QSizeF, QPixmap, QPainter, QTransform
+
+from common import Internal, Debug, isAlive
+from log import logDebug
+
+if TYPE_CHECKING:
+    from twisted.internet.base import DelayedCall
+    from qt import QGraphicsView
+    from tileset import Tileset
+
+
+class TilePixmaps:
+
+    """single SVG elements of the current tileset, rasterized in device
+    pixels. The least recently used pixmaps are dropped if we need more
+    than megabytes"""
+
+    megabytes = 40
+    prewarmBatch = 8  # elements rendered per reactor turn while prewarming
+
+    pixmaps:'OrderedDict[Tuple[str, float, float], QPixmap]' = OrderedDict()
+    usedBytes = 0
+    tilesetName:Optional[str] = None
+
+    @classmethod
+    def clear(cls) ->None:
+        """forget all pixmaps"""
+        cls.pixmaps.clear()
+        cls.usedBytes = 0
+
+    @classmethod
+    def useTileset(cls, tileset:'Tileset') ->None:
+        """forget everything rendered from another tileset"""
+        if tileset.desktopFileName != cls.tilesetName:
+            cls.clear()
+            TileAtlas.clear()
+            cls.tilesetName = tileset.desktopFileName
+
+    @classmethod
+    def pixmap(cls, tileset:'Tileset', name:str, size:QSizeF) ->QPixmap:
+        """element name rendered into the top left of the pixmap, rendered if needed"""
+        cls.useTileset(tileset)
+        key = (name, round(size.width(), 2), round(size.height(), 2))
+        result = cls.pixmaps.get(key)
+        if result is not None:
+            cls.pixmaps.move_to_end(key)
+            return result
+        result = QPixmap(math.ceil(size.width()), math.ceil(size.height()))
+        result.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(result)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        tileset.renderer.render(painter, name, QRectF(QPointF(), size))
+        painter.end()
+        cls.pixmaps[key] = result
+        cls.usedBytes += result.width() * result.height() * 4
+        while cls.usedBytes > cls.megabytes * 1024 * 1024 and len(cls.pixmaps) > 1:
+            _, dropped = cls.pixmaps.popitem(last=False)
+            cls.usedBytes -= dropped.width() * dropped.height() * 4
+        return result
+
+
+class TileAtlas:
+
+    """the rasterized tileset for one device scale"""
+
+    megabytes = 40  # the least recently used atlases are dropped beyond that
+    maxSide = 8192  # for bigger tiles we render the SVG
+    padding = 2  # pixels between cells, against bleeding when scaling
+    settleDelay = 0.3  # seconds without resize until the view size is stable
+
+    atlases:'OrderedDict[Tuple[bool, float, float], TileAtlas]' = OrderedDict()
+    usedBytes = 0
+    settled = True
+    __settleCall:Optional['DelayedCall'] = None
+    __generation = 0
+
+    def __init__(self, tileset:'Tileset', showShadows:bool, xScale:float, yScale:float) ->None:
+        self.cells:Dict[str, QRectF] = {}
+        width, height = self.__layout(self.elements(tileset, showShadows, xScale, yScale))
+        self.pixmap = QPixmap(width, height)
+        self.pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(self.pixmap)
+        for name, cell in self.cells.items():
+            painter.drawPixmap(cell.topLeft(), TilePixmaps.pixmap(tileset, name, cell.size()))
+        painter.end()
+
+    @staticmethod
+    def elements(tileset:'Tileset', showShadows:bool, xScale:float, yScale:float) ->List[Tuple[str, QSizeF]]:
+        """the SVG elements of an atlas with their size in device pixels"""
+        if showShadows:
+            names = [f'TILE_{x}' for x in range(1, 5)]
+            backSize = tileset.tileSize
+        else:
+            # see UITile.paintTile: the background is scaled to the face size
+            names = ['TILE_2']
+            xRelation, yRelation = tileset.tileFaceRelation()
+            backSize = QSizeF(tileset.faceSize.width() * xRelation, tileset.faceSize.height() * yRelation)
+        result = [(x, backSize) for x in names]
+        result.extend((x, tileset.faceSize) for x in sorted(set(tileset.svgName.values())))
+        return [(x, QSizeF(size.width() * xScale, size.height() * yScale)) for x, size in result]
+
+    def __layout(self, wanted:List[Tuple[str, QSizeF]]) ->Tuple[int, int]:
+        """place the cells in rows, returns the size of the atlas"""
+        rowWidth = math.ceil(math.sqrt(len(wanted))) * (math.ceil(wanted[-1][1].width()) + self.padding)
+        xPos = yPos = rowHeight = width = 0
+        for name, size in wanted:
+            if xPos and xPos + size.width() > rowWidth:
+                xPos = 0
+                yPos += rowHeight + self.padding
+                rowHeight = 0
+            self.cells[name] = QRectF(QPointF(xPos, yPos), size)
+            xPos += math.ceil(size.width()) + self.padding
+            width = max(width, xPos)
+            rowHeight = max(rowHeight, math.ceil(size.height()))
+        return width, yPos + rowHeight
+
+    def render(self, painter:QPainter, name:str, bounds:QRectF) ->None:
+        """draw element name into bounds, like QSvgRenderer.render"""
+        painter.drawPixmap(bounds, self.pixmap, self.cells[name])
+
+    @classmethod
+    def clear(cls) ->None:
+        """forget all atlases"""
+        cls.atlases.clear()
+        cls.usedBytes = 0
+
+    @classmethod
+    def key(cls, tileset:'Tileset', transform:QTransform) ->Optional[Tuple[bool, float, float]]:
+        """the atlas for tiles painted with transform. None if they are too big"""
+        assert Internal.Preferences
+        result = (bool(Internal.Preferences.showShadows),
+                  round(math.hypot(transform.m11(), transform.m12()), 3),
+                  round(math.hypot(transform.m21(), transform.m22()), 3))
+        if not result[1] or not result[2] or max(
+                tileset.tileSize.width() * result[1], tileset.tileSize.height() * result[2]) * 8 > cls.maxSide:
+            return None
+        return result
+
+    @classmethod
+    def forPainter(cls, tileset:'Tileset', painter:QPainter) ->Optional['TileAtlas']:
+        """the atlas for tiles painted by painter. None while resizing"""
+        if not cls.settled:
+            return None
+        TilePixmaps.useTileset(tileset)
+        key = cls.key(tileset, painter.deviceTransform())
+        if key is None:
+            return None
+        if key in cls.atlases:
+            cls.atlases.move_to_end(key)
+            return cls.atlases[key]
+        result = cls(tileset, *key)
+        cls.atlases[key] = result
+        cls.usedBytes += result.pixmap.width() * result.pixmap.height() * 4
+        while cls.usedBytes > cls.megabytes * 1024 * 1024 and len(cls.atlases) > 1:
+            _, dropped = cls.atlases.popitem(last=False)
+            cls.usedBytes -= dropped.pixmap.width() * dropped.pixmap.height() * 4
+        if Debug.graphics:
+            logDebug(f'TileAtlas for {tileset} {key}: {result.pixmap.width()}x{result.pixmap.height()}, '
+                     f'{len(cls.atlases)} atlases with {cls.usedBytes // 1024} KiB')
+        return result
+
+    @classmethod
+    def resizing(cls, view:'QGraphicsView') ->None:
+        """view is being resized: render the SVG until its size settles"""
+        cls.settled = False
+        cls.__generation += 1
+        if cls.__settleCall and cls.__settleCall.active():
+            cls.__settleCall.cancel()
+        assert Internal.reactor
+        cls.__settleCall = Internal.reactor.callLater(cls.settleDelay, cls.__prewarm, view, cls.__generation)
+
+    @classmethod
+    def __prewarm(cls, view:'QGraphicsView', generation:int) ->None:
+        """the size of view is stable now. Rasterize the elements the
+        atlases for the visible tiles need"""
+        from uitile import UITile  # pylint:disable=import-outside-toplevel
+        scene = view.scene() if isAlive(view) else None
+        todo:List[Tuple['Tileset', str, QSizeF]] = []
+        if scene:
+            ratio = view.devicePixelRatioF()
+            transform = view.viewportTransform() * QTransform.fromScale(ratio, ratio)
+            keys:Set[Tuple[bool, float, float]] = set(cls.atlases)
+            for item in scene.items():
+                if isinstance(item, UITile) and item.isVisible() and item.tileset:
+                    key = cls.key(item.tileset, item.deviceTransform(transform))
+                    if key is not None and key not in keys:
+                        keys.add(key)
+                        todo.extend((item.tileset, name, size) for name, size in cls.elements(item.tileset, *key))
+        cls.__prewarmSome(generation, todo)
+
+    @classmethod
+    def __prewarmSome(cls, generation:int, todo:List[Tuple['Tileset', str, QSizeF]]) ->None:
+        """rasterize the next batch unless the view has been resized again"""
+        if generation != cls.__generation:
+            return
+        batch = TilePixmaps.prewarmBatch
+        for tileset, name, size in todo[:batch]:
+            TilePixmaps.pixmap(tileset, name, size)
+        if len(todo) > batch:
+            assert Internal.reactor
+            Internal.reactor.callLater(0, cls.__prewarmSome, generation, todo[batch:])
+            return
+        if Debug.graphics:
+            logDebug(f'TilePixmaps: {len(TilePixmaps.pixmaps)} pixmaps with {TilePixmaps.usedBytes // 1024} KiB')
+        cls.__settle()
+
+    @classmethod
+    def __settle(cls) ->None:
+        """from now on, paint from the atlases. UITile caches its rendering
+        in device coordinates, so the visible tiles must be repainted, otherwise
+        they would keep what was rendered from the SVG while resizing"""
+        from uitile import UITile  # pylint:disable=import-outside-toplevel
+        cls.settled = True
+        if Internal.scene:
+            for item in Internal.scene.items():
+                if isinstance(item, UITile) and item.isVisible():
+                    item.update()
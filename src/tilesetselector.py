@@ -155,7 +155,6 @@ class TilesetSelector(QWidget):
         self.tilesetNameList.currentRowChanged.connect(self.tilesetRowChanged)
         self.kcfg_tilesetName.textChanged.connect(self.tilesetNameChanged)
 
-        Tileset.loadAll()
         # list default tileset first
         self.tilesetList = Tileset.available()
         for aset in self.tilesetList:
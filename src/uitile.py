@@ -19,6 +19,7 @@ from common import LIGHTSOURCES, ZValues, Internal, Debug
 from common import ReprMixin, isAlive, id4
 from tile import Tile, Meld
 from animation import AnimatedMixin
+from tileatlas import TileAtlas
 
 if TYPE_CHECKING:
     from qt import QKeyEvent, QWidget, QStyleOptionGraphicsItem
@@ -80,10 +81,22 @@ class UITile(AnimatedMixin, QGraphicsObject, ReprMixin):  # type:ignore[misc]
             _.keyPressEvent(event)
 
     def __lightDistance(self) ->float:
-        """the distance of item from the light source"""
+        """the distance of item from the light source. The board caches
+        it for the places where its tiles come to rest"""
         board = self.board
         if not board:
             return 0.0
+        pos = cast(QPointF, self.pos)
+        key = (pos.x(), pos.y(), cast(float, self.rotation), cast(float, self.scale))
+        result = board.lightDistances.get(key)
+        if result is None:
+            if len(board.lightDistances) > 1000:
+                board.lightDistances.clear()
+            result = board.lightDistances[key] = self.__computeLightDistance(board)
+        return result
+
+    def __computeLightDistance(self, board:'Board') ->float:
+        """the distance of item from the light source"""
         rect = self.sceneBoundingRect()
         lightSource = board.lightSource
         result = 0.0
@@ -201,14 +214,22 @@ class UITile(AnimatedMixin, QGraphicsObject, ReprMixin):  # type:ignore[misc]
 
     def paint(self, painter:Optional[QPainter], unusedOption:Optional['QStyleOptionGraphicsItem'],
         unusedWidget:Optional['QWidget']=None) ->None:
-        """paint the entire tile.
-        I tried to cache a pixmap for the tile and darkener but without face,
-        but that actually made it slower."""
+        """paint the entire tile. Rendering the SVG elements is slow,
+        so we normally copy them from the TileAtlas"""
+        assert painter
+        assert self.tileset
+        self.paintTile(painter, TileAtlas.forPainter(self.tileset, painter))
+        if self.cross:
+            self.__paintCross(painter)
+        if Debug.graphics or self.tile.exposed.name2() in Debug.focusable:
+            self.__paintId(painter)
+
+    def paintTile(self, painter:QPainter, atlas:Optional[TileAtlas]=None) ->None:
+        """render tile, darkener and face from atlas or from the SVG"""
         assert Internal.Preferences
         assert self.tileset
-        assert painter
         with Painter(painter):
-            renderer = self.tileset.renderer
+            renderer = atlas or self.tileset.renderer
             withBorders = Internal.Preferences.showShadows
             if not withBorders:
                 painter.scale(*self.tileset.tileFaceRelation())
@@ -225,10 +246,6 @@ class UITile(AnimatedMixin, QGraphicsObject, ReprMixin):  # type:ignore[misc]
                     renderer.render(
                         painter, self.svgName,
                         self.boundingRect())
-        if self.cross:
-            self.__paintCross(painter)
-        if Debug.graphics or self.tile.exposed.name2() in Debug.focusable:
-            self.__paintId(painter)
 
     def __paintId(self, painter:QPainter) ->None:
         """for debugging, paint uid"""
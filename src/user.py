@@ -11,10 +11,12 @@ Twisted Network Programming Essentials by Abe Fettig, 2006
 O'Reilly Media, Inc., ISBN 0-596-10032-9
 """
 
-import datetime
-from typing import Optional, TYPE_CHECKING, List, Any, Union
+import time
+import heapq
+import itertools
+from typing import Optional, TYPE_CHECKING, List, Any, Tuple, Dict
 
-from twisted.internet.defer import fail
+from twisted.internet.defer import fail, maybeDeferred
 from twisted.spread import pb
 
 from common import Internal, Debug, Options, ReprMixin
@@ -22,11 +24,12 @@ from servercommon import srvError
 from log import logDebug
 from mi18n import i18nE
 from query import Query
+from move import Move
+from rule import Ruleset
 
 if TYPE_CHECKING:
     from twisted.internet.defer import Deferred
     from server import MJServer
-    from rule import Ruleset
 
 
 class User(pb.Avatar, ReprMixin):
@@ -38,17 +41,22 @@ class User(pb.Avatar, ReprMixin):
             'select name from player where id=?',
             (userid,
             )).records[0][0]
+        self.userid = userid
         self.mind:Optional[pb.RemoteReference] = None
         self.server:Optional['MJServer'] = None
         self.dbIdent:Optional[str] = None
         self.voiceId:Optional[str] = None
         self.maxGameId:Optional[int] = None
-        self.lastPing:Optional['datetime.datetime'] = None
+        self.protocol = 0
+        self.pendingMoves:List[Tuple['Deferred', Tuple[Any, ...], Dict[str, Any]]] = []
+        self.lastPing = 0.0
+        self.tableVersion = 0
+        self.knownTables:Dict[int, List[Any]] = {}
         self.pinged()
 
     def pinged(self) ->None:
-        """time of last ping or message from user"""
-        self.lastPing = datetime.datetime.now()
+        """time of last ping or message from user, see time.monotonic()"""
+        self.lastPing = time.monotonic()
         if self.server:
             self.server.lastPing = self.lastPing
 
@@ -79,12 +87,15 @@ class User(pb.Avatar, ReprMixin):
         self.mind = None
 
     def perspective_setClientProperties(
-            self, dbIdent:str, voiceId:str, maxGameId:int, clientVersion:Optional[str]=None) ->Optional['Deferred']:
-        """perspective_* methods are to be called remotely"""
+            self, dbIdent:str, voiceId:str, maxGameId:int, clientVersion:Optional[str]=None,
+            protocol:int=0) ->Optional['Deferred']:
+        """perspective_* methods are to be called remotely.
+        Clients not passing protocol get protocol 0"""
         self.pinged()
         self.dbIdent = dbIdent
         self.voiceId = voiceId
         self.maxGameId = maxGameId
+        self.protocol = min(protocol, Move.protocol)
         serverVersion = Internal.defaultPort
         if clientVersion != serverVersion:
             if clientVersion is None:
@@ -100,7 +111,7 @@ class User(pb.Avatar, ReprMixin):
                                  serverVersion))
         if Debug.table:
             logDebug(f'client has dbIdent={self.dbIdent} voiceId={self.voiceId} '
-                     f'maxGameId={self.maxGameId} clientVersion {clientVersion}')
+                     f'maxGameId={self.maxGameId} clientVersion {clientVersion} protocol {self.protocol}')
         assert self.server
         self.server.sendTables(self)
         return None
@@ -109,10 +120,19 @@ class User(pb.Avatar, ReprMixin):
         """perspective_* methods are to be called remotely"""
         return self.pinged()
 
-    def perspective_needRulesets(self, rulesetHashes:List[str]) ->List[List[List[Union[int, str, float]]]]:
+    def perspective_needTables(self, shard:Optional[int]) ->Optional['Deferred']:
         """perspective_* methods are to be called remotely"""
+        self.pinged()
         assert self.server
-        return self.server.needRulesets(rulesetHashes)
+        return self.server.needTables(self, shard)
+
+    def perspective_needRulesets(self, rulesetHashes:List[str]) ->'Deferred':
+        """perspective_* methods are to be called remotely"""
+        assert self.server
+        result = maybeDeferred(self.server.needRulesets, rulesetHashes)
+        if self.protocol < 3:
+            result.addCallback(lambda x: [Ruleset.fromWire(y) for y in x])
+        return result
 
     def perspective_joinTable(self, tableid:int) ->bool:
         """perspective_* methods are to be called remotely"""
@@ -148,3 +168,51 @@ class User(pb.Avatar, ReprMixin):
 
     def __str__(self) ->str:
         return self.name
+
+
+class IdleUsers:
+
+    """the users ordered by the time their connection expires.
+
+    pinged() only updates User.lastPing, it does not touch the heap. So the
+    deadline of an entry may be too early: expired() then puts the user
+    back with his real deadline. Every user has exactly one valid entry,
+    entries of users who logged out are dropped when they come up.
+    Finding the expired users costs O(expired), not O(users)."""
+
+    def __init__(self, timeout:float) ->None:
+        self.timeout = timeout
+        self.heap:List[Tuple[float, int, User]] = []
+        self.deadlines:Dict[User, float] = {}
+        self.__sequence = itertools.count()  # User instances cannot be compared
+
+    def __len__(self) ->int:
+        return len(self.deadlines)
+
+    def add(self, user:User) ->None:
+        """watch user"""
+        deadline = user.lastPing + self.timeout
+        self.deadlines[user] = deadline
+        heapq.heappush(self.heap, (deadline, next(self.__sequence), user))
+
+    def remove(self, user:User) ->None:
+        """user logged out. His entry stays in the heap until it comes up"""
+        self.deadlines.pop(user, None)
+
+    def nextDeadline(self) ->Optional[float]:
+        """when the next user might expire"""
+        return self.heap[0][0] if self.heap else None
+
+    def expired(self, now:float) ->List[User]:
+        """remove and return all users without a message since timeout seconds"""
+        result = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, _, user = heapq.heappop(self.heap)
+            if self.deadlines.get(user) != deadline:
+                continue
+            if user.lastPing + self.timeout > now:
+                self.add(user)
+            else:
+                del self.deadlines[user]
+                result.append(user)
+        return result
@@ -12,6 +12,8 @@ SPDX-License-Identifier: GPL-2.0-only
 
 import traceback
 import os
+import sys
+import time
 import datetime
 import subprocess
 import gc
@@ -23,6 +25,9 @@ from typing import Optional, List, Generator, Sequence, Any, Type, Iterable, Dic
 
 from common import Debug
 
+if sys.platform != 'win32':
+    import resource
+
 if TYPE_CHECKING:
     from types import FrameType
 
@@ -137,14 +142,15 @@ class Duration:
 
     """a helper class for checking code execution duration"""
 
-    def __init__(self, name:str, threshold:float=1.0, bug:bool=False) ->None:
-        """name describes where in the source we are checking
+    def __init__(self, name:object, threshold:float=1.0, bug:bool=False) ->None:
+        """name describes where in the source we are checking. It is
+        only converted to str if the threshold is exceeded.
         threshold in seconds: do not warn below
         if bug is True, throw an exception if threshold is exceeded"""
         self.name = name
         self.threshold = threshold
         self.bug = bug
-        self.__start = datetime.datetime.now()
+        self.__start = time.perf_counter()
 
     def __enter__(self) ->'Duration':
         return self
@@ -152,9 +158,9 @@ class Duration:
     def __exit__(self, exc_type:Type, exc_value:Exception, trback:Any) ->None:
         """now check time passed"""
         if not Debug.neutral:
-            diff = datetime.datetime.now() - self.__start
-            if diff > datetime.timedelta(seconds=self.threshold):
-                msg = f'{self.name} took {int(diff.seconds)}.{int(diff.microseconds):02} seconds'
+            diff = time.perf_counter() - self.__start
+            if diff > self.threshold:
+                msg = f'{self.name} took {diff:.2f} seconds'
                 if self.bug:
                     raise UserWarning(msg)
                 print(msg)
@@ -168,6 +174,16 @@ def __debugCollect() ->None:
     gc.collect()        # we want to eliminate all output
     print('}}} done')
 
+def memoryUsage() ->Dict[str, Any]:
+    """what the garbage collector knows. Also see checkMemory"""
+    result:Dict[str, Any] = {
+        'gcCounts': gc.get_count(),
+        'garbage': len(gc.garbage),
+        'objects': len(gc.get_objects())}
+    if sys.platform != 'win32':
+        result['maxRSS'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # pylint:disable=possibly-used-before-assignment
+    return result
+
 def checkMemory() ->None:
     """as the name says"""
     if not Debug.gc:
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+Voice archives on the game server.
+
+Clients with wire protocol 4 get voices of other players in the
+background, the game does not wait for them. The server fetches an
+archive from the client owning that voice in chunks and keeps it, keyed
+by the md5sum of the voice. Every later game with the same voice gets
+it from the server without asking the owner again.
+
+Both directions are resumable: if a transfer breaks, the next one goes
+on at the offset where the last one stopped.
+"""
+
+import shutil
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Any
+
+from twisted.internet.defer import Deferred, succeed
+
+from common import Debug
+from log import logDebug, logWarning, logFailure
+from sound import Voice
+
+if TYPE_CHECKING:
+    from twisted.python.failure import Failure
+    from server import MJServer
+    from user import User
+
+
+class VoiceStore:
+
+    """the voice archives known to the server"""
+
+    chunkSize = 64 * 1024  # well below the string limit of twisted.pb
+    maxArchives = 20  # kept in memory, the others are in cacheDir()
+
+    archives:'OrderedDict[str, bytes]' = OrderedDict()
+    uploads:Dict[str, bytearray] = {}  # incomplete archives from the owning clients
+    waiting:Dict[str, List[Deferred]] = {}
+
+    @classmethod
+    def archive(cls, server:'MJServer', owner:'User', md5sum:str) ->Deferred:
+        """the archive of voice md5sum. If we do not have it, get it from owner"""
+        if md5sum in cls.archives:
+            cls.archives.move_to_end(md5sum)
+            return succeed(cls.archives[md5sum])
+        voice = Voice(md5sum)
+        if voice.oggFiles():
+            content = voice.archiveContent
+            if content:
+                cls.__remember(md5sum, content)
+                return succeed(content)
+        result:Deferred = Deferred()
+        if md5sum in cls.waiting:
+            cls.waiting[md5sum].append(result)
+        else:
+            cls.waiting[md5sum] = [result]
+            cls.__fetch(server, owner, md5sum)
+        return result
+
+    @classmethod
+    def __remember(cls, md5sum:str, content:bytes) ->None:
+        """keep content in memory"""
+        cls.archives[md5sum] = content
+        while len(cls.archives) > cls.maxArchives:
+            cls.archives.popitem(last=False)
+
+    @classmethod
+    def __fetch(cls, server:'MJServer', owner:'User', md5sum:str) ->None:
+        """get the next chunk from owner"""
+        def gotChunk(chunk:bytes) ->None:
+            """append chunk. An empty chunk means we have everything"""
+            if not isinstance(chunk, bytes):
+                # no connection to owner
+                done(None)
+            elif chunk:
+                data.extend(chunk)
+                cls.__fetch(server, owner, md5sum)
+            else:
+                del cls.uploads[md5sum]
+                voice = Voice(md5sum, bytes(data))
+                if not voice.oggFiles() or voice.md5sum != md5sum:
+                    logWarning(f'{owner.name} sent a wrong archive for voice {md5sum}')
+                    shutil.rmtree(voice.directory, ignore_errors=True)
+                    done(None)
+                else:
+                    if Debug.sound:
+                        logDebug(f'server got voice {md5sum} from {owner.name}: {len(data)} bytes')
+                    cls.__remember(md5sum, bytes(data))
+                    done(bytes(data))
+
+        def failed(failure:'Failure') ->None:
+            """keep what we have, the next transfer goes on from there"""
+            logFailure(failure)
+            done(None)
+
+        def done(content:Optional[bytes]) ->None:
+            """tell everybody waiting for this voice"""
+            for deferred in cls.waiting.pop(md5sum, []):
+                deferred.callback(content)
+
+        data = cls.uploads.setdefault(md5sum, bytearray())
+        server.callRemote(owner, 'voiceChunk', md5sum, len(data), cls.chunkSize).addCallback(
+            gotChunk).addErrback(failed)
+
+    @classmethod
+    def send(cls, server:'MJServer', owner:'User', requester:'User', playerName:str, md5sum:str) ->None:
+        """send the voice of owner to requester, in the background"""
+        def gotArchive(content:Optional[bytes]) ->Optional[Deferred]:
+            """an empty first chunk asks requester what he already has"""
+            if not content:
+                if Debug.sound:
+                    logDebug(f'server has no voice {md5sum} for {requester.name}')
+                return None
+            return sendChunk(content, 0, b'')
+
+        def sendChunk(content:bytes, offset:int, chunk:bytes) ->Deferred:
+            """requester answers with the offset he wants next"""
+            return server.callRemote(
+                requester, 'voiceData', md5sum, playerName, len(content), offset, chunk).addCallback(
+                    sendNext, content)
+
+        def sendNext(offset:Any, content:bytes) ->Optional[Deferred]:
+            """the next chunk if requester still needs one"""
+            if not isinstance(offset, int) or offset >= len(content):
+                return None
+            return sendChunk(content, offset, content[offset:offset + cls.chunkSize])
+
+        cls.archive(server, owner, md5sum).addCallback(gotArchive).addErrback(logFailure)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2026 agent <agent@local>
+
+SPDX-License-Identifier: GPL-2.0-only
+
+
+tests for voicestore.py
+"""
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from typing import Any, List, Optional
+
+from common import Internal
+from humanclient import HumanClient
+from sound import Voice
+from voicestore import VoiceStore
+from testfakes import Server, User, CacheDirTest
+
+
+class VoiceTransfer(CacheDirTest):
+
+    """voices go in chunks from the owner to the server and from
+    there to the other players. A broken transfer goes on where it stopped"""
+
+    def setUp(self) ->None:
+        super().setUp()
+        self.savedChunkSize = VoiceStore.chunkSize
+        VoiceStore.chunkSize = 1000
+        voice = self.voice('owner')
+        self.md5sum = voice.md5sum
+        self.content = voice.archiveContent
+        assert self.content
+        self.server:Any = Server()
+        self.owner:Any = User('owner', voiceChunk=self.voiceChunk)
+        self.client:Any = SimpleNamespace(voiceDownloads={}, game=None)
+        self.requester:Any = User('requester', voiceData=self.voiceData)
+
+    def tearDown(self) ->None:
+        VoiceStore.chunkSize = self.savedChunkSize
+        VoiceStore.archives.clear()
+        VoiceStore.uploads.clear()
+        VoiceStore.waiting.clear()
+        super().tearDown()
+
+    def voice(self, name:str) ->Voice:
+        """a new voice with random ogg files"""
+        directory = os.path.join(self.tmpDir, name)
+        os.makedirs(directory)
+        for oggName in ('s1', 's2'):
+            with open(os.path.join(directory, f'{oggName}.ogg'), 'wb') as oggFile:
+                oggFile.write(os.urandom(2000))
+        return Voice(directory)
+
+    def voiceChunk(self, md5sum:str, offset:int, size:int) ->bytes:
+        """like HumanClient.remote_voiceChunk"""
+        self.assertEqual(md5sum, self.md5sum)
+        return self.content[offset:offset + size]
+
+    def voiceData(self, *args:Any) ->int:
+        """HumanClient.remote_voiceData"""
+        return HumanClient.remote_voiceData(self.client, *args)
+
+    def offsets(self, method:str) ->List[int]:
+        """the offsets asked for or sent with method"""
+        index = 1 if method == 'voiceChunk' else 3
+        return [x[2][index] for x in self.server.calls if x[1] == method]
+
+    def fetch(self) ->Optional[bytes]:
+        """the archive as the server has it"""
+        result:List[Optional[bytes]] = []
+        VoiceStore.archive(self.server, self.owner, self.md5sum).addCallback(result.append)
+        self.assertEqual(len(result), 1)
+        return result[0]
+
+    def chunks(self) ->List[int]:
+        """the offsets of all chunks"""
+        return list(range(0, len(self.content), VoiceStore.chunkSize))
+
+    def testUpload(self) ->None:
+        """the owner sends the archive in chunks, an empty one ends it"""
+        self.assertEqual(self.fetch(), self.content)
+        self.assertEqual(self.offsets('voiceChunk'), self.chunks() + [len(self.content)])
+        self.assertEqual(self.fetch(), self.content)
+        self.assertEqual(len(self.server.calls), len(self.chunks()) + 1)
+
+    def testUploadResumed(self) ->None:
+        """the owner goes away after two chunks. The next transfer asks
+        only for the rest"""
+        self.owner.connected = 2
+        self.assertIsNone(self.fetch())
+        self.assertEqual(len(VoiceStore.uploads[self.md5sum]), 2 * VoiceStore.chunkSize)
+        self.server.calls.clear()
+        self.owner.connected = True
+        self.assertEqual(self.fetch(), self.content)
+        self.assertEqual(self.offsets('voiceChunk')[0], 2 * VoiceStore.chunkSize)
+        self.assertNotIn(self.md5sum, VoiceStore.uploads)
+
+    def testWrongUpload(self) ->None:
+        """the owner sends another voice: the server does not keep it"""
+        self.content = self.voice('other').archiveContent
+        self.assertIsNone(self.fetch())
+        self.assertNotIn(self.md5sum, VoiceStore.archives)
+        self.assertFalse(os.path.exists(Voice(self.md5sum).directory))
+
+    def send(self) ->None:
+        """the server sends the voice of owner to requester"""
+        VoiceStore.send(self.server, self.owner, self.requester, 'owner', self.md5sum)
+
+    def testDownload(self) ->None:
+        """the first empty chunk asks the requester where to start"""
+        self.send()
+        self.assertEqual(self.offsets('voiceData'), [0] + self.chunks())
+        self.assertEqual(self.client.voiceDownloads, {})
+        self.assertEqual(Voice(self.md5sum).md5sum, self.md5sum)
+
+    def testDownloadResumed(self) ->None:
+        """the requester goes away after two chunks. The next transfer
+        starts where the requester stopped"""
+        self.requester.connected = 3
+        self.send()
+        self.assertEqual(len(self.client.voiceDownloads[self.md5sum]), 2 * VoiceStore.chunkSize)
+        self.server.calls.clear()
+        self.requester.connected = True
+        self.send()
+        self.assertEqual(self.offsets('voiceData'), [0] + self.chunks()[2:])
+        self.assertEqual(self.client.voiceDownloads, {})
+        self.assertEqual(Voice(self.md5sum).md5sum, self.md5sum)
+
+
+class Fingerprints(CacheDirTest):
+
+    """the md5sums of voices are kept with the fingerprints of their ogg files"""
+
+    def setUp(self) ->None:
+        super().setUp()
+        self.savedReactor = getattr(Internal, 'reactor', None)
+        self.later:List[Any] = []
+        reactor:Any = SimpleNamespace(running=True, callLater=lambda delay, method: self.later.append(method))
+        Internal.reactor = reactor
+
+    def tearDown(self) ->None:
+        for method in self.later:
+            method()
+        if self.savedReactor:
+            Internal.reactor = self.savedReactor
+        else:
+            del Internal.reactor
+        super().tearDown()
+
+    def voices(self, count:int) ->List[Voice]:
+        """count voices with computed md5sums"""
+        result = []
+        for _ in range(count):
+            directory = tempfile.mkdtemp(dir=self.tmpDir)
+            with open(os.path.join(directory, 's1.ogg'), 'wb') as oggFile:
+                oggFile.write(os.urandom(100))
+            result.append(Voice(directory))
+            self.assertEqual(len(result[-1].md5sum), Voice.md5sumLength)
+        return result
+
+    def testOncePerScan(self) ->None:
+        """looking at many voices writes the fingerprints once"""
+        self.voices(3)
+        self.assertEqual(len(self.later), 1)
+        self.later.pop()()
+        self.voices(1)
+        self.assertEqual(len(self.later), 1)
+
+    def testOnlyDirectories(self) ->None:
+        """cacheDir() only holds directories"""
+        self.voices(1)
+        self.later.pop()()
+        cacheDir = os.path.join(self.tmpDir, 'kajongg')
+        self.assertTrue(os.listdir(cacheDir))
+        self.assertTrue(all(os.path.isdir(os.path.join(cacheDir, x)) for x in os.listdir(cacheDir)))
+
+
+if __name__ == '__main__':
+    unittest.main()